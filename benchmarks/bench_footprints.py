@@ -0,0 +1,27 @@
+'''
+Ground footprint benchmarks: a block of 1M nadir-ish images 50 to 200 m above ground.
+'''
+import numpy as np
+
+from lib.conventions import convention_yaw_pitch_roll_NED
+from lib.footprints import corner_rays, ground_footprints, format_footprint_lines
+
+POSES = 1000000
+
+
+class TimeFootprints:
+    def setup(self):
+        rng = np.random.default_rng(0)
+        self.convention = convention_yaw_pitch_roll_NED()
+        self.positions = np.column_stack((rng.uniform(-1000., 1000., (POSES, 2)), -rng.uniform(50., 200., POSES)))
+        self.angles = rng.normal(0., 10., (POSES, 3))
+        self.rays = corner_rays(6000, 4000, 5000)
+        self.footprints, _ = ground_footprints(self.convention, self.positions[:10000], self.angles[:10000],
+                                               self.rays)
+        self.names = ['IMG_%06d.JPG' % n for n in range(10000)]
+
+    def time_ground_footprints_1M(self):
+        ground_footprints(self.convention, self.positions, self.angles, self.rays)
+
+    def time_format_footprint_lines_10k(self):
+        format_footprint_lines(self.names, self.footprints)
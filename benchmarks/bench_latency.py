@@ -0,0 +1,53 @@
+'''
+Latency instrumentation overhead: one slider event through the render scheduler to a frame,
+with the stage marks of lib.Visualization, once with instrumentation disabled and once enabled.
+The scene update and render are left out, so the overhead is measured against the cheapest frame.
+'''
+from lib.conventions import convention_yaw_pitch_roll_NED
+from lib.rotations import IntegerDegreeRotationTable
+from lib.render_scheduler import RenderScheduler
+from lib.latency import LatencyTracker
+
+
+class SliderFrames:
+    '''
+    Slider event to frame as in lib.Visualization, with frames run right away.
+    '''
+    def __init__(self, latency):
+        self.latency = latency
+        self.rotation_table = IntegerDegreeRotationTable(convention_yaw_pitch_roll_NED())
+        self.render_scheduler = RenderScheduler(self.render_frame, lambda delay, callback: callback(), max_fps=0,
+                                                latency=latency)
+        self.angle = 0
+
+    def slider_moved(self):
+        if self.latency is not None:
+            self.latency.input()
+        self.angle = (self.angle + 1) % 360
+        self.render_scheduler.request()
+
+    def render_frame(self):
+        self.rotation_table.rotation_matrix(self.angle, 10, 20)
+        if self.latency is not None:
+            self.latency.mark('compute')
+        if self.latency is not None:
+            self.latency.mark('update')
+        if self.latency is not None:
+            self.latency.mark('render')
+
+
+class TimeLatencyInstrumentation:
+    def setup(self):
+        self.disabled = SliderFrames(None)
+        self.enabled = SliderFrames(LatencyTracker())
+        for _ in range(2000):
+            self.enabled.slider_moved()
+
+    def time_slider_frame_disabled(self):
+        self.disabled.slider_moved()
+
+    def time_slider_frame_enabled(self):
+        self.enabled.slider_moved()
+
+    def time_summary(self):
+        self.enabled.latency.summary()
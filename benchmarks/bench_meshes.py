@@ -0,0 +1,65 @@
+'''
+Mesh generation benchmarks.
+The generators are cached (see lib.geometry_cache): time_generate_* measure cache hits,
+time_*_uncached the generation itself.
+'''
+import shutil
+import tempfile
+
+from lib.conventions import SYSTEM_NED, SYSTEM_ENU, CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC
+from lib.draw_scene import camera_alignment_matrix, generate_aligned_camera_mesh
+from lib.geometry_cache import GeometryCache
+from lib.meshes import generate_arrow_mesh, generate_ground_mesh, GROUND_LEVELS_OF_DETAIL
+
+
+class TimeMeshes:
+    def time_camera_alignment_matrix_NED(self):
+        camera_alignment_matrix(SYSTEM_NED, CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC)
+
+    def time_camera_alignment_matrix_ENU(self):
+        camera_alignment_matrix(SYSTEM_ENU, CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC)
+
+    def time_generate_arrow_mesh(self):
+        generate_arrow_mesh(1.3)
+
+    def time_generate_ground_mesh(self):
+        generate_ground_mesh([1., 1., 0.2])
+
+    def time_generate_aligned_camera_mesh(self):
+        generate_aligned_camera_mesh(SYSTEM_NED, CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC)
+
+    def time_generate_arrow_mesh_uncached(self):
+        generate_arrow_mesh.uncached(1.3)
+
+    def time_generate_ground_mesh_uncached(self):
+        generate_ground_mesh.uncached([1., 1., 0.2])
+
+
+class TimeGeometryCache:
+    '''
+    Large-area ground (50 x 50 at the 'high' level of detail, 1M vertices):
+    generating it, loading it from the disk cache of an earlier launch, and an in-memory hit.
+    '''
+    dimensions = [25., 25., 0.2]
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.step = GROUND_LEVELS_OF_DETAIL['high']
+        GeometryCache(directory=self.directory).get('ground', (self.dimensions, self.step), self.generate)
+        self.memory_cache = GeometryCache(max_bytes=2**30)
+        self.memory_cache.get('ground', (self.dimensions, self.step), self.generate)
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def generate(self):
+        return generate_ground_mesh.uncached(self.dimensions, self.step)
+
+    def time_ground_generate(self):
+        self.generate()
+
+    def time_ground_disk_hit(self):
+        GeometryCache(directory=self.directory).get('ground', (self.dimensions, self.step), self.generate)
+
+    def time_ground_memory_hit(self):
+        self.memory_cache.get('ground', (self.dimensions, self.step), self.generate)
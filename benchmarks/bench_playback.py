@@ -0,0 +1,29 @@
+'''
+Trajectory playback benchmarks: a 60 s IMU log at 1000 Hz replayed at 60 fps.
+'''
+import numpy as np
+
+from lib.conventions import convention_yaw_pitch_roll_NED
+from lib.playback import trajectory_from_angles, PlaybackEngine
+
+LOG_RATE = 1000.
+DURATION = 60.
+
+
+class TimePlayback:
+    def setup(self):
+        times = np.arange(0., DURATION, 1. / LOG_RATE)
+        angles = np.stack((10. * np.sin(times), 5. * np.sin(0.3 * times), 20. * times), axis=1)
+        self.convention = convention_yaw_pitch_roll_NED()
+        self.times, self.angles = times, angles
+        self.trajectory = trajectory_from_angles(self.convention, times, angles)
+        self.display_times = np.arange(0., DURATION, 1. / 60.)
+
+    def time_trajectory_from_angles(self):
+        trajectory_from_angles(self.convention, self.times, self.angles)
+
+    def time_resample_to_display_rate(self):
+        self.trajectory.quaternions_at(self.display_times)
+
+    def time_fill_look_ahead(self):
+        PlaybackEngine(self.trajectory, fps=60.).fill()
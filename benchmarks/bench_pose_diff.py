@@ -0,0 +1,38 @@
+'''
+Pose diff benchmarks: IMU Yaw Pitch Roll (NED) against Pix4D Omega Phi Kappa (ENU) for 100k images.
+'''
+import io
+
+import numpy as np
+
+from lib.conventions import convention_yaw_pitch_roll_NED, convention_pix4d_omega_phi_kappa_ENU
+from lib.pose_io import format_pose_lines
+from lib.pose_conversion import PoseConverter
+from lib.pose_diff import PoseDifferences, compare_pose_files
+
+POSES = 100000
+
+
+class TimePoseDiff:
+    def setup(self):
+        rng = np.random.default_rng(0)
+        self.ypr, self.opk = convention_yaw_pitch_roll_NED(), convention_pix4d_omega_phi_kappa_ENU()
+        self.names = np.array(['IMG_%07d.JPG' % n for n in range(POSES)])
+        self.angles_a = rng.uniform(-30., 30., (POSES, 3))
+        self.angles_b, _ = PoseConverter(self.ypr, self.opk).convert_angles(self.angles_a + rng.normal(0., 0.1, (POSES, 3)))
+        positions = rng.normal(0., 100., (POSES, 3))
+
+        self.file_a = format_pose_lines(self.names, positions, self.angles_a[:, ::-1], ',')
+        # Same images in a different order, e.g. sorted by flight line instead of capture time
+        order = np.argsort(self.names[::-1], kind='stable')[::-1]
+        self.file_b = format_pose_lines(self.names[order], positions[order], self.angles_b[order, ::-1], ',')
+
+    def time_differences_100k(self):
+        PoseDifferences(self.ypr, self.opk).update(self.names, self.angles_a, self.angles_b)
+
+    def time_compare_pose_files_100k(self):
+        compare_pose_files(io.StringIO(self.file_a), io.StringIO(self.file_b), self.ypr, self.opk, chunk_size=20000)
+
+    def time_compare_pose_files_partitioned_100k(self):
+        compare_pose_files(io.StringIO(self.file_a), io.StringIO(self.file_b), self.ypr, self.opk, chunk_size=20000,
+                           partitions=8)
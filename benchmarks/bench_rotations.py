@@ -0,0 +1,172 @@
+'''
+Rotation math benchmarks for both shipped conventions (YPR/NED, Pix4D OPK/ENU).
+'''
+import numpy as np
+
+from lib.conventions import convention_yaw_pitch_roll_NED, convention_pix4d_omega_phi_kappa_ENU, \
+        registered_convention, compile_registry
+from lib.rotations import rotation_matrix, rotation_matrices, angles_from_rotation_matrices, \
+        IntegerDegreeRotationTable, IntegerDegreeRotationTables
+from lib.sensitivity import sensitivity_fields, grid_angles
+from lib.uncertainty import axis_endpoints
+from lib.parametrizations import quaternions_from_angles, angles_from_quaternions, \
+        quaternions_from_rotation_matrices, rotation_vectors_from_quaternions, quaternions_from_rotation_vectors
+
+BATCH_SIZE = 100000
+
+
+class TimeCameraToWorldRotationMatrix:
+    '''
+    Scalar API with traits definitions, as used before the compiled core.
+    '''
+    def setup(self):
+        try:
+            from lib.TaitBryanRotation import camera_to_world_rotation_matrix, \
+                angles_yaw_pitch_roll, angles_pix4d_omega_phi_kappa
+            from lib.WorldSystem import system_NED, system_ENU
+        except ImportError as e:
+            raise NotImplementedError(e)
+
+        self.camera_to_world_rotation_matrix = camera_to_world_rotation_matrix
+        self.ypr = angles_yaw_pitch_roll().angles_in_order_applied, system_NED()
+        self.opk = angles_pix4d_omega_phi_kappa().angles_in_order_applied, system_ENU()
+
+    def time_yaw_pitch_roll(self):
+        (first, second, last), world_system = self.ypr
+        self.camera_to_world_rotation_matrix((0.3, last), (0.2, second), (0.1, first), world_system)
+
+    def time_pix4d_omega_phi_kappa(self):
+        (first, second, last), world_system = self.opk
+        self.camera_to_world_rotation_matrix((0.3, last), (0.2, second), (0.1, first), world_system)
+
+
+class TimeCompiledRotation:
+    def setup(self):
+        self.ypr = convention_yaw_pitch_roll_NED()
+        self.opk = convention_pix4d_omega_phi_kappa_ENU()
+        self.ypr_table = IntegerDegreeRotationTable(self.ypr)
+        self.opk_table = IntegerDegreeRotationTable(self.opk)
+
+    def time_rotation_matrix_yaw_pitch_roll(self):
+        rotation_matrix(self.ypr, 0.1, 0.2, 0.3)
+
+    def time_rotation_matrix_pix4d_omega_phi_kappa(self):
+        rotation_matrix(self.opk, 0.1, 0.2, 0.3)
+
+    def time_table_yaw_pitch_roll(self):
+        self.ypr_table.rotation_matrix(10, 20, 30)
+
+    def time_table_pix4d_omega_phi_kappa(self):
+        self.opk_table.rotation_matrix(10, 20, 30)
+
+
+class TimeBatchRotations:
+    '''
+    Batches of BATCH_SIZE angle triples.
+    '''
+    def setup(self):
+        rng = np.random.default_rng(0)
+        self.angles = rng.uniform(-np.pi, np.pi, (BATCH_SIZE, 3))
+        self.angles[:, 1] /= 2.
+        self.degrees = rng.integers(-180, 180, (BATCH_SIZE, 3))
+        self.ypr = convention_yaw_pitch_roll_NED()
+        self.opk = convention_pix4d_omega_phi_kappa_ENU()
+        self.ypr_table = IntegerDegreeRotationTable(self.ypr)
+        self.ypr_rotations = rotation_matrices(self.ypr, self.angles)
+        self.zxz = registered_convention('ZXZ', 'NED').convention
+
+    def time_rotation_matrices_yaw_pitch_roll(self):
+        rotation_matrices(self.ypr, self.angles)
+
+    def time_rotation_matrices_pix4d_omega_phi_kappa(self):
+        rotation_matrices(self.opk, self.angles)
+
+    def time_table_rotation_matrices_yaw_pitch_roll(self):
+        self.ypr_table.rotation_matrices(self.degrees)
+
+    def time_angles_from_rotation_matrices_yaw_pitch_roll(self):
+        angles_from_rotation_matrices(self.ypr, self.ypr_rotations)
+
+    def time_angles_from_rotation_matrices_proper_euler_ZXZ(self):
+        angles_from_rotation_matrices(self.zxz, self.ypr_rotations)
+
+
+class TimeSplitViewRotations:
+    '''
+    Rotations of all viewports of a split view with four conventions for one set of UI angles.
+    '''
+    def setup(self):
+        conventions = [registered_convention(sequence, 'NED').convention for sequence in ('XYZ', 'ZYX', 'zxz', 'YXY')]
+        self.tables = [IntegerDegreeRotationTable(convention) for convention in conventions]
+        self.stacked_tables = IntegerDegreeRotationTables(conventions)
+
+    def time_per_viewport_tables(self):
+        [table.rotation_matrix(10, 20, 30) for table in self.tables]
+
+    def time_stacked_tables(self):
+        self.stacked_tables.rotation_matrices(10, 20, 30)
+
+
+class TimeConventionRegistry:
+    def setup(self):
+        compile_registry()
+
+    def time_registered_convention(self):
+        registered_convention('ZYX', 'NED')
+
+
+class TimeBatchParametrizations:
+    '''
+    Batches of BATCH_SIZE rotations, YPR/NED.
+    '''
+    def setup(self):
+        rng = np.random.default_rng(0)
+        self.angles = rng.uniform(-np.pi, np.pi, (BATCH_SIZE, 3))
+        self.angles[:, 1] /= 2.
+        self.ypr = convention_yaw_pitch_roll_NED()
+        self.rotations = rotation_matrices(self.ypr, self.angles)
+        self.quaternions = quaternions_from_angles(self.ypr, self.angles)
+        self.rotation_vectors = rotation_vectors_from_quaternions(self.quaternions)
+
+    def time_quaternions_from_angles(self):
+        quaternions_from_angles(self.ypr, self.angles)
+
+    def time_quaternions_from_angles_via_matrices(self):
+        quaternions_from_rotation_matrices(rotation_matrices(self.ypr, self.angles))
+
+    def time_angles_from_quaternions(self):
+        angles_from_quaternions(self.ypr, self.quaternions)
+
+    def time_quaternions_from_rotation_matrices(self):
+        quaternions_from_rotation_matrices(self.rotations)
+
+    def time_rotation_vectors_from_quaternions(self):
+        rotation_vectors_from_quaternions(self.quaternions)
+
+    def time_quaternions_from_rotation_vectors(self):
+        quaternions_from_rotation_vectors(self.rotation_vectors)
+
+
+class TimeSensitivityMap:
+    '''
+    One row of the 1 degree sensitivity map: 360 x 360 poses with the same first angle.
+    '''
+    def setup(self):
+        self.convention = convention_yaw_pitch_roll_NED()
+        self.angles = np.deg2rad(grid_angles(1.))
+
+    def time_sensitivity_row(self):
+        sensitivity_fields(self.convention, self.angles[:1], self.angles, self.angles)
+
+
+class TimeUncertaintyCloud:
+    '''
+    Optical axis and up vector endpoints of 1M Monte Carlo attitude samples.
+    '''
+    def setup(self):
+        self.convention = convention_yaw_pitch_roll_NED()
+        self.normals = np.random.default_rng(0).standard_normal((1000000, 3))
+
+    def time_axis_endpoints_1M(self):
+        axis_endpoints(self.convention, (10., 20., 30.), (1., 1., 2.), self.normals,
+                       [(0., 0., -1.), (0., 1., 0.)])
@@ -0,0 +1,124 @@
+'''
+Headless scene benchmarks: building the scene and one update_plot round-trip.
+
+Runs with offscreen VTK rendering and Qt's offscreen platform, so no display is needed.
+Skipped when mayavi is not installed.
+'''
+import os
+
+
+class TimeScene:
+    scene_build = 'merged'
+
+    def setup(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        os.environ.setdefault('ETS_TOOLKIT', 'qt')
+        try:
+            from mayavi import mlab
+            from pyface.api import GUI
+            from lib.Visualization import Visualization
+            from lib.TaitBryanRotation import angles_yaw_pitch_roll
+            from lib.WorldSystem import system_NED, camera_world_alignment_at_zero_photogrammetric
+            from lib.draw_scene import initial_view_yaw_pitch_roll
+        except ImportError as e:
+            raise NotImplementedError(e)
+
+        mlab.options.offscreen = True
+        self.mlab = mlab
+        self.gui = GUI()
+        self.visualization = Visualization(angles_yaw_pitch_roll(), system_NED(),
+                                           camera_world_alignment_at_zero_photogrammetric(),
+                                           initial_view_yaw_pitch_roll(), scene_build=self.scene_build)
+        # Opening the view activates the scene, which calls initialize_scene() once
+        self.ui = self.visualization.edit_traits()
+        self.gui.process_events()
+
+    def teardown(self):
+        self.ui.dispose()
+
+    def time_initialize_scene(self):
+        self.mlab.clf(figure=self.visualization.mayavi_scene.mayavi_scene)
+        self.visualization.initialize_scene()
+
+    def time_update_plot(self):
+        # Slider event, then the frame the render scheduler would run: rotation, update and render
+        self.visualization.angles.angle_applied_first.add_diff = \
+            (self.visualization.angles.angle_applied_first.add_diff + 1) % 50
+        self.visualization.render_frame()
+
+
+class TimeSeparateScene(TimeScene):
+    '''
+    Scene built with one mayavi pipeline per ground, arrow and label.
+    '''
+    scene_build = 'separate'
+
+
+class TimeSplitViewScene:
+    '''
+    Split view comparing YPR/NED, OPK/ENU, ZYX/NED and zxz/ENU.
+    '''
+    def setup(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        os.environ.setdefault('ETS_TOOLKIT', 'qt')
+        try:
+            from mayavi import mlab
+            from pyface.api import GUI
+            from lib.SplitViewVisualization import SplitViewVisualization
+            from lib.TaitBryanRotation import angles_yaw_pitch_roll, angles_pix4d_omega_phi_kappa, \
+                angles_from_sequence
+            from lib.WorldSystem import system_NED, system_ENU, camera_world_alignment_at_zero_photogrammetric
+            from lib.draw_scene import initial_view_yaw_pitch_roll
+        except ImportError as e:
+            raise NotImplementedError(e)
+
+        mlab.options.offscreen = True
+        self.gui = GUI()
+        self.visualization = SplitViewVisualization([(angles_yaw_pitch_roll(), system_NED()),
+                                                     (angles_pix4d_omega_phi_kappa(), system_ENU()),
+                                                     (angles_from_sequence('ZYX'), system_NED()),
+                                                     (angles_from_sequence('zxz'), system_ENU())],
+                                                    camera_world_alignment_at_zero_photogrammetric(),
+                                                    initial_view_yaw_pitch_roll())
+        self.ui = self.visualization.edit_traits()
+        self.gui.process_events()
+
+    def teardown(self):
+        self.ui.dispose()
+
+    def time_update_plot(self):
+        self.visualization.angles.angle_applied_first.add_diff = \
+            (self.visualization.angles.angle_applied_first.add_diff + 1) % 50
+        self.visualization.render_frame()
+
+
+class TimeSnapshotRenderer:
+    '''
+    One offscreen pose snapshot (transform update, render, PNG) at 320 x 240.
+    '''
+    def setup(self):
+        import tempfile
+        try:
+            from lib.batch_render import SnapshotRenderer
+            from lib.WorldSystem import system_NED, camera_world_alignment_at_zero_photogrammetric
+            from lib.draw_scene import initial_view_yaw_pitch_roll
+        except ImportError as e:
+            raise NotImplementedError(e)
+        from lib.conventions import convention_yaw_pitch_roll_NED
+        from lib.rotations import IntegerDegreeRotationTable
+
+        self.directory = tempfile.mkdtemp()
+        self.renderer = SnapshotRenderer(system_NED(), camera_world_alignment_at_zero_photogrammetric(),
+                                         initial_view_yaw_pitch_roll())
+        self.rotation_table = IntegerDegreeRotationTable(convention_yaw_pitch_roll_NED())
+        self.snapshots = 0
+
+    def teardown(self):
+        import shutil
+        self.renderer.close()
+        shutil.rmtree(self.directory)
+
+    def time_render_snapshot(self):
+        self.snapshots += 1
+        self.renderer.render(self.rotation_table.rotation_matrix(self.snapshots, 2 * self.snapshots, 0),
+                             os.path.join(self.directory, 'snapshot.png'))
@@ -0,0 +1,23 @@
+'''
+Telemetry packet parsing benchmarks.
+'''
+from lib.telemetry import parse_packet, format_packet, LatestSample
+
+ANGLE_NAMES = ('Roll', 'Pitch', 'Yaw')
+
+
+class TimeTelemetryPackets:
+    def setup(self):
+        self.binary = format_packet(1.5, (10., 20., 30.), 'binary', ANGLE_NAMES)
+        self.json = format_packet(1.5, (10., 20., 30.), 'json', ANGLE_NAMES)
+        self.latest = LatestSample()
+
+    def time_parse_binary(self):
+        parse_packet(self.binary, 'binary', ANGLE_NAMES)
+
+    def time_parse_json(self):
+        parse_packet(self.json, 'json', ANGLE_NAMES)
+
+    def time_latest_sample_put_take(self):
+        self.latest.put(1.5, None)
+        self.latest.take()
@@ -0,0 +1,75 @@
+'''
+Import time budget of the GUI-free core.
+
+Imports the core modules in a fresh interpreter with `python -X importtime`
+and fails (exit code 1) if
+- any module of the GUI stack (traits, mayavi, VTK, Qt) gets imported, or
+- the cumulative import time (best of several runs) exceeds the budget.
+
+Usage: python benchmarks/import_time.py [--budget-ms 400] [--runs 5]
+'''
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'euler_angle_visualization')
+
+CORE_MODULES = ['euler_angle_visualization', 'lib.rotations', 'lib.conventions', 'lib.meshes', 'lib.geometry_cache',
+                'lib.mesh_io', 'lib.draw_scene',
+                'lib.render_scheduler', 'lib.pose_conversion', 'lib.pose_io',
+                'lib.parallel_conversion', 'lib.parametrizations', 'lib.playback',
+                'lib.telemetry', 'lib.sensitivity', 'lib.uncertainty',
+                'lib.footprints', 'lib.pose_diff', 'lib.latency']
+
+GUI_MODULES = ['traits', 'traitsui', 'pyface', 'mayavi', 'tvtk', 'vtk', 'vtkmodules', 'PyQt5']
+
+
+def measure_import_time():
+    '''
+    Returns the cumulative import time in ms and the names of all imported modules.
+    '''
+    statement = 'import ' + ', '.join(CORE_MODULES)
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                               cwd=PACKAGE_DIR, capture_output=True, text=True, check=True)
+
+    total_us = 0
+    modules = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append(name.strip())
+        if not name.startswith('  '):  # top level import
+            total_us += int(cumulative)
+
+    return total_us / 1000., modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time budget of the GUI-free core.')
+    parser.add_argument('--budget-ms', type=float, default=400.)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        total_ms, modules = measure_import_time()
+        timings.append(total_ms)
+
+    gui_imports = sorted({name.split('.')[0] for name in modules} & set(GUI_MODULES))
+    best_ms = min(timings)
+    print('core import time: best %.1f ms, worst %.1f ms (budget %.1f ms)' % (best_ms, max(timings), args.budget_ms))
+
+    if gui_imports:
+        print('FAIL: core imports GUI modules: ' + ', '.join(gui_imports))
+        return 1
+    if best_ms > args.budget_ms:
+        print('FAIL: import time budget exceeded')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
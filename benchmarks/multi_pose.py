@@ -0,0 +1,57 @@
+'''
+Frames per second of the multi-pose scene mode against the number of poses.
+
+For each N, random poses are merged into a single actor (as MultiPoseVisualization does)
+and rendered offscreen while the view camera turns.
+
+Usage: python benchmarks/multi_pose.py [--poses 1000 10000 100000]
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'euler_angle_visualization'))
+
+from lib.conventions import convention_pix4d_omega_phi_kappa_ENU, SYSTEM_ENU, CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC
+from lib.draw_scene import generate_aligned_camera_mesh, measure_frames_per_second
+from lib.meshes import merge_posed_meshes
+from lib.rotations import rotation_matrices
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure multi-pose rendering speed.')
+    parser.add_argument('--poses', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+
+    from mayavi import mlab
+    mlab.options.offscreen = True
+    mlab.figure(size=(800, 600))
+
+    rng = np.random.default_rng(0)
+    camera_mesh = generate_aligned_camera_mesh(SYSTEM_ENU, CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC)
+
+    print('%10s %12s %12s' % ('poses', 'build [ms]', 'fps'))
+    for n in args.poses:
+        side = np.sqrt(n)
+        positions = np.column_stack((rng.uniform(0, 10 * side, n), rng.uniform(0, 10 * side, n), np.full(n, 50.)))
+        angles = np.deg2rad(np.column_stack((rng.uniform(-180, 180, n), rng.normal(0, 5, n), rng.normal(0, 5, n))))
+
+        start = time.perf_counter()
+        rotations = rotation_matrices(convention_pix4d_omega_phi_kappa_ENU(), angles)
+        poses_mesh = merge_posed_meshes(camera_mesh, rotations, positions, scale=3.)
+        build_ms = 1000. * (time.perf_counter() - start)
+
+        mlab.clf()
+        mlab.triangular_mesh(poses_mesh.x, poses_mesh.y, poses_mesh.z, poses_mesh.faces,
+                             scalars=np.zeros(len(poses_mesh.vertices)), vmin=0., vmax=1., opacity=0.5)
+        scene = mlab.gcf().scene
+        scene.reset_zoom()
+        print('%10d %12.1f %12.1f' % (n, build_ms, measure_frames_per_second(scene, args.frames)))
+
+
+if __name__ == '__main__':
+    main()
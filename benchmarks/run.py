@@ -0,0 +1,134 @@
+'''
+Benchmark runner (asv style).
+
+Collects the classes named Time* in benchmarks/bench_*.py. For each class,
+setup() is called once; raising NotImplementedError there skips the class
+(e.g. when mayavi is not installed). Each time_* method is timed with
+timeit-like autoranging and the best time per call out of --repeat runs is reported.
+
+Results are written as JSON. With --baseline, every benchmark that got slower
+than the baseline by more than --threshold (relative) is reported as regression,
+and the exit code is 1.
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline results.json --threshold 0.25
+'''
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, os.pardir, 'euler_angle_visualization'))
+sys.path.insert(0, BENCHMARK_DIR)
+
+
+def autorange(function, min_time):
+    '''
+    Returns a number of calls that takes at least min_time seconds.
+    '''
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= min_time:
+            return number
+        number *= 10
+
+
+def time_function(function, repeat, min_time):
+    number = autorange(function, min_time)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings), number
+
+
+def collect_benchmarks(pattern):
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, 'bench_*.py'))):
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module(module_name)
+        for class_name in sorted(dir(module)):
+            benchmark_class = getattr(module, class_name)
+            if not class_name.startswith('Time') or not isinstance(benchmark_class, type):
+                continue
+            methods = [name for name in sorted(dir(benchmark_class)) if name.startswith('time_')
+                       and (pattern is None or pattern in '%s.%s.%s' % (module_name, class_name, name))]
+            if methods:
+                yield '%s.%s' % (module_name, class_name), benchmark_class, methods
+
+
+def run_benchmarks(pattern, repeat, min_time):
+    results = {}
+    for class_id, benchmark_class, methods in collect_benchmarks(pattern):
+        benchmark = benchmark_class()
+        try:
+            if hasattr(benchmark, 'setup'):
+                benchmark.setup()
+        except NotImplementedError as e:
+            print('%-80s skipped (%s)' % (class_id, e))
+            continue
+
+        for method in methods:
+            name = '%s.%s' % (class_id, method)
+            seconds, number = time_function(getattr(benchmark, method), repeat, min_time)
+            results[name] = {'seconds': seconds, 'number': number}
+            print('%-80s %12.3f us' % (name, 1e6 * seconds))
+
+        if hasattr(benchmark, 'teardown'):
+            benchmark.teardown()
+    return results
+
+
+def compare(results, baseline, threshold):
+    '''
+    Returns the names of benchmarks that are slower than the baseline by more than threshold.
+    '''
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = result['seconds'] / baseline[name]['seconds']
+        if ratio > 1. + threshold:
+            regressions.append(name)
+            print('REGRESSION %-69s %6.2fx slower' % (name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite.')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown against the baseline (default: 0.25)')
+    parser.add_argument('--bench', default=None, help='only run benchmarks whose name contains this string')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.1, help='minimal duration of one timing run in seconds')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.bench, args.repeat, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'machine': platform.node(), 'python': platform.python_version(),
+                       'timestamp': time.time(), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+'''
+Actor count and build time of the static world (ground, axis arrows and labels):
+- 'separate': one mlab pipeline per ground, arrow and label (previous behaviour)
+- 'merged':   one actor for ground and arrows with per-vertex colors, one actor for all labels
+
+Measured offscreen, including the first render, for the NED world system.
+
+Usage: python benchmarks/scene_build.py [--repeat 20]
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'euler_angle_visualization'))
+
+from lib.WorldSystem import system_NED
+from lib.draw_scene import draw_world_with_coordinate_system_at_origin
+
+
+class SceneModel:
+    '''
+    The parts of MlabSceneModel used to draw the world: mlab and the figure's scene.
+    '''
+    def __init__(self, mlab, scene):
+        self.mlab = mlab
+        self.scene = scene
+
+    def __getattr__(self, name):
+        return getattr(self.scene, name)
+
+
+def time_build(mlab, scene_model, mode, repeat):
+    from lib.scene_actors import merged_world_actors
+
+    world_system = system_NED()
+    build_times = []
+    for _ in range(repeat):
+        mlab.clf()
+        start = time.perf_counter()
+        if mode == 'merged':
+            scene_model.add_actors(merged_world_actors(world_system))
+        else:
+            draw_world_with_coordinate_system_at_origin(scene_model, world_system)
+        scene_model.render()
+        build_times.append(time.perf_counter() - start)
+
+    return len(scene_model.renderer.view_props), np.array(build_times) * 1000.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare building the static world as separate or merged actors.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    from mayavi import mlab
+    mlab.options.offscreen = True
+    figure = mlab.figure(size=(640, 480))
+
+    scene_model = SceneModel(mlab, figure.scene)
+
+    print('%-10s %8s %10s %10s' % ('mode', 'actors', 'p50 [ms]', 'p95 [ms]'))
+    for mode in ('separate', 'merged'):
+        actors, build_times = time_build(mlab, scene_model, mode, args.repeat)
+        print('%-10s %8d %10.2f %10.2f' % (mode, actors, np.percentile(build_times, 50),
+                                           np.percentile(build_times, 95)))
+
+
+if __name__ == '__main__':
+    main()
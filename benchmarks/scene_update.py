@@ -0,0 +1,91 @@
+'''
+Latency of one camera pose update in the scene:
+- 'vertices':  rotate all vertices and push them through mlab_source (previous behaviour)
+- 'transform': replace the actor's 4x4 user matrix only
+
+Measured offscreen for the 6-vertex camera mesh and a synthetic 100k-triangle model.
+Both use representation='surface' to compare geometry upload, not fancymesh glyphs.
+
+Usage: python benchmarks/scene_update.py [--updates 200]
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'euler_angle_visualization'))
+
+from lib.conventions import convention_yaw_pitch_roll_NED
+from lib.draw_scene import camera_to_scene_transform
+from lib.meshes import generate_camera_mesh
+from lib.rotations import IntegerDegreeRotationTable
+
+
+def generate_sphere_mesh(triangles=100000):
+    '''
+    Closed-ish sphere with approximately the requested number of triangles.
+    '''
+    n = int(np.sqrt(triangles / 2)) + 1
+    theta, phi = np.mgrid[0:np.pi:n * 1j, 0:2 * np.pi:n * 1j]
+    x, y, z = np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)
+
+    index = np.arange(n * n).reshape(n, n)
+    a, b, c, d = index[:-1, :-1].ravel(), index[1:, :-1].ravel(), index[1:, 1:].ravel(), index[:-1, 1:].ravel()
+    faces = np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)))
+
+    return x.ravel(), y.ravel(), z.ravel(), faces
+
+
+def time_updates(mlab, x, y, z, faces, mode, updates):
+    from tvtk.api import tvtk
+
+    mlab.clf()
+    translation = [0., 0., 3.]
+    rotation_table = IntegerDegreeRotationTable(convention_yaw_pitch_roll_NED())
+    surface = mlab.triangular_mesh(x, y, z, faces, representation='surface')
+    if mode == 'transform':
+        user_matrix = tvtk.Matrix4x4()
+        surface.actor.actor.user_matrix = user_matrix
+    vertices = np.array([x, y, z])
+    scene = mlab.gcf().scene
+    scene.render()
+
+    latencies = []
+    for i in range(updates):
+        start = time.perf_counter()
+        rotation = rotation_table.rotation_matrix(i, 2 * i, 3 * i)
+        if mode == 'transform':
+            user_matrix.from_array(camera_to_scene_transform(rotation, translation))
+            scene.render()
+        else:
+            x_new, y_new, z_new = rotation.dot(vertices)
+            surface.mlab_source.trait_set(x=x_new + translation[0], y=y_new + translation[1], z=z_new + translation[2])
+        latencies.append(time.perf_counter() - start)
+
+    return np.array(latencies) * 1000.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare camera pose update latency in the scene.')
+    parser.add_argument('--updates', type=int, default=200)
+    args = parser.parse_args()
+
+    from mayavi import mlab
+    mlab.options.offscreen = True
+    mlab.figure(size=(640, 480))
+
+    camera_mesh = generate_camera_mesh()
+    meshes = [('camera (6 vertices)', (camera_mesh.x, camera_mesh.y, camera_mesh.z, camera_mesh.faces)),
+              ('model (100k triangles)', generate_sphere_mesh(100000))]
+
+    print('%-24s %-10s %10s %10s' % ('mesh', 'mode', 'p50 [ms]', 'p95 [ms]'))
+    for name, mesh in meshes:
+        for mode in ('vertices', 'transform'):
+            latencies = time_updates(mlab, *mesh, mode=mode, updates=args.updates)
+            print('%-24s %-10s %10.3f %10.3f' % (name, mode, np.percentile(latencies, 50), np.percentile(latencies, 95)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,96 +1,296 @@
-import numpy as np
+import sys
 import warnings
 import argparse
 
-from traits.api import HasTraits, Instance, Property, on_trait_change
-from traitsui.api import View, Item, Group
+# The GUI stack (traits, mayavi, VTK, Qt) is only imported once run() opens a window.
+# The numeric core (lib.rotations, lib.conventions, lib.meshes) can be used without it.
 
-from tvtk.pyface.scene_editor import SceneEditor
 
-from mayavi.tools.mlab_scene_model import MlabSceneModel
-from mayavi.core.ui.mayavi_scene import MayaviScene
+def add_convert_arguments(parser):
+    parser.add_argument('input', help='pose file ("-" for stdin): image, X, Y, Z and the angles in degrees, '
+                                      'named as the convention (e.g. Omega Phi Kappa)')
+    parser.add_argument('output', help='converted pose file ("-" for stdout)')
+    parser.add_argument('--from', dest='source', default='opk', choices=['ypr', 'opk'],
+                        help='convention of the input angles (default: opk)')
+    parser.add_argument('--to', dest='target', default=None, choices=['ypr', 'opk'],
+                        help='convention to convert to (default: same as --from)')
+    parser.add_argument('--output-type', default='angles', choices=['angles', 'matrix'],
+                        help='write target angles or the 9 entries of the target rotation matrix')
+    parser.add_argument('--format', default='csv', choices=['csv', 'pix4d'],
+                        help='comma separated values or Pix4D external camera parameters (whitespace separated)')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='lines processed at once')
+    parser.add_argument('--raw', action='store_true',
+                        help='input and output are raw float64 buffers of (N,3) angles (degrees, ordered as applied)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes for binary (.npy or --raw) input (default: number of cores)')
+    parser.add_argument('--shard-size', type=int, default=1000000, help='rows per worker task for binary input')
 
-from lib.AngleControl import AngleControlPanel
-from lib.TaitBryanRotation import camera_to_world_rotation_matrix, angles_yaw_pitch_roll, angles_pix4d_omega_phi_kappa
-from lib.WorldSystem import system_NED, system_ENU, camera_world_alignment_at_zero_photogrammetric
-from lib.draw_scene import draw_world_with_coordinate_system_at_origin, \
-        world_origin_to_camera_origin, generate_aligned_camera_mesh, \
-        initial_view_yaw_pitch_roll, initial_view_pix4d_omega_phi_kappa
 
+def convert(args):
+    '''
+    Headless pose file conversion, streamed in chunks.
+    '''
+    from lib.conventions import CONVENTIONS
+    from lib.pose_io import convert_pose_file, open_text
+
+    source_convention = CONVENTIONS[args.source]()
+    target_convention = CONVENTIONS[args.target or args.source]()
+
+    if args.raw or args.input.endswith('.npy'):
+        return convert_binary(args, source_convention, target_convention)
+
+    input_file = open_text(args.input, 'r')
+    output_file = open_text(args.output, 'w')
+    try:
+        poses, near_singular_poses = convert_pose_file(input_file, output_file, source_convention, target_convention,
+                                                       args.output_type, args.format, args.chunk_size)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print('converted %d poses, %d in gimbal lock' % (poses, near_singular_poses), file=sys.stderr)
+
+
+def convert_binary(args, source_convention, target_convention):
+    '''
+    Parallel conversion of memory-mapped binary angle files.
+    '''
+    import time
+    from lib.parallel_conversion import convert_angles_file
+
+    start = time.perf_counter()
+    statistics = convert_angles_file(args.input, args.output, source_convention, target_convention,
+                                     args.output_type, args.raw, args.workers, args.shard_size)
+    seconds = time.perf_counter() - start
+
+    poses = sum(worker['poses'] for worker in statistics.values())
+    for pid, worker in sorted(statistics.items()):
+        print('worker %d: %d shards, %d poses, %.2f s, %.0f poses/s' % (
+            pid, worker['shards'], worker['poses'], worker['seconds'],
+            worker['poses'] / worker['seconds'] if worker['seconds'] else 0.), file=sys.stderr)
+    print('converted %d poses, %d in gimbal lock, %.2f s, %.0f poses/s' % (
+        poses, sum(worker['near_singular_poses'] for worker in statistics.values()), seconds,
+        poses / seconds), file=sys.stderr)
+
+
+def add_telemetry_arguments(parser):
+    parser.add_argument('--telemetry-protocol', default='udp', choices=['udp', 'tcp'], help='transport (default: udp)')
+    parser.add_argument('--telemetry-format', default='binary', choices=['binary', 'json'],
+                        help='binary: little-endian float64 time and angles in degrees (ordered as applied), '
+                             'json: {"t": time, "<angle name>": degrees, ...} per line')
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def replay(args):
+    '''
+    Local stand-in for a vehicle: sends a recorded attitude log as telemetry.
+    '''
+    import asyncio
+    from lib.conventions import convention_by_name
+    from lib.playback import load_angle_time_series
+    from lib.telemetry import replay as replay_telemetry
+
+    times, angles = load_angle_time_series(args.log)
+    host, port = parse_address(args.address)
+    angle_names = convention_by_name(args.convention, args.world).angle_names
+    packets = asyncio.run(replay_telemetry(host, port, times, angles, angle_names,
+                                           args.telemetry_protocol, args.telemetry_format, args.speed))
+    print('sent %d packets' % packets, file=sys.stderr)
+
+
+def angles_definition(convention, world=None):
+    '''
+    Returns the angles definition, world system and initial view of a
+    convention given on the command line: ypr, opk or a rotation sequence within world.
+    '''
+    from lib.TaitBryanRotation import angles_yaw_pitch_roll, angles_pix4d_omega_phi_kappa, angles_from_sequence
+    from lib.WorldSystem import system_NED, system_ENU, system_by_name
+    from lib.draw_scene import initial_view_yaw_pitch_roll, initial_view_pix4d_omega_phi_kappa
+
+    if convention == 'ypr':
+        return angles_yaw_pitch_roll(), system_NED(), initial_view_yaw_pitch_roll()
+    elif convention == 'opk':
+        return angles_pix4d_omega_phi_kappa(), system_ENU(), initial_view_pix4d_omega_phi_kappa()
+
+    world_system = system_by_name(world or 'ENU')
+    initial_view = initial_view_yaw_pitch_roll() if 'Down' in world_system.axes() \
+        else initial_view_pix4d_omega_phi_kappa()
+    return angles_from_sequence(convention), world_system, initial_view
+
+
+def render(args):
+    '''
+    Headless QA snapshots: one offscreen rendered PNG of the camera orientation per pose.
+    '''
+    import time
+    from lib.WorldSystem import camera_world_alignment_at_zero_photogrammetric
+    from lib.meshes import GROUND_LEVELS_OF_DETAIL
+    from lib.geometry_cache import geometry_cache
+    from lib.pose_io import open_text
+    from lib.batch_render import render_pose_file
+
+    definition, world_system, initial_view = angles_definition(args.convention, args.world)
+    geometry_cache.directory = args.geometry_cache
+
+    start = time.perf_counter()
+    input_file = open_text(args.input, 'r')
+    try:
+        statistics = render_pose_file(input_file, args.output_directory, definition.compile(world_system),
+                                      world_system, camera_world_alignment_at_zero_photogrammetric(), initial_view,
+                                      args.format, tuple(args.size), args.camera_model,
+                                      GROUND_LEVELS_OF_DETAIL[args.ground_detail], args.workers, args.chunk_size)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+    seconds = time.perf_counter() - start
+
+    poses = sum(worker['poses'] for worker in statistics.values())
+    for pid, worker in sorted(statistics.items()):
+        print('worker %d: %d chunks, %d snapshots, %.2f s, %.1f snapshots/s' % (
+            pid, worker['chunks'], worker['poses'], worker['seconds'],
+            worker['poses'] / worker['seconds'] if worker['seconds'] else 0.), file=sys.stderr)
+    print('rendered %d snapshots, %.2f s, %.1f snapshots/s' % (poses, seconds, poses / seconds), file=sys.stderr)
 
-class Visualization(HasTraits):
+
+def sensitivity_map(args, definition, world_system, workers=None):
     '''
-    Visualization class.
-    It holds the scene and takes care of the correspondence of
-    UI elements (slider) and 3D visualization.
+    Loads or computes the sensitivity map of the convention for the photogrammetric camera's viewing direction.
     '''
+    from lib.WorldSystem import camera_world_alignment_at_zero_photogrammetric
+    from lib.draw_scene import camera_alignment_matrix
+    from lib.sensitivity import compute_sensitivity_map
 
-    # Rotation variables:
-    angles = Instance(AngleControlPanel, ())
-    rotation_camera_to_world = Property(observe='angles:angle_applied_first:final, '
-                                                'angles:angle_applied_second:final, '
-                                                'angles:angle_applied_last:final')
-    def _get_rotation_camera_to_world(self):
-        return camera_to_world_rotation_matrix(
-            (np.deg2rad(self.angles.angle_applied_last.final), self.angles.angle_applied_last.definition),
-            (np.deg2rad(self.angles.angle_applied_second.final), self.angles.angle_applied_second.definition),
-            (np.deg2rad(self.angles.angle_applied_first.final), self.angles.angle_applied_first.definition),
-            self.world_system)
+    view_axis = camera_alignment_matrix(world_system, camera_world_alignment_at_zero_photogrammetric()).dot([0., 0., -1.])
+    return compute_sensitivity_map(args.sensitivity_directory, definition.compile(world_system),
+                                   args.sensitivity_step, tuple(view_axis), workers)
 
-    # 3D Viewer
-    mayavi_scene = Instance(MlabSceneModel, ())
-    view3d = Item('mayavi_scene', show_label=False, editor=SceneEditor(scene_class=MayaviScene))
 
-    # Complete GUI
-    view = View(view3d,
-                Item('angles', style="custom", show_label=False),
-                Group(Item('rotation_camera_to_world')),
-                resizable=True)
+def report_sensitivity(args):
+    '''
+    Conditioning and view sensitivity of a convention over all angles, and within a flight envelope.
+    '''
+    import numpy as np
 
-    def __init__(self, _euler_angle_definition, world_system, camera_world_alignment_at_zero, initial_view, **traits):
-        HasTraits.__init__(self)
+    definition, world_system, _ = angles_definition(args.convention, args.world)
+    sensitivity = sensitivity_map(args, definition, world_system, args.workers)
+    names = sensitivity.convention.angle_names
 
-        self.world_system = world_system
-        self.camera_world_alignment_at_zero = camera_world_alignment_at_zero
-        self.initial_view = initial_view
+    print('map: %s (%d^3 poses, %.1f s to compute)' % (sensitivity.path, len(sensitivity.conditioning),
+                                                        sensitivity.compute_seconds), file=sys.stderr)
+    ranges = [tuple(float(v) for v in envelope.split(':')) for envelope in args.envelope.split(',')] \
+        if args.envelope else [(-180., 180.)] * 3
+    conditioning, view_sensitivity = sensitivity.envelope(*ranges)
+    print('envelope: %s' % ', '.join('%s %g..%g' % ((name,) + r) for name, r in zip(names, ranges)))
+    print('minimum conditioning: %.3f (0: gimbal lock)' % conditioning)
+    print('maximum view change per angle change: %s' % ', '.join(
+        '%s %.2f' % (name, value) for name, value in zip(names, view_sensitivity)))
+    if not args.envelope:
+        print('poses with conditioning below 0.1: %.2f%%' % (100. * np.mean(
+            [np.mean(row < 0.1) for row in sensitivity.conditioning])))
 
-        # Setup euler angles definition specific control panel
-        self.angles.angle_applied_first.definition  = _euler_angle_definition.angles_in_order_applied[0]
-        self.angles.angle_applied_second.definition = _euler_angle_definition.angles_in_order_applied[1]
-        self.angles.angle_applied_last.definition   = _euler_angle_definition.angles_in_order_applied[2]
 
-    @on_trait_change('mayavi_scene.activated')
-    def initialize_scene(self):
-        # We setup the scene outside the constructor as mayavi can only
-        # initialize certain scene elements (e.g. text3d) properly after a view
-        # on it is open. https://mayavi.readthedocs.io/en/latest/building_applications.html
+def add_footprint_arguments(parser):
+    parser.add_argument('--sensor', type=float, nargs=2, default=[4., 3.], metavar=('WIDTH', 'HEIGHT'),
+                        help='sensor size for footprints (default: 4 3, the aspect ratio of the drawn camera)')
+    parser.add_argument('--focal-length', type=float, default=None,
+                        help='focal length in the unit of --sensor (default: the larger sensor side)')
+    parser.add_argument('--ground-height', type=float, default=0.,
+                        help='height of the ground plane above the world origin (default: 0)')
+    parser.add_argument('--max-range', type=float, default=None,
+                        help='treat corner rays hitting the ground farther away as misses')
 
-        self.camera_mesh = generate_aligned_camera_mesh(self.world_system, self.camera_world_alignment_at_zero)
-        self.world_to_camera_translation = world_origin_to_camera_origin(self.world_system)
 
-        self.camera3d = self.mayavi_scene.mlab.triangular_mesh(
-            self.camera_mesh.x + self.world_to_camera_translation[0],
-            self.camera_mesh.y + self.world_to_camera_translation[1],
-            self.camera_mesh.z + self.world_to_camera_translation[2],
-            self.camera_mesh.faces, opacity=0.5, representation='fancymesh', name='camera')
+def write_footprints(args):
+    '''
+    Ground footprints of all images of a pose file, streamed in chunks.
+    '''
+    import time
+    from lib.pose_io import open_text
+    from lib.footprints import corner_rays, convert_pose_file_to_footprints
 
-        draw_world_with_coordinate_system_at_origin(self.mayavi_scene, self.world_system)
+    definition, world_system, _ = angles_definition(args.convention, args.world)
+    start = time.perf_counter()
+    input_file = open_text(args.input, 'r')
+    output_file = open_text(args.output, 'w')
+    try:
+        poses, complete = convert_pose_file_to_footprints(
+            input_file, output_file, definition.compile(world_system), corner_rays(*args.sensor, args.focal_length),
+            args.format, args.ground_height, args.max_range, args.workers, args.chunk_size)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    seconds = time.perf_counter() - start
 
-        self.mayavi_scene.mlab.view(azimuth=self.initial_view[0], elevation=self.initial_view[1], roll=self.initial_view[2], distance=10)
-        self.mayavi_scene.mlab.text(0,0, "camera system: \n"
-                                         "x: camera right \n"
-                                         "y: camera top (indicated by hat) \n"
-                                         "z: camera back (indicated by pyramid)")
+    print('%d footprints, %d with corners above the horizon or out of range, %.2f s, %.0f poses/s' % (
+        poses, poses - complete, seconds, poses / seconds), file=sys.stderr)
 
-    @on_trait_change('rotation_camera_to_world')
-    def update_plot(self):
 
-        # The orientation of the camera mesh will be updated on user input
-        x_camera_in_world, y_camera_in_world, z_camera_in_world = \
-            (self.rotation_camera_to_world.dot(np.array([self.camera_mesh.x, self.camera_mesh.y, self.camera_mesh.z])))
-        self.camera3d.mlab_source.trait_set(x=x_camera_in_world + self.world_to_camera_translation[0],
-                                            y=y_camera_in_world + self.world_to_camera_translation[1],
-                                            z=z_camera_in_world + self.world_to_camera_translation[2])
+def convention_argument(value):
+    '''
+    Argument type of a convention with optional world system, e.g. ypr, opk or ZYX:NED.
+    '''
+    from lib.conventions import SEQUENCES, WORLD_SYSTEMS
+
+    convention, _, world = value.partition(':')
+    if convention not in ['ypr', 'opk'] + list(SEQUENCES) or (world and world not in WORLD_SYSTEMS):
+        raise argparse.ArgumentTypeError('unknown convention or world system: ' + value)
+    return convention, world or None
+
+
+def diff_poses(args):
+    '''
+    Orientation differences of the images in two pose files, streamed in chunks.
+    '''
+    import time
+    from lib.pose_io import open_text
+    from lib.pose_diff import compare_pose_files
+
+    conventions = []
+    for convention, world in (args.convention_a, args.convention_b):
+        definition, world_system, _ = angles_definition(convention, world)
+        conventions.append(definition.compile(world_system))
+
+    start = time.perf_counter()
+    file_a, file_b = open_text(args.poses_a, 'r'), open_text(args.poses_b, 'r')
+    pairs_file = open_text(args.pairs, 'w') if args.pairs else None
+    try:
+        differences, only_a, only_b = compare_pose_files(
+            file_a, file_b, *conventions, args.format_a, args.format_b, args.chunk_size, args.max_pending,
+            args.partitions, args.worst, pairs_file)
+    finally:
+        for f in (file_a, file_b, pairs_file):
+            if f not in (None, sys.stdin, sys.stdout):
+                f.close()
+    seconds = time.perf_counter() - start
+
+    pairs = differences.errors.count
+    print('%d pairs, %d images only in %s, %d only in %s, %.2f s, %.0f pairs/s' % (
+        pairs, only_a, args.poses_a, only_b, args.poses_b, seconds, pairs / seconds), file=sys.stderr)
+    if not pairs:
+        return
+
+    errors = differences.errors
+    print('angular error [deg]: mean %.4f, rms %.4f, std %.4f, max %.4f' % (
+        errors.mean[0], errors.rms[0], errors.std[0], errors.maximum[0]))
+    print('bias per camera axis [deg] (mean, std):')
+    for axis, mean, std in zip(('right', 'top', 'back'), differences.boresight.mean, differences.boresight.std):
+        print('  %-6s %9.4f %9.4f' % (axis, mean, std))
+    print('bias per angle of %s [deg] (mean, std), %d poses in gimbal lock left out:' % (
+        ' '.join(conventions[1].angle_names[::-1]), differences.near_singular))
+    for name, mean, std in reversed(list(zip(conventions[1].angle_names, differences.angles.mean,
+                                             differences.angles.std))):
+        print('  %-6s %9.4f %9.4f' % (name, mean, std))
+    print('worst %d:' % args.worst)
+    for name, error in differences.worst.items():
+        print('  %s %.4f' % (name, error))
 
 
 def run():
@@ -103,27 +303,229 @@ def run():
                 w.r.t to an ENU world (scene).
     '''
 
+    from lib.conventions import SEQUENCES, WORLD_SYSTEMS
+
     parser = argparse.ArgumentParser(description='Process some integers.')
-    parser.add_argument('-c', '--convention', default='ypr', choices=['ypr', 'opk'],
-                        help='sum the integers (default: find the max)')
+    parser.add_argument('-c', '--convention', default='ypr', choices=['ypr', 'opk'] + list(SEQUENCES),
+                        help='ypr, opk or a rotation sequence, upper case intrinsic (e.g. ZYX), '
+                             'lower case extrinsic (e.g. xyz)')
+    parser.add_argument('--world', default=None, choices=sorted(WORLD_SYSTEMS), metavar='SYSTEM',
+                        help='world system of a rotation sequence given by its axes\' initials (default: ENU)')
+    parser.add_argument('--camera-update', default='transform', choices=['transform', 'vertices'],
+                        help='update the camera via its actor transform (default) or by rewriting its vertices')
+    parser.add_argument('--camera-model', default=None,
+                        help='PLY, STL or OBJ model in camera coordinates to show instead of the camera outline')
+    parser.add_argument('--scene', default='merged', choices=['merged', 'separate'],
+                        help='build ground and axes as one merged actor (default) or one pipeline per part')
+    parser.add_argument('--ground-detail', default='medium', choices=['low', 'medium', 'high', 'ultra'],
+                        help='ground grid resolution (default: medium, a 0.1 step)')
+    parser.add_argument('--geometry-cache', default=None, metavar='DIRECTORY',
+                        help='also keep generated geometry as .npz files and the parsed --camera-model '
+                             'in DIRECTORY for later launches')
+    parser.add_argument('--max-fps', type=float, default=30.,
+                        help='maximum redraw rate while moving the angle sliders')
+    parser.add_argument('--poses', default=None,
+                        help='.npz file with (N,3) "positions" and (N,3) "angles" in degrees (ordered as applied) '
+                             'to show all poses at once')
+    parser.add_argument('--camera-scale', type=float, default=1.,
+                        help='size of the camera frustums when showing --poses')
+    parser.add_argument('--footprints', action='store_true',
+                        help='with --poses, also draw the ground footprints of all poses')
+    add_footprint_arguments(parser)
+    parser.add_argument('--compare', nargs='+', default=None, metavar='CONVENTION[:SYSTEM]',
+                        help='split view comparing conventions side by side for the same angles, '
+                             'e.g. --compare ypr opk ZYX:NED')
+    parser.add_argument('--playback', default=None,
+                        help='attitude time series to replay: .npz with "times" and "angles", or a .csv/text file '
+                             'with the columns time and the angles in degrees (ordered as applied)')
+    parser.add_argument('--playback-fps', type=float, default=30., help='frame rate of the playback')
+    parser.add_argument('--playback-speed', type=float, default=1., help='playback time relative to real time')
+    parser.add_argument('--sensitivity', dest='sensitivity_directory', default=None, metavar='DIRECTORY',
+                        help='overlay the conditioning and view sensitivity of the current pose, from a map '
+                             'computed once and cached in DIRECTORY')
+    parser.add_argument('--sensitivity-step', type=float, default=1.,
+                        help='angle grid step of the sensitivity map in degrees (default: 1)')
+    parser.add_argument('--angle-sigmas', type=float, nargs=3, default=None, metavar='SIGMA',
+                        help='standard deviations of the angles in degrees (ordered as applied): shows the '
+                             'attitude uncertainty of the current pose as point cloud')
+    parser.add_argument('--uncertainty-samples', type=int, default=100000,
+                        help='Monte Carlo samples of the uncertainty cloud (default: 100000, at most 1000000)')
+    parser.add_argument('--latency-hud', action='store_true',
+                        help='time angle changes from input to rendered frame per stage and show the '
+                             'p50/p95/p99 in the scene')
+    parser.add_argument('--latency-report', default=None, metavar='FILE',
+                        help='time angle changes per stage and write the statistics as JSON on exit')
+    parser.add_argument('--latency-trace', default=None, metavar='FILE',
+                        help='time angle changes per stage and write the frames as Chrome trace on exit '
+                             '(chrome://tracing, Perfetto)')
+    parser.add_argument('--telemetry', default=None, metavar='HOST:PORT',
+                        help='follow a live attitude stream received on HOST:PORT')
+    add_telemetry_arguments(parser)
+
+    subparsers = parser.add_subparsers(dest='command')
+    convert_parser = subparsers.add_parser('convert', help='convert a pose file between conventions without GUI')
+    add_convert_arguments(convert_parser)
+    replay_parser = subparsers.add_parser('replay', help='send a recorded attitude log as telemetry stream')
+    replay_parser.add_argument('log', help='attitude time series, see --playback')
+    replay_parser.add_argument('--to', dest='address', default='127.0.0.1:5005', metavar='HOST:PORT',
+                               help='telemetry receiver (default: 127.0.0.1:5005)')
+    replay_parser.add_argument('--speed', type=float, default=1., help='replay time relative to real time')
+    add_telemetry_arguments(replay_parser)
+    sensitivity_parser = subparsers.add_parser('sensitivity', help='conditioning and gimbal lock proximity of a '
+                                                                   'convention over all angles (uses -c, --world '
+                                                                   'and --sensitivity-step)')
+    sensitivity_parser.add_argument('sensitivity_directory', metavar='DIRECTORY', help='cache of computed maps')
+    sensitivity_parser.add_argument('--envelope', default=None, metavar='MIN:MAX,MIN:MAX,MIN:MAX',
+                                    help='angle ranges in degrees ordered as applied, '
+                                         'e.g. --envelope=-180:180,-20:20,-30:30 for Roll, Pitch, Yaw')
+    sensitivity_parser.add_argument('--workers', type=int, default=None,
+                                    help='worker processes (default: number of cores)')
+    footprints_parser = subparsers.add_parser('footprints', help='ground footprints of all images of a pose file '
+                                                                 '(uses -c, --world and the footprint options)')
+    footprints_parser.add_argument('input', help='pose file ("-" for stdin), as for convert')
+    footprints_parser.add_argument('output', help='CSV of image and the four footprint corners in the horizontal '
+                                                  'world axes, nan for corners missing the ground ("-" for stdout)')
+    footprints_parser.add_argument('--format', default='csv', choices=['csv', 'pix4d'], help='pose file format')
+    footprints_parser.add_argument('--workers', type=int, default=1, help='worker processes (default: 1)')
+    footprints_parser.add_argument('--chunk-size', type=int, default=100000, help='lines processed at once')
+    diff_parser = subparsers.add_parser('diff', help='orientation differences of the same images in two pose files, '
+                                                     'e.g. IMU attitudes against a photogrammetric solution')
+    diff_parser.add_argument('poses_a', metavar='A', help='pose file ("-" for stdin), as for convert')
+    diff_parser.add_argument('poses_b', metavar='B', help='pose file to compare with A')
+    diff_parser.add_argument('--a', dest='convention_a', type=convention_argument, default=('ypr', None),
+                             metavar='CONVENTION[:SYSTEM]', help='convention of A (default: ypr)')
+    diff_parser.add_argument('--b', dest='convention_b', type=convention_argument, default=('opk', None),
+                             metavar='CONVENTION[:SYSTEM]', help='convention of B (default: opk)')
+    diff_parser.add_argument('--format-a', default='csv', choices=['csv', 'pix4d'], help='format of A')
+    diff_parser.add_argument('--format-b', default='csv', choices=['csv', 'pix4d'], help='format of B')
+    diff_parser.add_argument('--worst', type=int, default=10, help='number of outliers to list (default: 10)')
+    diff_parser.add_argument('--pairs', default=None, metavar='FILE',
+                             help='also write image, angular error and its right, top, back components per pair')
+    diff_parser.add_argument('--chunk-size', type=int, default=100000, help='lines processed at once')
+    diff_parser.add_argument('--max-pending', type=int, default=1000000,
+                             help='images kept waiting for their partner when joining files in a similar order')
+    diff_parser.add_argument('--partitions', type=int, default=None,
+                             help='split both files into this many temporary partitions by image first, '
+                                  'for files in unrelated image orders')
+    render_parser = subparsers.add_parser('render', help='render one PNG snapshot per pose of a pose file '
+                                                         'offscreen, without GUI (uses -c, --world, '
+                                                         '--camera-model and --ground-detail)')
+    render_parser.add_argument('input', help='pose file ("-" for stdin), as for convert')
+    render_parser.add_argument('output_directory', help='directory for the PNG files, named as the images')
+    render_parser.add_argument('--format', default='csv', choices=['csv', 'pix4d'], help='pose file format')
+    render_parser.add_argument('--size', type=int, nargs=2, default=[320, 240], metavar=('WIDTH', 'HEIGHT'),
+                               help='snapshot size in pixels (default: 320 240)')
+    render_parser.add_argument('--workers', type=int, default=1,
+                               help='worker processes, each rendering into its own offscreen window (default: 1)')
+    render_parser.add_argument('--chunk-size', type=int, default=256, help='poses read and rendered at once')
+
     args = parser.parse_args()
+    if not 0 < args.uncertainty_samples <= 1000000:
+        parser.error('--uncertainty-samples has to be within 1 and 1000000')
+    if args.command == 'convert':
+        return convert(args)
+    if args.command == 'replay':
+        return replay(args)
+    if args.command == 'render':
+        return render(args)
+    if args.command == 'footprints':
+        return write_footprints(args)
+    if args.command == 'sensitivity':
+        return report_sensitivity(args)
+    if args.command == 'diff':
+        return diff_poses(args)
+
+    from lib.WorldSystem import camera_world_alignment_at_zero_photogrammetric
+    from lib.Visualization import Visualization
 
-    if args.convention == 'ypr':
-        euler_angle_definition = angles_yaw_pitch_roll()
-        world_system = system_NED()
-        initial_view = initial_view_yaw_pitch_roll()
-    elif args.convention == 'opk':
-        euler_angle_definition = angles_pix4d_omega_phi_kappa()
-        world_system = system_ENU()
-        initial_view = initial_view_pix4d_omega_phi_kappa()
+    euler_angle_definition, world_system, initial_view = angles_definition(args.convention, args.world)
+
+    if args.geometry_cache is not None:
+        from lib.geometry_cache import geometry_cache
+        geometry_cache.directory = args.geometry_cache
 
     camera_world_alignment_at_zero = camera_world_alignment_at_zero_photogrammetric()
 
     # Numpy <-> Python string comparison problem not yet addressed in mayavi
     # https://stackoverflow.com/questions/40659212/futurewarning-elementwise-comparison-failed-returning-scalar-but-in-the-futur
     warnings.simplefilter(action='ignore', category=FutureWarning)
-    visualization = Visualization(euler_angle_definition, world_system, camera_world_alignment_at_zero, initial_view)
+
+    if args.compare is not None:
+        from lib.SplitViewVisualization import SplitViewVisualization
+
+        viewports = []
+        for name in args.compare:
+            convention, _, world = name.partition(':')
+            if convention not in ['ypr', 'opk'] + list(SEQUENCES) or (world and world not in WORLD_SYSTEMS):
+                parser.error('unknown convention or world system: ' + name)
+            definition, viewport_world_system, _ = angles_definition(convention, world or args.world)
+            viewports.append((definition, viewport_world_system))
+        visualization = SplitViewVisualization(viewports, camera_world_alignment_at_zero, initial_view,
+                                               max_fps=args.max_fps, ground_detail=args.ground_detail)
+        visualization.configure_traits()
+        return
+
+    if args.poses is not None:
+        import numpy as np
+        from lib.rotations import rotation_matrices
+        from lib.MultiPoseVisualization import MultiPoseVisualization
+
+        poses = np.load(args.poses)
+        convention = euler_angle_definition.compile(world_system)
+        rotations = rotation_matrices(convention, np.deg2rad(poses['angles']))
+        footprints = None
+        if args.footprints:
+            from lib.footprints import corner_rays, ground_footprints, footprint_vertices
+
+            ground, hits = ground_footprints(convention, poses['positions'], poses['angles'],
+                                             corner_rays(*args.sensor, args.focal_length), args.ground_height,
+                                             args.max_range)
+            footprints = (footprint_vertices(ground, convention.world_axes, args.ground_height), hits.all(axis=1))
+        visualization = MultiPoseVisualization(poses['positions'], rotations, world_system,
+                                               camera_world_alignment_at_zero, initial_view,
+                                               angles=poses['angles'], camera_scale=args.camera_scale,
+                                               footprints=footprints)
+        visualization.configure_traits()
+        return
+
+    telemetry = None
+    if args.telemetry is not None:
+        from lib.telemetry import TelemetryListener
+
+        host, port = parse_address(args.telemetry)
+        telemetry = TelemetryListener(host, port, euler_angle_definition.compile(world_system),
+                                      args.telemetry_protocol, args.telemetry_format)
+
+    playback = None
+    if args.playback is not None:
+        from lib.playback import load_angle_time_series, trajectory_from_angles, PlaybackEngine
+
+        times, angles = load_angle_time_series(args.playback)
+        trajectory = trajectory_from_angles(euler_angle_definition.compile(world_system), times, angles)
+        playback = PlaybackEngine(trajectory, fps=args.playback_fps, speed=args.playback_speed)
+
+    sensitivity = None
+    if args.sensitivity_directory is not None:
+        sensitivity = sensitivity_map(args, euler_angle_definition, world_system)
+
+    latency = None
+    if args.latency_hud or args.latency_report or args.latency_trace:
+        from lib.latency import LatencyTracker
+        latency = LatencyTracker()
+
+    visualization = Visualization(euler_angle_definition, world_system, camera_world_alignment_at_zero, initial_view,
+                                  camera_update=args.camera_update, camera_model=args.camera_model,
+                                  max_fps=args.max_fps, playback=playback, telemetry=telemetry,
+                                  scene_build=args.scene, ground_detail=args.ground_detail,
+                                  sensitivity=sensitivity, angle_sigmas=args.angle_sigmas,
+                                  uncertainty_samples=args.uncertainty_samples,
+                                  latency=latency, latency_hud=args.latency_hud)
     visualization.configure_traits()
 
+    if args.latency_report:
+        latency.export_json(args.latency_report)
+    if args.latency_trace:
+        latency.export_chrome_trace(args.latency_trace)
+
 if __name__ == '__main__':
     run()
\ No newline at end of file
@@ -28,6 +28,18 @@ class AngleControl(HasTraits):
     def _get_final(self):
         return self.initial + self.add_diff
 
+    # Optional callable notified of typed angles and slider moves before final changes,
+    # e.g. lib.latency.LatencyTracker.input
+    input_listener = None
+
+    def _initial_changed(self):
+        if self.input_listener is not None:
+            self.input_listener()
+
+    def _add_diff_changed(self):
+        if self.input_listener is not None:
+            self.input_listener()
+
     # UI elements
     label = Property(depends_on='definition.name')
     def _get_label(self):
@@ -0,0 +1,104 @@
+import numpy as np
+
+from traits.api import HasTraits, Instance, Int, Float, Str, Button, on_trait_change
+from traitsui.api import View, Item, HGroup
+
+from tvtk.pyface.scene_editor import SceneEditor
+
+from mayavi.tools.mlab_scene_model import MlabSceneModel
+from mayavi.core.ui.mayavi_scene import MayaviScene
+
+from lib.draw_scene import generate_aligned_camera_mesh, measure_frames_per_second
+from lib.meshes import merge_posed_meshes
+from lib.scene_actors import footprints_actor
+
+
+class MultiPoseVisualization(HasTraits):
+    '''
+    Multi-pose visualization.
+    Draws the camera frustums of many poses (e.g. a whole photogrammetry block)
+    merged into a single actor, colored per pose via vertex scalars.
+    A pose is selected by clicking its frustum or entering its index and is
+    highlighted by changing its vertex scalars only, the geometry stays untouched.
+    Ground footprints of the poses can be drawn as one further actor.
+    '''
+
+    mayavi_scene = Instance(MlabSceneModel, ())
+    view3d = Item('mayavi_scene', show_label=False, editor=SceneEditor(scene_class=MayaviScene))
+
+    selected_pose = Int(-1)
+    selected_angles = Str()
+
+    measure_fps = Button('Measure FPS')
+    frames_per_second = Float()
+
+    view = View(view3d,
+                HGroup(Item('selected_pose'), Item('selected_angles', show_label=False, style="readonly")),
+                HGroup(Item('measure_fps', show_label=False), Item('frames_per_second', style="readonly")),
+                resizable=True)
+
+    def __init__(self, positions, rotations, world_system, camera_world_alignment_at_zero, initial_view,
+                 angles=None, camera_scale=1., footprints=None, **traits):
+        '''
+        positions: (N,3) camera centers in the world system
+        rotations: (N,3,3) camera to world rotations, e.g. from lib.rotations.rotation_matrices()
+        angles: optional (N,3) angles shown for the selected pose
+        footprints: optional ((N,4,3) footprint vertices, (N,) True if all corners are on the ground),
+                    see lib.footprints
+        '''
+        HasTraits.__init__(self)
+
+        self.positions = positions
+        self.rotations = rotations
+        self.world_system = world_system
+        self.camera_world_alignment_at_zero = camera_world_alignment_at_zero
+        self.initial_view = initial_view
+        self.angles = angles
+        self.camera_scale = camera_scale
+        self.footprints = footprints
+
+    @on_trait_change('mayavi_scene.activated')
+    def initialize_scene(self):
+        camera_mesh = generate_aligned_camera_mesh(self.world_system, self.camera_world_alignment_at_zero)
+        self.vertices_per_pose = len(camera_mesh.x)
+        self.faces_per_pose = len(camera_mesh.faces)
+
+        poses_mesh = merge_posed_meshes(camera_mesh, self.rotations, self.positions, self.camera_scale)
+        pose_scalars = np.zeros(len(poses_mesh.vertices))
+
+        self.poses3d = self.mayavi_scene.mlab.triangular_mesh(
+            poses_mesh.x, poses_mesh.y, poses_mesh.z, poses_mesh.faces, scalars=pose_scalars,
+            vmin=0., vmax=1., colormap='cool', opacity=0.5, name='poses')
+
+        if self.footprints is not None:
+            self.mayavi_scene.add_actors(footprints_actor(*self.footprints))
+
+        self.mayavi_scene.mlab.orientation_axes(xlabel=self.world_system.x_axis,
+                                                ylabel=self.world_system.y_axis,
+                                                zlabel=self.world_system.z_axis)
+        self.mayavi_scene.mlab.view(azimuth=self.initial_view[0], elevation=self.initial_view[1],
+                                    roll=self.initial_view[2], distance='auto', focalpoint='auto')
+
+        self.mayavi_scene.mayavi_scene.on_mouse_pick(self.pick_pose, type='cell')
+
+    def pick_pose(self, picker):
+        if picker.actor in self.poses3d.actor.actors and picker.cell_id >= 0:
+            self.selected_pose = picker.cell_id // self.faces_per_pose
+
+    def _selected_pose_changed(self, old, new):
+        if not hasattr(self, 'poses3d'):
+            return
+
+        scalars = self.poses3d.mlab_source.scalars
+        for pose, value in ((old, 0.), (new, 1.)):
+            if 0 <= pose < len(self.positions):
+                scalars[pose * self.vertices_per_pose:(pose + 1) * self.vertices_per_pose] = value
+        self.poses3d.mlab_source.update()
+
+        if self.angles is not None and 0 <= new < len(self.positions):
+            self.selected_angles = ', '.join('%.3f' % angle for angle in self.angles[new])
+        else:
+            self.selected_angles = ''
+
+    def _measure_fps_fired(self):
+        self.frames_per_second = measure_frames_per_second(self.mayavi_scene)
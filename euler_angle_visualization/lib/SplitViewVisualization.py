@@ -0,0 +1,150 @@
+import numpy as np
+
+from traits.api import HasTraits, Instance, Array, Str, on_trait_change
+from traitsui.api import View, Item, Group
+
+from pyface.api import GUI
+from tvtk.api import tvtk
+from tvtk.pyface.scene_editor import SceneEditor
+
+from mayavi.tools.mlab_scene_model import MlabSceneModel
+from mayavi.core.ui.mayavi_scene import MayaviScene
+
+from lib.AngleControl import AngleControlPanel
+from lib.TaitBryanRotation import ElementalRotationDefinition
+from lib.rotations import IntegerDegreeRotationTables
+from lib.conventions import world_system_name
+from lib.meshes import GROUND_LEVELS_OF_DETAIL
+from lib.render_scheduler import RenderScheduler
+from lib.scene_actors import mesh_polydata, polydata_actor, merged_world_actors
+from lib.draw_scene import world_origin_to_camera_origin, generate_aligned_camera_mesh, camera_to_scene_transform, \
+        camera_alignment_matrix
+
+
+class SplitViewVisualization(HasTraits):
+    '''
+    Split view comparing several conventions side by side.
+
+    Each viewport shows the camera for one (TaitBryanAnglesDefinition, WorldSystem) pair.
+    All viewports are renderers of one render window, share the view camera and one set
+    of input angles. Per update the rotations of all viewports are computed in one
+    batched call (see lib.rotations.IntegerDegreeRotationTables).
+    The static world is built once per world system as one merged mesh and one label actor
+    (see lib.scene_actors.merged_world_actors()) and shared by all viewports using it,
+    the camera geometry once per camera alignment.
+    '''
+
+    angles = Instance(AngleControlPanel, ())
+    rotations_camera_to_world = Array()
+    rotations_text = Str()
+    render_statistics = Str()
+
+    mayavi_scene = Instance(MlabSceneModel, ())
+    view3d = Item('mayavi_scene', show_label=False, editor=SceneEditor(scene_class=MayaviScene))
+
+    view = View(view3d,
+                Item('angles', style="custom", show_label=False),
+                Group(Item('rotations_text', show_label=False, style="readonly"),
+                      Item('render_statistics', show_label=False, style="readonly")),
+                resizable=True)
+
+    def __init__(self, definitions_and_world_systems, camera_world_alignment_at_zero, initial_view,
+                 max_fps=30., ground_detail='medium', **traits):
+        '''
+        definitions_and_world_systems: list of (TaitBryanAnglesDefinition, WorldSystem), one per viewport
+        '''
+        HasTraits.__init__(self)
+
+        self.viewports = definitions_and_world_systems
+        self.camera_world_alignment_at_zero = camera_world_alignment_at_zero
+        self.initial_view = initial_view
+        self.ground_step = GROUND_LEVELS_OF_DETAIL[ground_detail]
+        self.titles = ['%s (%s)' % (' '.join(reversed([d.angle_name for d in definition.angles_in_order_applied])),
+                                    world_system_name(world_system.axes()))
+                       for definition, world_system in self.viewports]
+        self.rotation_tables = IntegerDegreeRotationTables(
+            [definition.compile(world_system) for definition, world_system in self.viewports])
+        self.rotations_camera_to_world = np.tile(np.identity(3), (len(self.viewports), 1, 1))
+        self.render_scheduler = RenderScheduler(
+            self.render_frame, lambda delay, callback: GUI.invoke_after(int(1000 * delay), callback), max_fps)
+
+        # One set of angles for all viewports, labeled with the angle names of all conventions
+        for n, control in enumerate((self.angles.angle_applied_first,
+                                     self.angles.angle_applied_second,
+                                     self.angles.angle_applied_last)):
+            control.definition = ElementalRotationDefinition(angle_name=' / '.join(
+                definition.angles_in_order_applied[n].angle_name for definition, _ in self.viewports))
+
+    @on_trait_change('angles.angle_applied_first.final, '
+                     'angles.angle_applied_second.final, '
+                     'angles.angle_applied_last.final')
+    def request_update(self):
+        self.render_scheduler.request()
+
+    def render_frame(self):
+        rotations = self.rotation_tables.rotation_matrices(self.angles.angle_applied_first.final,
+                                                           self.angles.angle_applied_second.final,
+                                                           self.angles.angle_applied_last.final)
+        if np.array_equal(rotations, self.rotations_camera_to_world):
+            return False
+        self.rotations_camera_to_world = rotations
+        self.rotations_text = '\n'.join('%s:\n%s' % (title, np.array2string(rotation, precision=3, suppress_small=True))
+                                        for title, rotation in zip(self.titles, rotations))
+        self.render_statistics = 'frames: {frames}, merged events: {merged_events}, ' \
+                                 'dropped events: {dropped_events}'.format(**self.render_scheduler.statistics())
+
+    @on_trait_change('mayavi_scene.activated')
+    def initialize_scene(self):
+        scene = self.mayavi_scene
+        camera = scene.renderer.active_camera
+
+        # The scene's renderer is the first viewport, further renderers share its camera
+        self.renderers = [scene.renderer]
+        for _ in self.viewports[1:]:
+            renderer = tvtk.Renderer(background=scene.renderer.background)
+            renderer.active_camera = camera
+            scene.render_window.add_renderer(renderer)
+            self.renderers.append(renderer)
+
+        world_actors_by_system = {}
+        camera_polydata_by_alignment = {}
+        self.camera_user_matrices = []
+        self.world_to_camera_translations = []
+        for n, (renderer, (_, world_system), title) in enumerate(zip(self.renderers, self.viewports, self.titles)):
+            renderer.viewport = (n / len(self.viewports), 0., (n + 1) / len(self.viewports), 1.)
+
+            axes = world_system.axes()
+            if axes not in world_actors_by_system:
+                world_actors_by_system[axes] = merged_world_actors(world_system, ground_step=self.ground_step)
+            for actor in world_actors_by_system[axes]:
+                renderer.add_actor(actor)
+
+            alignment = camera_alignment_matrix(world_system, self.camera_world_alignment_at_zero).tobytes()
+            if alignment not in camera_polydata_by_alignment:
+                camera_polydata_by_alignment[alignment] = mesh_polydata(
+                    generate_aligned_camera_mesh(world_system, self.camera_world_alignment_at_zero))
+            camera_actor = polydata_actor(camera_polydata_by_alignment[alignment])
+            camera_actor.property.trait_set(opacity=0.5, edge_visibility=True)
+            camera_actor.user_matrix = tvtk.Matrix4x4()
+            renderer.add_actor(camera_actor)
+            self.camera_user_matrices.append(camera_actor.user_matrix)
+            self.world_to_camera_translations.append(world_origin_to_camera_origin(world_system))
+
+            renderer.add_actor2d(tvtk.TextActor(input=title, position=(10, 10)))
+
+        self.update_plot()
+        scene.mlab.view(azimuth=self.initial_view[0], elevation=self.initial_view[1], roll=self.initial_view[2],
+                        distance=10)
+
+    @on_trait_change('rotations_camera_to_world')
+    def update_plot(self):
+        if not hasattr(self, 'camera_user_matrices'):
+            return
+
+        self.mayavi_scene.disable_render = True
+        try:
+            for user_matrix, rotation, translation in zip(self.camera_user_matrices, self.rotations_camera_to_world,
+                                                          self.world_to_camera_translations):
+                user_matrix.from_array(camera_to_scene_transform(rotation, translation))
+        finally:
+            self.mayavi_scene.disable_render = False
@@ -1,6 +1,8 @@
 from traits.api import HasTraits, Bool, Enum, List, Str
 
-from numpy import array, cos, sin
+from lib.conventions import WORLD_AXIS_DIRECTIONS, sequence_rotations
+from lib.rotations import compile_convention, compile_elemental_rotation, elemental_rotation_matrix, \
+        rotation_matrices, angles_from_rotation_matrices
 
 class ElementalRotationDefinition(HasTraits):
     '''
@@ -21,6 +23,14 @@ class TaitBryanAnglesDefinition(HasTraits):
     '''
     angles_in_order_applied = List(ElementalRotationDefinition)
 
+    def compile(self, world_system):
+        '''
+        Returns the traits-free CompiledConvention used by the rotation math.
+        '''
+        return compile_convention([(definition.angle_name, definition.axis, definition.isClockwiseCameraSystemRotation)
+                                   for definition in self.angles_in_order_applied],
+                                  world_system.axes())
+
 
 def angles_yaw_pitch_roll():
     '''
@@ -59,45 +69,18 @@ def angles_pix4d_omega_phi_kappa():
     return definition
 
 
-def camera_to_world_rotation_around_x(cc_angle = 0):
-    '''
-    Compute a rotation matrix that is used to transform
-    a point in camera coordinates to a point in world coordinates.
-    when the camera(system) rotates counter-clockwise.
-    (Seeing the camera(system) as fixed, the rotation
-    would transform points clockwise around its x axis)
-    '''
-    return array([[1.,   0.,             0.],
-                  [0.,   cos(cc_angle),  -sin(cc_angle)],
-                  [0.,   sin(cc_angle),  cos(cc_angle)]])
-
-
-def camera_to_world_rotation_around_y(cc_angle = 0):
-    '''
-    Compute a rotation matrix that is used to transform
-    a point in camera coordinates to a point in world coordinates.
-    when the camera(system) rotates counter-clockwise.
-    (Seeing the camera(system) as fixed, the rotation
-    would transform points clockwise around its x axis)
-    '''
-
-    return array([[cos(cc_angle),    0., sin(cc_angle)],
-                  [0.,               1., 0.],
-                  [-sin(cc_angle),   0., cos(cc_angle)]])
-
-
-def camera_to_world_rotation_around_z(cc_angle = 0):
+def angles_from_sequence(sequence):
     '''
-    Compute a rotation matrix that is used to transform
-    a point in camera coordinates to a point in world coordinates
-    when the camera(system) rotates counter-clockwise.
-    (Seeing the camera(system) as fixed, the rotation
-    would transform points clockwise around its x axis)
+    Returns a definition of the angles of a registered rotation sequence,
+    e.g. 'ZYX' or 'zxz', see lib.conventions.SEQUENCES.
     '''
+    definition = TaitBryanAnglesDefinition()
+    for angle_name, axis, isClockwiseCameraSystemRotation in sequence_rotations(sequence):
+        definition.angles_in_order_applied.append(
+            ElementalRotationDefinition(angle_name=angle_name, axis=axis,
+                                        isClockwiseCameraSystemRotation=isClockwiseCameraSystemRotation))
 
-    return array([[cos(cc_angle),    -sin(cc_angle), 0.],
-                  [sin(cc_angle),    cos(cc_angle),  0.],
-                  [0.,               0.,             1.]])
+    return definition
 
 
 def world_angle(angle, world_axis):
@@ -105,9 +88,8 @@ def world_angle(angle, world_axis):
     Correction on the angle for possibly inverted axes
     due to the world system definition (w.r.t. the mayavi world system)
     '''
-    if(world_axis in ['Down', 'West', 'South']):
-        angle = -angle
-    return angle
+    _, sign = WORLD_AXIS_DIRECTIONS[world_axis]
+    return sign * angle
 
 
 def elemental_rotation(angle_and_definition, worldsystem):
@@ -117,15 +99,9 @@ def elemental_rotation(angle_and_definition, worldsystem):
     given an euler angle and its definition.
     '''
     angle, definition = angle_and_definition
-    if (definition.isClockwiseCameraSystemRotation):
-        angle = -angle
-
-    if definition.axis == 'around_x':
-        return camera_to_world_rotation_around_x(world_angle(angle, worldsystem.x_axis))
-    if definition.axis == 'around_y':
-        return camera_to_world_rotation_around_y(world_angle(angle, worldsystem.y_axis))
-    if definition.axis == 'around_z':
-        return camera_to_world_rotation_around_z(world_angle(angle, worldsystem.z_axis))
+    axis, sign = compile_elemental_rotation(definition.axis, definition.isClockwiseCameraSystemRotation,
+                                            worldsystem.axes())
+    return elemental_rotation_matrix(axis, sign * angle)
 
 
 def camera_to_world_rotation_matrix(first_angle_and_definition,
@@ -142,3 +118,27 @@ def camera_to_world_rotation_matrix(first_angle_and_definition,
     return elemental_rotation(last_angle_and_definition, world_system).dot(
             elemental_rotation(second_angle_and_definition, world_system)).dot(
                 elemental_rotation(first_angle_and_definition, world_system))
+
+
+def camera_to_world_rotation_matrices(angles, definition, world_system):
+    '''
+    Vectorized version of camera_to_world_rotation_matrix():
+    Computes a (N,3,3) stack of rotation matrices that transform
+    points in camera coordinates to points in world coordinates.
+
+    angles: (N,3) array of Tait-Bryan angles in radians, the columns
+            ordered as definition.angles_in_order_applied.
+
+    The result equals camera_to_world_rotation_matrix() row by row,
+    called as by the visualization, i.e. with the angle applied last
+    passed first (matrices application order is opposite to reading order).
+    '''
+    return rotation_matrices(definition.compile(world_system), angles)
+
+
+def tait_bryan_angles_from_rotation_matrices(rotations, definition, world_system, gimbal_lock_tolerance=1e-6):
+    '''
+    Inverse of camera_to_world_rotation_matrices(),
+    see rotations.angles_from_rotation_matrices().
+    '''
+    return angles_from_rotation_matrices(definition.compile(world_system), rotations, gimbal_lock_tolerance)
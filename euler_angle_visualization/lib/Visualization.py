@@ -0,0 +1,383 @@
+from time import perf_counter
+
+import numpy as np
+
+from traits.api import HasTraits, Instance, Array, Str, List, Enum, on_trait_change
+from traitsui.api import View, Item, Group
+
+from pyface.api import GUI
+from tvtk.api import tvtk
+from tvtk.pyface.scene_editor import SceneEditor
+
+from mayavi.tools.mlab_scene_model import MlabSceneModel
+from mayavi.core.ui.mayavi_scene import MayaviScene
+
+from lib.AngleControl import AngleControlPanel
+from lib.rotations import IntegerDegreeRotationTable, rotation_matrix, angles_from_rotation_matrices
+from lib.conventions import SEQUENCES, registered_convention, world_system_name
+from lib.TaitBryanRotation import angles_from_sequence
+from lib.mesh_io import load_mesh
+from lib.meshes import GROUND_LEVELS_OF_DETAIL
+from lib.render_scheduler import RenderScheduler
+from lib.playback import Player
+from lib.sensitivity import sensitivity_fields
+from lib.scene_actors import merged_world_actors, point_cloud_actor, set_point_cloud
+from lib.uncertainty import UncertaintySampler
+from lib.draw_scene import draw_world_with_coordinate_system_at_origin, camera_alignment_matrix, \
+        world_origin_to_camera_origin, generate_aligned_camera_mesh, camera_to_scene_transform, pipeline_actors
+
+# Point colors of the optical axis and camera up endpoints of the uncertainty cloud
+UNCERTAINTY_COLORS = np.array([[255, 140, 0], [0, 200, 255]], dtype=np.uint8)
+
+
+class Visualization(HasTraits):
+    '''
+    Visualization class.
+    It holds the scene and takes care of the correspondence of
+    UI elements (slider) and 3D visualization.
+
+    camera_update selects how the camera pose is applied to the scene:
+    - 'transform':  The camera geometry is uploaded once and each update only replaces
+                    the 4x4 user matrix of its actors. Cost is independent of the mesh size.
+    - 'vertices':   Each update rotates all camera vertices and pushes them to VTK.
+
+    camera_model optionally replaces the generated camera mesh by a PLY/STL/OBJ model
+    given in camera coordinates (see lib.mesh_io.load_mesh).
+
+    Angle changes only request a frame from the render scheduler, which merges them,
+    recomputes the rotation at most once per frame and caps the frame rate at max_fps.
+
+    playback optionally replays a recorded trajectory (see lib.playback.PlaybackEngine)
+    once the scene is shown, instead of following the sliders.
+
+    telemetry optionally follows a live attitude stream (see lib.telemetry.TelemetryListener):
+    the newest received sample is shown at most max_fps times per second, older ones are skipped.
+    Its angles are composed in the listener's convention, also after switching the sequence.
+
+    The rotation sequence can be switched at runtime between the initial definition and all
+    registered sequences (see lib.conventions.SEQUENCES). Switching only exchanges the cached
+    compiled convention and the angle labels; the scene is not rebuilt.
+
+    scene_build selects how the static world (ground, axes and their labels) is built:
+    - 'merged':     One actor for ground and arrows with per-vertex colors and one actor
+                    for all labels (see lib.scene_actors.merged_world_actors).
+    - 'separate':   One mayavi pipeline per ground, arrow and label (previous behaviour).
+    The number of actors and the scene build time are shown below the scene.
+
+    ground_detail selects the ground grid step (see lib.meshes.GROUND_LEVELS_OF_DETAIL).
+    Generated geometry is cached (see lib.geometry_cache), so rebuilding the scene is cheap.
+
+    sensitivity optionally overlays the conditioning and the per angle view sensitivity of the current
+    pose from a precomputed lib.sensitivity.SensitivityMap. For other rotation sequences than the one
+    of the map, the values are evaluated directly.
+
+    angle_sigmas optionally shows the attitude uncertainty of the current angles: standard deviations
+    in degrees per angle (ordered as applied), from which uncertainty_samples poses are drawn (see
+    lib.uncertainty.UncertaintySampler). The endpoints of their optical axes (orange) and camera up
+    vectors (cyan) are drawn as one point cloud, refined progressively off the GUI thread.
+
+    latency optionally times each angle change from the input event to the rendered frame
+    per stage (see lib.latency.LatencyTracker). With latency_hud, the rolling p50/p95/p99
+    per stage are shown in the scene.
+    '''
+
+    # Rotation variables:
+    angles = Instance(AngleControlPanel, ())
+    rotation_camera_to_world = Array(value=np.identity(3))
+    render_statistics = Str()
+
+    # Initial definition followed by the registered sequences
+    sequence_names = List(Str)
+    sequence = Enum(values='sequence_names')
+
+    @on_trait_change('angles.angle_applied_first.final, '
+                     'angles.angle_applied_second.final, '
+                     'angles.angle_applied_last.final')
+    def request_update(self):
+        self.render_scheduler.request()
+
+    @on_trait_change('sequence')
+    def switch_sequence(self):
+        if self.sequence == self.sequence_names[0]:
+            self.set_angles_definition(self.initial_definition, self.initial_convention)
+        else:
+            self.set_angles_definition(angles_from_sequence(self.sequence),
+                                       registered_convention(self.sequence,
+                                                             world_system_name(self.world_system.axes())).convention)
+        self.render_scheduler.request()
+
+    def set_angles_definition(self, _euler_angle_definition, convention):
+        self.convention = convention
+        self.rotation_table = IntegerDegreeRotationTable(convention)
+
+        # Setup euler angles definition specific control panel
+        self.angles.angle_applied_first.definition  = _euler_angle_definition.angles_in_order_applied[0]
+        self.angles.angle_applied_second.definition = _euler_angle_definition.angles_in_order_applied[1]
+        self.angles.angle_applied_last.definition   = _euler_angle_definition.angles_in_order_applied[2]
+
+    def compute_rotation_camera_to_world(self):
+        # UI angles are whole degrees, so the rotation is composed from precomputed elemental rotations
+        return self.rotation_table.rotation_matrix(self.angles.angle_applied_first.final,
+                                                   self.angles.angle_applied_second.final,
+                                                   self.angles.angle_applied_last.final)
+
+    def render_frame(self):
+        '''
+        Called by the render scheduler once per frame.
+        Returns False if the merged angle changes did not change the rotation,
+        or if the scene is not initialized yet (it shows the current angles once it is).
+        '''
+        if not hasattr(self, 'camera3d'):
+            return False
+        rotation = self.compute_rotation_camera_to_world()
+        if self.latency is not None:
+            self.latency.mark('compute')
+        if np.array_equal(rotation, self.rotation_camera_to_world):
+            return False
+        self.rotation_camera_to_world = rotation
+        self.request_uncertainty((self.angles.angle_applied_first.final,
+                                  self.angles.angle_applied_second.final,
+                                  self.angles.angle_applied_last.final))
+        self.render_statistics = 'frames: {frames}, merged events: {merged_events}, ' \
+                                 'dropped events: {dropped_events}'.format(**self.render_scheduler.statistics())
+
+    # 3D Viewer
+    mayavi_scene = Instance(MlabSceneModel, ())
+    view3d = Item('mayavi_scene', show_label=False, editor=SceneEditor(scene_class=MayaviScene))
+
+    # Complete GUI
+    view = View(view3d,
+                Item('angles', style="custom", show_label=False),
+                Group(Item('sequence', label='rotation sequence'),
+                      Item('rotation_camera_to_world'),
+                      Item('render_statistics', show_label=False, style="readonly")),
+                resizable=True)
+
+    def __init__(self, _euler_angle_definition, world_system, camera_world_alignment_at_zero, initial_view,
+                 camera_update='transform', camera_model=None, max_fps=30., playback=None, telemetry=None,
+                 scene_build='merged', ground_detail='medium', sensitivity=None, angle_sigmas=None,
+                 uncertainty_samples=100000, latency=None, latency_hud=False, **traits):
+        HasTraits.__init__(self)
+
+        self.world_system = world_system
+        self.camera_world_alignment_at_zero = camera_world_alignment_at_zero
+        self.initial_view = initial_view
+        self.camera_update = camera_update
+        self.camera_model = camera_model
+        self.scene_build = scene_build
+        self.ground_step = GROUND_LEVELS_OF_DETAIL[ground_detail]
+        self.max_fps = max_fps
+        self.latency = latency
+        self.latency_hud = latency_hud
+        self.render_scheduler = RenderScheduler(
+            self.render_frame, lambda delay, callback: GUI.invoke_after(int(1000 * delay), callback), max_fps,
+            latency=latency)
+        if latency is not None:
+            for control in (self.angles.angle_applied_first, self.angles.angle_applied_second,
+                            self.angles.angle_applied_last):
+                control.input_listener = latency.input
+        self.player = None
+        if playback is not None:
+            self.player = Player(playback, self.show_playback_frame,
+                                 lambda delay, callback: GUI.invoke_after(int(1000 * delay), callback),
+                                 on_finished=self.report_playback_statistics)
+        self.telemetry = telemetry
+        self.telemetry_frames = 0
+        self.sensitivity = sensitivity
+        self.uncertainty = None
+        if angle_sigmas is not None:
+            T = camera_alignment_matrix(world_system, camera_world_alignment_at_zero)
+            self.uncertainty = UncertaintySampler(angle_sigmas, [T.dot([0., 0., -1.]), T.dot([0., 1., 0.])],
+                                                  uncertainty_samples)
+
+        self.initial_definition = _euler_angle_definition
+        self.initial_convention = _euler_angle_definition.compile(world_system)
+        self.set_angles_definition(self.initial_definition, self.initial_convention)
+        self.sequence_names = [' '.join(reversed([definition.angle_name for definition
+                                                  in _euler_angle_definition.angles_in_order_applied]))] + \
+                              list(SEQUENCES)
+
+    @on_trait_change('mayavi_scene.activated')
+    def initialize_scene(self):
+        # We setup the scene outside the constructor as mayavi can only
+        # initialize certain scene elements (e.g. text3d) properly after a view
+        # on it is open. https://mayavi.readthedocs.io/en/latest/building_applications.html
+
+        start = perf_counter()
+        if self.camera_model is not None:
+            # Large models are drawn as plain surface, fancymesh would add a glyph per vertex
+            camera_representation = 'surface'
+            self.camera_mesh = generate_aligned_camera_mesh(self.world_system, self.camera_world_alignment_at_zero,
+                                                            load_mesh(self.camera_model))
+        else:
+            camera_representation = 'fancymesh'
+            self.camera_mesh = generate_aligned_camera_mesh(self.world_system, self.camera_world_alignment_at_zero)
+        self.world_to_camera_translation = world_origin_to_camera_origin(self.world_system)
+
+        if self.camera_update == 'transform':
+            self.camera3d = self.mayavi_scene.mlab.triangular_mesh(
+                self.camera_mesh.x, self.camera_mesh.y, self.camera_mesh.z,
+                self.camera_mesh.faces, opacity=0.5, representation=camera_representation, name='camera')
+
+            # One matrix shared by all actors of the camera pipeline
+            self.camera_user_matrix = tvtk.Matrix4x4()
+            for actor in pipeline_actors(self.camera3d.mlab_source.m_data):
+                actor.user_matrix = self.camera_user_matrix
+            self.camera_user_matrix.from_array(
+                camera_to_scene_transform(self.rotation_camera_to_world, self.world_to_camera_translation))
+        else:
+            self.camera3d = self.mayavi_scene.mlab.triangular_mesh(
+                self.camera_mesh.x + self.world_to_camera_translation[0],
+                self.camera_mesh.y + self.world_to_camera_translation[1],
+                self.camera_mesh.z + self.world_to_camera_translation[2],
+                self.camera_mesh.faces, opacity=0.5, representation=camera_representation, name='camera')
+
+        if self.scene_build == 'merged':
+            self.mayavi_scene.add_actors(merged_world_actors(self.world_system, ground_step=self.ground_step))
+        else:
+            draw_world_with_coordinate_system_at_origin(self.mayavi_scene, self.world_system,
+                                                        ground_step=self.ground_step)
+
+        self.mayavi_scene.mlab.view(azimuth=self.initial_view[0], elevation=self.initial_view[1], roll=self.initial_view[2], distance=10)
+        self.mayavi_scene.mlab.text(0,0, "camera system: \n"
+                                         "x: camera right \n"
+                                         "y: camera top (indicated by hat) \n"
+                                         "z: camera back (indicated by pyramid)")
+
+        if self.sensitivity is not None:
+            self.sensitivity_overlay = tvtk.TextActor(position=(10, 60))
+            self.sensitivity_overlay.text_property.trait_set(font_size=14, bold=True)
+            self.mayavi_scene.renderer.add_actor2d(self.sensitivity_overlay)
+            self.update_sensitivity_overlay()
+
+        if self.uncertainty is not None:
+            actor, self.uncertainty_cloud = point_cloud_actor()
+            actor.trait_set(position=self.world_to_camera_translation, scale=(1.5, 1.5, 1.5))
+            self.mayavi_scene.renderer.add_actor(actor)
+            self.request_uncertainty((self.angles.angle_applied_first.final,
+                                      self.angles.angle_applied_second.final,
+                                      self.angles.angle_applied_last.final))
+            GUI.invoke_after(0, self.poll_uncertainty)
+
+        if self.latency is not None and self.latency_hud:
+            self.latency_overlay = tvtk.TextActor(position=(10, 120))
+            self.latency_overlay.text_property.trait_set(font_size=12, font_family='courier')
+            self.mayavi_scene.renderer.add_actor2d(self.latency_overlay)
+            GUI.invoke_after(0, self.poll_latency)
+
+        self.render_statistics = 'scene: {actors} actors, built in {ms:.1f} ms ({scene_build})'.format(
+            actors=len(self.mayavi_scene.renderer.view_props), ms=1000. * (perf_counter() - start),
+            scene_build=self.scene_build)
+
+        # Rotation or angles changed before the scene was initialized
+        self.update_plot()
+        if not np.array_equal(self.compute_rotation_camera_to_world(), self.rotation_camera_to_world):
+            self.render_scheduler.request()
+
+        if self.player is not None:
+            self.player.start()
+        if self.telemetry is not None:
+            self.telemetry.start()
+            GUI.invoke_after(0, self.poll_telemetry)
+
+    def show_playback_frame(self, rotation):
+        # Assigning the rotation renders the frame via update_plot
+        self.rotation_camera_to_world = rotation
+        if self.player.frames_shown % 30 == 0:
+            self.report_playback_statistics()
+
+    def poll_telemetry(self):
+        '''
+        Shows the newest telemetry sample, if any arrived since the last frame, on the GUI thread.
+        '''
+        sample = self.telemetry.latest.take()
+        if sample is not None:
+            _, angles, _ = sample
+            # Composed in the stream's convention, which may differ from the shown sequence
+            self.rotation_camera_to_world = rotation_matrix(self.telemetry.convention, *np.deg2rad(angles))
+            self.request_uncertainty(angles, self.telemetry.convention)
+            self.telemetry_frames += 1
+            if self.telemetry_frames % 30 == 0:
+                self.render_statistics = 'telemetry packets: {packets} ({packet_rate:.0f}/s), ' \
+                                         'invalid: {invalid_packets}, dropped samples: {dropped_samples}, ' \
+                                         'parse: {parse_us_mean:.1f} us (max {parse_us_max:.1f} us)'.format(
+                                             **self.telemetry.statistics())
+        GUI.invoke_after(int(1000 / self.max_fps), self.poll_telemetry)
+
+    def request_uncertainty(self, angles, convention=None):
+        if self.uncertainty is not None:
+            self.uncertainty.request(self.convention if convention is None else convention, angles)
+
+    def poll_uncertainty(self):
+        '''
+        Shows the newest (partially refined) uncertainty cloud, if any, on the GUI thread.
+        '''
+        cloud = self.uncertainty.latest.take()
+        if cloud is not None:
+            _, endpoints = cloud
+            set_point_cloud(self.uncertainty_cloud, endpoints.reshape(-1, 3),
+                            np.repeat(UNCERTAINTY_COLORS, endpoints.shape[1], axis=0))
+            self.mayavi_scene.render()
+        GUI.invoke_after(int(1000 / self.max_fps), self.poll_uncertainty)
+
+    def poll_latency(self):
+        '''
+        Refreshes the latency display a few times per second, rendering only if new frames were timed.
+        '''
+        text = self.latency.hud_text()
+        if text != self.latency_overlay.input:
+            self.latency_overlay.input = text
+            self.mayavi_scene.render()
+        GUI.invoke_after(250, self.poll_latency)
+
+    def report_playback_statistics(self):
+        self.render_statistics = 'playback frames: {frames_shown}, dropped: {frames_dropped}, ' \
+                                 'compute: {compute_ms_mean:.3f} ms/frame, ' \
+                                 'render: {render_ms_mean:.1f} ms/frame (max {render_ms_max:.1f} ms)'.format(
+                                     **self.player.statistics())
+
+    def update_sensitivity_overlay(self):
+        '''
+        Shows the sensitivity of the current pose, whichever source (sliders, playback, telemetry) set it.
+        '''
+        angles, _ = angles_from_rotation_matrices(self.convention, self.rotation_camera_to_world[None])
+        if self.convention == self.sensitivity.convention:
+            conditioning, view_sensitivity = self.sensitivity.at(np.rad2deg(angles[0]))
+        else:
+            conditioning, view_sensitivity = sensitivity_fields(self.convention, *angles.T,
+                                                                view_axis=self.sensitivity.view_axis)
+            conditioning, view_sensitivity = float(conditioning[0, 0, 0]), view_sensitivity[0, 0, 0]
+
+        self.sensitivity_overlay.input = 'conditioning: %.2f (0: gimbal lock)\nview change per angle change: %s' % (
+            conditioning, ', '.join('%s %.2f' % (name, value)
+                                    for name, value in zip(self.convention.angle_names, view_sensitivity)))
+        # Green when well-conditioned, red towards gimbal lock
+        self.sensitivity_overlay.text_property.color = (1. - conditioning, conditioning, 0.2)
+
+    @on_trait_change('rotation_camera_to_world')
+    def update_plot(self):
+        if not hasattr(self, 'camera3d'):
+            # Rotation changed before the scene was initialized, e.g. by telemetry
+            return
+
+        # Render once after all changes, re-enabling rendering triggers the render
+        self.mayavi_scene.disable_render = True
+        try:
+            if hasattr(self, 'sensitivity_overlay'):
+                self.update_sensitivity_overlay()
+            if self.camera_update == 'transform':
+                self.camera_user_matrix.from_array(
+                    camera_to_scene_transform(self.rotation_camera_to_world, self.world_to_camera_translation))
+            else:
+                # The orientation of the camera mesh will be updated on user input
+                x_camera_in_world, y_camera_in_world, z_camera_in_world = \
+                    (self.rotation_camera_to_world.dot(np.array([self.camera_mesh.x, self.camera_mesh.y, self.camera_mesh.z])))
+                self.camera3d.mlab_source.trait_set(x=x_camera_in_world + self.world_to_camera_translation[0],
+                                                    y=y_camera_in_world + self.world_to_camera_translation[1],
+                                                    z=z_camera_in_world + self.world_to_camera_translation[2])
+        finally:
+            if self.latency is not None:
+                self.latency.mark('update')
+            self.mayavi_scene.disable_render = False
+        if self.latency is not None:
+            self.latency.mark('render')
@@ -1,5 +1,7 @@
 from traits.api import HasTraits, Enum
 
+from lib.conventions import WorldAxes, WORLD_SYSTEMS
+
 WorldAxis = Enum('North', 'South', 'East', 'West', 'Up', 'Down')
 
 
@@ -11,6 +13,19 @@ class WorldSystem(HasTraits):
     y_axis = WorldAxis()
     z_axis = WorldAxis()
 
+    def axes(self):
+        return WorldAxes(self.x_axis, self.y_axis, self.z_axis)
+
+
+def system_by_name(name):
+    '''
+    Returns one of the 48 registered world systems by short name, e.g. 'NED', see lib.conventions.WORLD_SYSTEMS.
+    '''
+    world_system = WorldSystem()
+    world_system.x_axis, world_system.y_axis, world_system.z_axis = WORLD_SYSTEMS[name]
+
+    return world_system
+
 
 def system_NED():
     world_system = WorldSystem()
@@ -0,0 +1,141 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tvtk.api import tvtk
+from tvtk.common import configure_input
+
+from lib.rotations import rotation_matrices
+from lib.pose_io import read_pose_chunks
+from lib.mesh_io import load_mesh
+from lib.geometry_cache import geometry_cache
+from lib.scene_actors import mesh_polydata, polydata_actor, merged_world_actors, set_view
+from lib.draw_scene import world_origin_to_camera_origin, generate_aligned_camera_mesh, camera_to_scene_transform
+
+# Per worker process state, set up once by _initialize_worker()
+_worker = {}
+
+
+class SnapshotRenderer:
+    '''
+    Offscreen renderer for pose snapshots, without Qt or mayavi.
+
+    The scene of Visualization.initialize_scene() (world and camera) is built once in one
+    offscreen render window. Each snapshot only replaces the camera's 4x4 user matrix,
+    renders and writes the window as PNG.
+    '''
+    def __init__(self, world_system, camera_world_alignment_at_zero, initial_view, size=(320, 240),
+                 camera_model=None, ground_step=0.1):
+        self.render_window = tvtk.RenderWindow(off_screen_rendering=True, size=size)
+        self.renderer = tvtk.Renderer(background=(0.5, 0.5, 0.5))
+        self.render_window.add_renderer(self.renderer)
+
+        for actor in merged_world_actors(world_system, ground_step=ground_step):
+            self.renderer.add_actor(actor)
+
+        camera_mesh = generate_aligned_camera_mesh(world_system, camera_world_alignment_at_zero,
+                                                   load_mesh(camera_model) if camera_model is not None else None)
+        camera_actor = polydata_actor(mesh_polydata(camera_mesh))
+        camera_actor.property.trait_set(opacity=0.5, edge_visibility=True)
+        self.camera_user_matrix = tvtk.Matrix4x4()
+        camera_actor.user_matrix = self.camera_user_matrix
+        self.renderer.add_actor(camera_actor)
+        self.world_to_camera_translation = world_origin_to_camera_origin(world_system)
+
+        set_view(self.renderer, *initial_view)
+
+        self.window_to_image = tvtk.WindowToImageFilter(input=self.render_window, read_front_buffer=False)
+        self.writer = tvtk.PNGWriter()
+        configure_input(self.writer, self.window_to_image)
+
+    def render(self, rotation_camera_to_world, path):
+        self.camera_user_matrix.from_array(
+            camera_to_scene_transform(rotation_camera_to_world, self.world_to_camera_translation))
+        self.render_window.render()
+        self.window_to_image.modified()
+        self.writer.file_name = path
+        self.writer.write()
+
+    def close(self):
+        self.render_window.finalize()
+
+
+def snapshot_paths(names, output_directory):
+    '''
+    One PNG per image, named as the image without its extension.
+    '''
+    return [os.path.join(output_directory, os.path.splitext(os.path.basename(name))[0] + '.png') for name in names]
+
+
+def render_poses(renderer, convention, names, angles, output_directory):
+    '''
+    Renders (N,3) angles in degrees (ordered as applied) of the named images.
+    '''
+    rotations = rotation_matrices(convention, np.deg2rad(angles))
+    for rotation, path in zip(rotations, snapshot_paths(names, output_directory)):
+        renderer.render(rotation, path)
+
+
+def _initialize_worker(convention, output_directory, renderer_arguments, geometry_cache_directory):
+    # Each worker builds its own offscreen window and scene once, only poses cross process boundaries
+    geometry_cache.directory = geometry_cache_directory
+    _worker['renderer'] = SnapshotRenderer(*renderer_arguments)
+    _worker['convention'] = convention
+    _worker['output_directory'] = output_directory
+
+
+def _render_chunk(names, angles):
+    started = time.perf_counter()
+    render_poses(_worker['renderer'], _worker['convention'], names, angles, _worker['output_directory'])
+    return os.getpid(), len(names), time.perf_counter() - started
+
+
+def render_pose_file(input_file, output_directory, convention, world_system, camera_world_alignment_at_zero,
+                     initial_view, file_format='csv', size=(320, 240), camera_model=None, ground_step=0.1,
+                     workers=1, chunk_size=256):
+    '''
+    Writes one PNG snapshot of the camera orientation per pose of a pose file (see lib.pose_io),
+    e.g. as QA thumbnails of an image block. Positions are ignored, all cameras are shown at the
+    scene center as in the GUI.
+
+    The file is streamed in chunks of chunk_size poses. With workers > 1 the chunks are rendered
+    by a pool of worker processes, each with its own offscreen window; at most two chunks per
+    worker are queued, so memory stays bounded for any file size.
+
+    Returns per process statistics {pid: {'chunks', 'poses', 'seconds'}}.
+    '''
+    os.makedirs(output_directory, exist_ok=True)
+    renderer_arguments = (world_system, camera_world_alignment_at_zero, initial_view, size, camera_model,
+                          ground_step)
+    statistics = {}
+
+    def record(pid, poses, seconds):
+        worker = statistics.setdefault(pid, {'chunks': 0, 'poses': 0, 'seconds': 0.})
+        worker['chunks'] += 1
+        worker['poses'] += poses
+        worker['seconds'] += seconds
+
+    if workers <= 1:
+        _initialize_worker(convention, output_directory, renderer_arguments, geometry_cache.directory)
+        try:
+            for names, _, angles in read_pose_chunks(input_file, file_format, chunk_size):
+                record(*_render_chunk(names, angles))
+        finally:
+            _worker.pop('renderer').close()
+        return statistics
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                             initargs=(convention, output_directory, renderer_arguments,
+                                       geometry_cache.directory)) as executor:
+        pending = deque()
+        for names, _, angles in read_pose_chunks(input_file, file_format, chunk_size):
+            pending.append(executor.submit(_render_chunk, names, angles))
+            if len(pending) >= 2 * workers:
+                record(*pending.popleft().result())
+        while pending:
+            record(*pending.popleft().result())
+
+    return statistics
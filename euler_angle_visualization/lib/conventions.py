@@ -0,0 +1,165 @@
+from collections import namedtuple
+from itertools import permutations, product
+
+from numpy import zeros
+
+from lib.rotations import compile_convention
+
+# Traits-free world system: world axis names of the scene's x,y,z axes.
+# Provides the same x_axis, y_axis, z_axis attributes as WorldSystem.
+WorldAxes = namedtuple('WorldAxes', ['x_axis', 'y_axis', 'z_axis'])
+
+# Direction (axis index, sign) of each world axis name w.r.t. the scene's reference system,
+# i.e. the mayavi scene axes x: East, y: North, z: Up
+WORLD_AXIS_DIRECTIONS = {'East': (0, 1.), 'West': (0, -1.),
+                         'North': (1, 1.), 'South': (1, -1.),
+                         'Up': (2, 1.), 'Down': (2, -1.)}
+
+
+def world_system_name(world_axes):
+    '''
+    Short name of a world system from the initials of its axes, e.g. 'NED'.
+    '''
+    return ''.join(axis[0] for axis in world_axes)
+
+
+# All 48 world systems, naming each scene axis after one direction of East/West, North/South, Up/Down
+# (24 right- and 24 left-handed ones), by short name.
+WORLD_SYSTEMS = {world_system_name(axes): WorldAxes(*axes)
+                 for pairs in permutations((('East', 'West'), ('North', 'South'), ('Up', 'Down')))
+                 for axes in product(*pairs)}
+
+SYSTEM_NED = WorldAxes('North', 'East', 'Down')
+SYSTEM_ENU = WorldAxes('East', 'North', 'Up')
+
+# World axes the photogrammetric camera system (x: right, y: top, z: back) aligns with at (0,0,0)
+CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC = WorldAxes('East', 'North', 'Up')
+
+# Signed permutation matrices, shared per (target axes, source axes)
+_axes_alignment_matrices = {}
+
+
+def axes_alignment_matrix(target_axes, source_axes):
+    '''
+    Read-only signed permutation matrix that maps coordinates w.r.t. the source axes
+    to coordinates w.r.t. the target axes, both given as world axis names.
+    Matrices are built once per pair of axes and then shared.
+    '''
+    key = (tuple(target_axes), tuple(source_axes))
+    if key not in _axes_alignment_matrices:
+        matrix = zeros((3, 3))
+        for row, target_axis in enumerate(key[0]):
+            target_index, target_sign = WORLD_AXIS_DIRECTIONS[target_axis]
+            for column, source_axis in enumerate(key[1]):
+                source_index, source_sign = WORLD_AXIS_DIRECTIONS[source_axis]
+                if target_index == source_index:
+                    matrix[row, column] = target_sign * source_sign
+        matrix.setflags(write=False)
+        _axes_alignment_matrices[key] = matrix
+    return _axes_alignment_matrices[key]
+
+
+def world_matrix(world_axes):
+    '''
+    Signed permutation matrix mapping scene reference (East, North, Up) coordinates to world coordinates.
+    '''
+    return axes_alignment_matrix(world_axes, WorldAxes('East', 'North', 'Up'))
+
+
+# Elemental rotations (angle_name, axis, isClockwiseCameraSystemRotation) in order applied
+YAW_PITCH_ROLL = (('Roll', 'around_x', False),
+                  ('Pitch', 'around_y', False),
+                  ('Yaw', 'around_z', False))
+
+PIX4D_OMEGA_PHI_KAPPA = (('Kappa', 'around_z', False),
+                         ('Phi', 'around_y', False),
+                         ('Omega', 'around_x', False))
+
+
+def convention_yaw_pitch_roll_NED():
+    '''
+    Compiled "Yaw, Pitch, Roll" Tait-Bryan angles in the NED world system.
+    '''
+    return compile_convention(YAW_PITCH_ROLL, SYSTEM_NED)
+
+
+def convention_pix4d_omega_phi_kappa_ENU():
+    '''
+    Compiled Pix4D "Omega, Phi, Kappa" Tait-Bryan angles in the ENU world system.
+    '''
+    return compile_convention(PIX4D_OMEGA_PHI_KAPPA, SYSTEM_ENU)
+
+
+# Conventions selectable on the command line
+CONVENTIONS = {'ypr': convention_yaw_pitch_roll_NED,
+               'opk': convention_pix4d_omega_phi_kappa_ENU}
+
+# Rotation sequences named by their axes, as in scipy:
+# - upper case: intrinsic, rotations about the rotated camera axes, e.g. 'ZYX' = z, then y', then x''
+# - lower case: extrinsic, rotations about the fixed world axes, e.g. 'xyz' = x, then y, then z
+TAIT_BRYAN_SEQUENCES = ('xyz', 'xzy', 'yxz', 'yzx', 'zxy', 'zyx')
+PROPER_EULER_SEQUENCES = ('xyx', 'xzx', 'yxy', 'yzy', 'zxz', 'zyz')
+SEQUENCES = tuple(sequence.upper() for sequence in TAIT_BRYAN_SEQUENCES + PROPER_EULER_SEQUENCES) + \
+            TAIT_BRYAN_SEQUENCES + PROPER_EULER_SEQUENCES
+
+# A compiled sequence within a world system
+RegisteredConvention = namedtuple('RegisteredConvention',
+                                  ['sequence', 'world_system', 'extrinsic', 'convention', 'world_matrix'])
+
+
+def sequence_rotations(sequence):
+    '''
+    Elemental rotations (angle_name, axis, isClockwiseCameraSystemRotation) of a sequence in order applied,
+    all counter-clockwise. The angles alpha, beta, gamma follow the sequence name.
+
+    Note: An extrinsic sequence equals the intrinsic one in reverse order, e.g. 'xyz' = 'ZYX',
+    which is how it is applied here. Its angles are hence ordered gamma, beta, alpha.
+    '''
+    if sequence not in SEQUENCES:
+        raise ValueError("Unknown rotation sequence: " + sequence)
+    names = ('alpha', 'beta', 'gamma')
+    axes = sequence.lower()
+
+    if sequence.islower():
+        return tuple(('%s (%s)' % (names[i], axes[i]), 'around_' + axes[i], False) for i in reversed(range(3)))
+    return tuple(('%s (%s%s)' % (names[i], axes[i], "'" * i), 'around_' + axes[i], False) for i in range(3))
+
+
+_registry = {}
+
+
+def registered_convention(sequence, world_system='ENU'):
+    '''
+    Returns the RegisteredConvention of a rotation sequence (see SEQUENCES) within a world system
+    given by its short name (see WORLD_SYSTEMS). Each is compiled on first use and then shared,
+    so switching conventions only costs a dictionary lookup.
+    '''
+    key = (sequence, world_system)
+    if key not in _registry:
+        if world_system not in WORLD_SYSTEMS:
+            raise ValueError("Unknown world system: " + world_system)
+        world_axes = WORLD_SYSTEMS[world_system]
+        _registry[key] = RegisteredConvention(sequence, world_system, sequence.islower(),
+                                              compile_convention(sequence_rotations(sequence), world_axes),
+                                              world_matrix(world_axes))
+    return _registry[key]
+
+
+def convention_by_name(name, world_system=None):
+    '''
+    Compiled convention of a command line name: 'ypr', 'opk' or a sequence
+    within world_system (default: ENU).
+    '''
+    if name in CONVENTIONS:
+        return CONVENTIONS[name]()
+    return registered_convention(name, world_system or 'ENU').convention
+
+
+def compile_registry():
+    '''
+    Compiles all 24 sequences in all 48 world systems, e.g. before forking workers.
+    '''
+    for world_system in WORLD_SYSTEMS:
+        for sequence in SEQUENCES:
+            registered_convention(sequence, world_system)
+    return len(_registry)
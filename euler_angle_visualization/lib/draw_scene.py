@@ -1,6 +1,10 @@
-from numpy import max, array, identity, dot
+from time import perf_counter
 
-from lib.meshes import generate_arrow_mesh, generate_ground_mesh, generate_camera_mesh
+from numpy import max, array, identity, dot, zeros, interp, clip, stack, concatenate, uint8
+
+from lib.conventions import WORLD_AXIS_DIRECTIONS, axes_alignment_matrix, world_matrix
+from lib.meshes import generate_arrow_mesh, generate_ground_mesh, generate_camera_mesh, transform_vertices_in_place, \
+        grid_triangle_mesh, merge_posed_meshes, cached_geometry, CompactTriangleMesh
 
 def initial_view_yaw_pitch_roll():
     '''
@@ -34,18 +38,9 @@ def w_c(world_axis, camera_axis):
          [ w_y*c_x, w_y*c_y, w_y*c_z],
          [ w_z*c_x, w_z*c_y, w_z*c_z]]
     '''
-
-    if world_axis == camera_axis:
-        return 1
-    elif (world_axis == 'East' and camera_axis == 'West') or \
-         (world_axis == 'West' and camera_axis == 'East') or \
-         (world_axis == 'North' and camera_axis == 'South') or \
-         (world_axis == 'South' and camera_axis == 'North') or \
-         (world_axis == 'Up' and camera_axis == 'Down') or \
-         (world_axis == 'Down' and camera_axis == 'Up'):
-        return -1
-    else:
-        return 0
+    world_index, world_sign = WORLD_AXIS_DIRECTIONS[world_axis]
+    camera_index, camera_sign = WORLD_AXIS_DIRECTIONS[camera_axis]
+    return world_sign * camera_sign if world_index == camera_index else 0
 
 
 def camera_alignment_matrix(world_system, camera_world_alignment_at_zero):
@@ -54,87 +49,194 @@ def camera_alignment_matrix(world_system, camera_world_alignment_at_zero):
      x-axis: camera right (looking through the camera)
      y-axis: camera top (indicated by extra triangle)
      z-axis: camera back
-     with a given world system
+     with a given world system.
+    The (read-only) matrix is looked up from the precomputed signed permutations.
     '''
 
     w = world_system
     c = camera_world_alignment_at_zero
-    return array([[w_c(w.x_axis, c.x_axis), w_c(w.x_axis, c.y_axis), w_c(w.x_axis, c.z_axis)],
-                  [w_c(w.y_axis, c.x_axis), w_c(w.y_axis, c.y_axis), w_c(w.y_axis, c.z_axis)],
-                  [w_c(w.z_axis, c.x_axis), w_c(w.z_axis, c.y_axis), w_c(w.z_axis, c.z_axis)]])
+    return axes_alignment_matrix((w.x_axis, w.y_axis, w.z_axis), (c.x_axis, c.y_axis, c.z_axis))
 
 
 def world_origin_to_camera_origin(world_system, distance = 3):
+    '''
+    Position of the camera: distance above the world origin.
+    '''
+    up = world_matrix((world_system.x_axis, world_system.y_axis, world_system.z_axis))[:, 2]
+    return list(distance * up)
+
+
+def camera_to_scene_transform(rotation_camera_to_world, world_to_camera_translation):
+    '''
+    Returns the 4x4 homogeneous transformation that places the
+    aligned camera mesh with the given orientation in the scene.
+    Intended to be used as the camera actors' user matrix.
+    '''
+    transform = identity(4)
+    transform[:3, :3] = rotation_camera_to_world
+    transform[:3, 3] = world_to_camera_translation
+    return transform
 
-    if world_system.x_axis == 'Up':
-        return [distance, 0, 0]
-    elif world_system.x_axis == 'Down':
-        return [-distance, 0, 0]
-    if world_system.y_axis == 'Up':
-        return [0, distance, 0]
-    elif world_system.y_axis == 'Down':
-        return [0, -distance, 0]
-    if world_system.z_axis == 'Up':
-        return [0, 0, distance]
-    elif world_system.z_axis == 'Down':
-        return [0, 0, -distance]
 
+def pipeline_actors(pipeline_object):
+    '''
+    Collects the tvtk actors of all modules below a mayavi pipeline object,
+    e.g. surface, edge tubes and vertex glyphs of a 'fancymesh'.
+    '''
+    actors = list(getattr(pipeline_object, 'actors', []))
+    for child in getattr(pipeline_object, 'children', []):
+        actors += pipeline_actors(child)
+    return actors
 
-def generate_aligned_camera_mesh(world_system, camera_world_alignment_at_zero):
+
+def generate_aligned_camera_mesh(world_system, camera_world_alignment_at_zero, camera_mesh=None):
     '''
     Returns camera mesh for a custom world system and camera world alignment.
+    camera_mesh: optional CompactTriangleMesh (e.g. a loaded model) in camera coordinates,
+                 which gets aligned in place. Defaults to the generated camera mesh.
     TODO: Better indicate camera coordinate system
     '''
 
-    camera_mesh = generate_camera_mesh()
     T = camera_alignment_matrix(world_system, camera_world_alignment_at_zero)
+    if camera_mesh is not None:
+        transform_vertices_in_place(camera_mesh.vertices, T)
+        return camera_mesh
+
+    camera_mesh = generate_camera_mesh()
     camera_mesh.x, camera_mesh.y, camera_mesh.z = dot(T, array([camera_mesh.x, camera_mesh.y, camera_mesh.z]))
 
     return camera_mesh
 
 
-def draw_ground_at_origin(mayavi_scene, world_system, dimensions):
+def measure_frames_per_second(scene, frames=50):
     '''
-    Draw a surface representing the ground with adjusted z-axis
+    Renders a scene (MlabSceneModel or tvtk scene) repeatedly while turning
+    the view camera, so that every frame is actually redrawn.
+    Returns the achieved frames per second.
+    '''
+    start = perf_counter()
+    for _ in range(frames):
+        scene.camera.azimuth(360. / frames)
+        scene.render()
+    return frames / (perf_counter() - start)
+
+
+def oriented_ground_mesh(world_system, dimensions, step=0.1):
+    '''
+    Ground mesh x,y,z (read-only, see lib.meshes.cached_geometry) with adjusted z-axis
     such that plane is horizontal in world system (i.e. Up/Down orthogonal).
     '''
 
-    x, y, z = generate_ground_mesh(dimensions)
+    x, y, z = generate_ground_mesh(dimensions, step)
     if world_system.x_axis in ['Up', 'Down']:
-        x_new = z
-        y_new = y
-        z_new = x
+        return z, y, x
     elif world_system.y_axis in ['Up', 'Down']:
-        x_new = x
-        y_new = z
-        z_new = y
-    elif world_system.z_axis in ['Up', 'Down']:
-        x_new = x
-        y_new = y
-        z_new = z
+        return x, z, y
+    return x, y, z
 
-    mayavi_scene.mlab.mesh(x_new, y_new, z_new)
 
+def coordinate_system_meshes(world_system, axis_length):
+    '''
+    Arrow meshes x,y,z along mayavis x,y,z axes and their labels
+    (text, position) corresponding to the world system definition.
+    '''
 
-def draw_coordinate_system_at_origin(mayavi_scene, world_system, axis_length):
+    x, y, z = generate_arrow_mesh(axis_length)
+    arrows = [(z, x, y), (y, z, x), (x, y, z)]
+    labels = [(world_system.x_axis, (axis_length, 0, 0)),
+              (world_system.y_axis, (0, axis_length, 0)),
+              (world_system.z_axis, (0, 0, axis_length))]
+    return arrows, labels
+
+
+# Rotations placing the arrow mesh (pointing along z) along the scene's x, y and z axes,
+# the same axis swaps as coordinate_system_meshes()
+ARROW_AXIS_ROTATIONS = array([[[0., 0., 1.], [1., 0., 0.], [0., 1., 0.]],
+                              [[0., 1., 0.], [0., 0., 1.], [1., 0., 0.]],
+                              [[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]]])
+
+def arrow_triangle_mesh(height):
     '''
-    Draw a coordinate system that aligns wiht mayavis x,y,z system
-    but with axis labels corresponding to the world system definition
+    Triangulated arrow mesh, generated once per height (see lib.meshes.cached_geometry).
+    '''
+    return CompactTriangleMesh(*_arrow_triangle_mesh_arrays(height))
+
+
+@cached_geometry
+def _arrow_triangle_mesh_arrays(height):
+    mesh = grid_triangle_mesh(*generate_arrow_mesh(height))
+    return mesh.vertices, mesh.faces
+
+
+def colormap_colors(values, colormap):
+    '''
+    (N,3) uint8 colors of values scaled to their range, as mayavi colors meshes by default:
+    - 'blue-red': mayavi's default lookup table, hue from blue to red
+    - 'bone':     matplotlib's bone
+    '''
+    span = values.max() - values.min()
+    t = (values - values.min()) / span if span > 0 else zeros(len(values))
+
+    if colormap == 'bone':
+        rgb = stack((interp(t, [0., 0.746, 1.], [0., 0.652, 1.]),
+                     interp(t, [0., 0.365, 0.746, 1.], [0., 0.319, 0.777, 1.]),
+                     interp(t, [0., 0.365, 1.], [0., 0.444, 1.])), axis=1)
+    else:
+        # HSV with hue 2/3 (blue) to 0 (red) at full saturation and value, hue in sixths of the color circle
+        hue = 4. * (1. - t)
+        rgb = stack((clip(abs(hue - 3.) - 1., 0., 1.),
+                     clip(2. - abs(hue - 2.), 0., 1.),
+                     clip(2. - abs(hue - 4.), 0., 1.)), axis=1)
+    return (255. * rgb + 0.5).astype(uint8)
+
+
+def merged_world_mesh(world_system, ground_dimensions=[1., 1., 0.2], ground_step=0.1):
+    '''
+    Static world of draw_world_with_coordinate_system_at_origin() as one mesh:
+    ground and coordinate system arrows merged into one CompactTriangleMesh with (N,3) uint8
+    per-vertex colors (same coloring as the separately drawn meshes), and the axis labels
+    as (text, position) pairs. The arrow mesh is generated once and placed by rotations.
     '''
+    ground = grid_triangle_mesh(*oriented_ground_mesh(world_system, ground_dimensions, ground_step))
 
-    x,y,z = generate_arrow_mesh(axis_length)
+    axis_length = 1.3 * max(ground_dimensions)
+    arrows = merge_posed_meshes(arrow_triangle_mesh(axis_length), ARROW_AXIS_ROTATIONS, zeros((3, 3)))
+    vertices_per_arrow = len(arrows.vertices) // 3
+    arrow_colors = [colormap_colors(arrows.z[n * vertices_per_arrow:(n + 1) * vertices_per_arrow], 'bone')
+                    for n in range(3)]
 
-    mayavi_scene.mlab.text3d(axis_length, 0, 0, world_system.x_axis, scale=0.2*axis_length)
-    mayavi_scene.mlab.mesh(z, x, y, colormap="bone")
+    mesh = CompactTriangleMesh(concatenate((ground.vertices, arrows.vertices)),
+                               concatenate((ground.faces, arrows.faces + len(ground.vertices))))
+    colors = concatenate([colormap_colors(ground.z, 'blue-red')] + arrow_colors)
+    _, labels = coordinate_system_meshes(world_system, axis_length)
+    return mesh, colors, labels
 
-    mayavi_scene.mlab.text3d(0, 0, axis_length, world_system.z_axis, scale=0.2*axis_length)
-    mayavi_scene.mlab.mesh(x, y, z, colormap="bone")
 
-    mayavi_scene.mlab.text3d(0, axis_length, 0, world_system.y_axis, scale=0.2*axis_length)
-    mayavi_scene.mlab.mesh(y, z, x, colormap="bone")
+def draw_ground_at_origin(mayavi_scene, world_system, dimensions, step=0.1):
+    '''
+    Draw a surface representing the ground with adjusted z-axis
+    such that plane is horizontal in world system (i.e. Up/Down orthogonal).
+    '''
+
+    # VTK keeps references to the arrays given to mlab, so it gets copies of the read-only cached arrays
+    x, y, z = oriented_ground_mesh(world_system, dimensions, step)
+    mayavi_scene.mlab.mesh(array(x), array(y), array(z))
+
+
+def draw_coordinate_system_at_origin(mayavi_scene, world_system, axis_length):
+    '''
+    Draw a coordinate system that aligns wiht mayavis x,y,z system
+    but with axis labels corresponding to the world system definition
+    '''
+
+    arrows, labels = coordinate_system_meshes(world_system, axis_length)
+    for (x, y, z), (label, (label_x, label_y, label_z)) in zip(arrows, labels):
+        mayavi_scene.mlab.text3d(label_x, label_y, label_z, label, scale=0.2*axis_length)
+        mayavi_scene.mlab.mesh(array(x), array(y), array(z), colormap="bone")
 
 
-def draw_world_with_coordinate_system_at_origin(mayavi_scene, world_system, ground_dimensions = [1., 1., 0.2]):
+def draw_world_with_coordinate_system_at_origin(mayavi_scene, world_system, ground_dimensions = [1., 1., 0.2],
+                                                ground_step = 0.1):
     '''
     Draw world.
     To visualize the world we draw a ground mesh and coordinate system indicator.
@@ -145,7 +247,7 @@ def draw_world_with_coordinate_system_at_origin(mayavi_scene, world_system, grou
     for the visualization)
     '''
 
-    draw_ground_at_origin(mayavi_scene, world_system, ground_dimensions)
+    draw_ground_at_origin(mayavi_scene, world_system, ground_dimensions, ground_step)
 
     axes_length = 1.3 * max(ground_dimensions)
     draw_coordinate_system_at_origin(mayavi_scene, world_system, axes_length)
@@ -0,0 +1,160 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lib.rotations import rotation_matrices
+from lib.pose_io import read_pose_chunks
+from lib.conventions import CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC, axes_alignment_matrix
+
+# Per worker process state, set up once by _initialize_worker()
+_worker = {}
+
+
+def corner_rays(width=4, height=3, focal_length=None):
+    '''
+    (4,3) unit rays through the image corners in camera coordinates
+    (x: camera right, y: camera top, z: camera back), in the corner order of
+    lib.meshes.generate_camera_mesh(): top right, bottom right, bottom left, top left.
+    width, height and focal_length share one unit (e.g. mm or pixels). The default focal
+    length max(width, height) gives the field of view of the drawn camera mesh.
+    '''
+    focal_length = focal_length or max(width, height)
+    rays = np.array([[0.5, 0.5, 0.], [0.5, -0.5, 0.], [-0.5, -0.5, 0.], [-0.5, 0.5, 0.]]) * [width, height, 0.]
+    rays[:, 2] = -focal_length
+    return rays / np.linalg.norm(rays, axis=1, keepdims=True)
+
+
+def vertical_axis(world_axes):
+    '''
+    Index of the vertical world axis and +1 if it points up, -1 if it points down.
+    '''
+    for index, axis in enumerate(world_axes):
+        if axis in ('Up', 'Down'):
+            return index, 1. if axis == 'Up' else -1.
+    raise ValueError("World system without vertical axis")
+
+
+def ground_footprints(convention, positions, angles, rays, ground_height=0., max_range=None,
+                      camera_world_alignment_at_zero=CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC):
+    '''
+    Intersects the corner rays (see corner_rays()) of N cameras with the horizontal ground plane
+    ground_height above the world origin.
+
+    positions: (N,3) camera centers in the world system of the convention
+    angles:    (N,3) angles in degrees, ordered as applied
+    Returns
+    - footprints: (N,4,2) corners on the ground in the two horizontal world axes (in world axis order,
+                  e.g. North, East for NED), NaN where the ray misses the ground
+    - hits:       (N,4) False for rays pointing away from the ground (above the horizon)
+                  or hitting it farther than max_range
+    '''
+    positions = np.asarray(positions, dtype=float)
+    vertical, up = vertical_axis(convention.world_axes)
+    horizontal = [axis for axis in range(3) if axis != vertical]
+
+    # Rays in the world: camera to world rotation of the camera aligned at zero angles
+    T = axes_alignment_matrix(convention.world_axes, camera_world_alignment_at_zero)
+    directions = np.matmul(rotation_matrices(convention, np.deg2rad(angles)), T.dot(np.transpose(rays)))  # (N,3,4)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distances = (up * ground_height - positions[:, vertical, None]) / directions[:, vertical, :]
+    hits = distances > 0.
+    if max_range is not None:
+        hits &= distances <= max_range
+    distances = np.where(hits, distances, np.nan)
+
+    footprints = positions[:, None, horizontal] + distances[..., None] * directions[:, horizontal, :].transpose(0, 2, 1)
+    return footprints, hits
+
+
+def footprint_vertices(footprints, world_axes, ground_height=0.):
+    '''
+    (N,4,3) world coordinates of (N,4,2) footprints on the ground plane, e.g. to draw them.
+    '''
+    vertical, up = vertical_axis(world_axes)
+    vertices = np.full(footprints.shape[:-1] + (3,), up * ground_height)
+    vertices[..., [axis for axis in range(3) if axis != vertical]] = footprints
+    return vertices
+
+
+def _initialize_worker(convention, rays, ground_height, max_range, camera_world_alignment_at_zero):
+    _worker['arguments'] = (rays, ground_height, max_range, camera_world_alignment_at_zero)
+    _worker['convention'] = convention
+
+
+def _footprints_shard(positions, angles):
+    return ground_footprints(_worker['convention'], positions, angles, *_worker['arguments'])
+
+
+def ground_footprints_parallel(convention, positions, angles, rays, ground_height=0., max_range=None,
+                               camera_world_alignment_at_zero=CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC,
+                               workers=None, shard_size=250000):
+    '''
+    ground_footprints() for large blocks, computed in shards of shard_size poses by a pool of
+    worker processes. Same results as ground_footprints().
+    '''
+    n = len(positions)
+    footprints = np.empty((n, 4, 2))
+    hits = np.empty((n, 4), dtype=bool)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_initialize_worker,
+                             initargs=(convention, rays, ground_height, max_range,
+                                       camera_world_alignment_at_zero)) as executor:
+        starts = range(0, n, shard_size)
+        shards = executor.map(_footprints_shard, (positions[start:start + shard_size] for start in starts),
+                              (angles[start:start + shard_size] for start in starts))
+        for start, (shard_footprints, shard_hits) in zip(starts, shards):
+            footprints[start:start + len(shard_hits)] = shard_footprints
+            hits[start:start + len(shard_hits)] = shard_hits
+    return footprints, hits
+
+
+def format_footprint_lines(names, footprints, separator=',', precision=3):
+    '''
+    Formats names and (N,4,2) footprints as text lines: image and the four corners, nan for misses.
+    '''
+    row_format = separator.join(['%s'] + ['%.{}f'.format(precision)] * 8) + '\n'
+    return ''.join(map(row_format.__mod__, zip(names, *footprints.reshape(-1, 8).T.tolist())))
+
+
+def _footprints_chunk(names, positions, angles):
+    footprints, hits = _footprints_shard(positions, angles)
+    return format_footprint_lines(names, footprints), len(hits), int(hits.all(axis=1).sum())
+
+
+def convert_pose_file_to_footprints(input_file, output_file, convention, rays, file_format='csv', ground_height=0.,
+                                    max_range=None, workers=1, chunk_size=100000,
+                                    camera_world_alignment_at_zero=CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC):
+    '''
+    Streams a pose file (see lib.pose_io) in chunks and writes the footprint of each image as
+    "image,x1,y1,...,x4,y4" (see ground_footprints()). With workers > 1 the chunks are computed
+    by a pool of worker processes, at most two chunks per worker queued.
+    Returns the number of poses and of footprints with all four corners on the ground.
+    '''
+    initargs = (convention, rays, ground_height, max_range, camera_world_alignment_at_zero)
+    poses, complete = 0, 0
+    output_file.write('image,x1,y1,x2,y2,x3,y3,x4,y4\n')
+
+    def write(result):
+        nonlocal poses, complete
+        lines, chunk_poses, chunk_complete = result
+        output_file.write(lines)
+        poses += chunk_poses
+        complete += chunk_complete
+
+    if workers <= 1:
+        _initialize_worker(*initargs)
+        for chunk in read_pose_chunks(input_file, file_format, chunk_size):
+            write(_footprints_chunk(*chunk))
+        return poses, complete
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker, initargs=initargs) as executor:
+        pending = deque()
+        for chunk in read_pose_chunks(input_file, file_format, chunk_size):
+            pending.append(executor.submit(_footprints_chunk, *chunk))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return poses, complete
@@ -0,0 +1,146 @@
+import os
+import zipfile
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Part of the disk cache keys, increase when a generator's output changes
+CACHE_VERSION = 1
+
+
+def cache_key(name, parameters):
+    '''
+    Hashable key of a generator name and its parameters.
+    Numbers are keyed as floats and lists and arrays (e.g. ground dimensions) as tuples,
+    so [1, 1, 0.2] and (1., 1., 0.2) share one entry, in memory and on disk.
+    '''
+    def normalized(value):
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return tuple(normalized(v) for v in value)
+        if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_)):
+            return float(value)
+        return value
+    return (name,) + tuple(normalized(parameter) for parameter in parameters)
+
+
+class GeometryCache:
+    '''
+    Size-bounded cache of generated geometry, each entry a tuple of numpy arrays.
+
+    Entries are kept in memory for the process lifetime and evicted least recently used
+    first once they take more than max_bytes. With a directory, entries are also stored as
+    .npz files named after a hash of the generator name and parameters, so later launches
+    load them instead of generating them again. The files are only a speed-up: unreadable ones
+    are generated again and overwritten, and failed writes (e.g. a read-only directory) are counted
+    in write_errors but never fail the generation.
+
+    get() returns read-only views of the cached arrays: callers share one copy and
+    must not modify it (derive new arrays instead).
+    '''
+    def __init__(self, max_bytes=64 * 2**20, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_errors = 0
+
+    def get(self, name, parameters, generate):
+        '''
+        Returns the arrays of generate() for the generator name and its parameters,
+        generating them only if they are neither in memory nor on disk.
+        '''
+        key = cache_key(name, parameters)
+        with self._lock:
+            arrays = self._entries.get(key)
+            if arrays is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tuple(a.view() for a in arrays)
+
+        arrays = self._load(key)
+        if arrays is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            arrays = tuple(np.array(a) for a in generate())
+            self._store(key, arrays)
+
+        for a in arrays:
+            a.flags.writeable = False
+        self._insert(key, arrays)
+        return tuple(a.view() for a in arrays)
+
+    def _insert(self, key, arrays):
+        size = sum(a.nbytes for a in arrays)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = arrays
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= sum(a.nbytes for a in evicted)
+                self.evictions += 1
+
+    def path(self, key):
+        digest = hashlib.sha1(repr((CACHE_VERSION,) + key).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.directory, '%s-%s.npz' % (key[0], digest))
+
+    def _load(self, key):
+        if self.directory is None or not os.path.exists(self.path(key)):
+            return None
+        try:
+            with np.load(self.path(key), allow_pickle=False) as data:
+                return tuple(data['arr_%d' % n] for n in range(len(data.files)))
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Truncated or corrupt file, regenerated and overwritten by _store()
+            return None
+
+    def _store(self, key, arrays):
+        if self.directory is None:
+            return
+
+        # Written under a temporary name first, so concurrent launches never read a partial file
+        path = self.path(key)
+        temporary_path = '%s.%d.tmp.npz' % (path[:-len('.npz')], os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            np.savez(temporary_path, *arrays)
+            os.replace(temporary_path, path)
+        except OSError:
+            self.write_errors += 1
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def clear(self):
+        '''
+        Empties the in-memory cache, files on disk are kept.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def statistics(self):
+        return {'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'write_errors': self.write_errors}
+
+
+# Shared by the mesh generators of lib.meshes
+geometry_cache = GeometryCache()
@@ -0,0 +1,164 @@
+import os
+import json
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+# Stages of an angle change from the input event to the rendered frame, in order
+STAGES = ('notify', 'queue', 'compute', 'update', 'render')
+
+
+class RollingPercentiles:
+    '''
+    The last window samples of a duration in a ring buffer, percentiles are computed on demand.
+    '''
+    def __init__(self, window=1000):
+        self.samples = np.zeros(window)
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def window(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def summary(self, percentiles=(50, 95, 99)):
+        '''
+        p50, p95, p99, mean and max in ms of the samples in the window (in seconds), NaN without samples.
+        '''
+        samples = 1000. * self.window()
+        if not len(samples):
+            return dict({'p%d' % p: np.nan for p in percentiles}, mean=np.nan, max=np.nan, count=0)
+        values = np.percentile(samples, percentiles)
+        return dict({'p%d' % p: float(v) for p, v in zip(percentiles, values)},
+                    mean=float(samples.mean()), max=float(samples.max()), count=self.count)
+
+
+class LatencyTracker:
+    '''
+    Opt-in latency instrumentation of angle changes, from the input event to the rendered frame.
+
+    Stages (see STAGES):
+    - notify:  input event (typed angle or slider move) to the frame request,
+               i.e. the traits notification chain through AngleControl.final
+    - queue:   frame request to frame start, including the wait for the frame rate cap
+    - compute: rotation of the new angles
+    - update:  scene update (camera transform or vertices, overlays)
+    - render:  VTK render
+    - total:   input event to rendered frame
+    notify and total are taken per event, the others per frame: the render scheduler merges the
+    events arriving while a frame is pending into it (see lib.render_scheduler), queue counts from
+    the first of them. Each stage keeps the durations of the last window frames or events
+    (see RollingPercentiles), and the last trace_frames frames are kept for export_chrome_trace().
+
+    The instrumented code calls input(), request(), frame_started(), mark(stage) and frame_finished().
+    It holds None instead of a tracker when instrumentation is disabled, so disabled instrumentation
+    costs one check per call site. mark() outside of a scheduled frame (e.g. playback) is ignored.
+    '''
+    def __init__(self, window=1000, trace_frames=10000, clock=perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        self.histograms = {stage: RollingPercentiles(window) for stage in STAGES + ('total',)}
+        self.trace = deque(maxlen=trace_frames)
+
+        self.events = 0
+        self.dropped_events = 0
+        self.frames = 0
+
+        self._input_time = None
+        self._pending = []
+        self._frame = None
+
+    def input(self):
+        self._input_time = self.clock()
+
+    def request(self):
+        '''
+        A frame request, attributed to the last input event if any (e.g. not for sequence switches).
+        '''
+        now = self.clock()
+        self._pending.append((now if self._input_time is None else self._input_time, now))
+        self._input_time = None
+        self.events += 1
+
+    def frame_started(self):
+        now = self.clock()
+        self._frame = (now, [], self._pending)
+        self._pending = []
+
+    def mark(self, stage):
+        '''
+        Ends a stage of the current frame, it started with the previous stage.
+        '''
+        if self._frame is not None:
+            self._frame[1].append((stage, self.clock()))
+
+    def frame_finished(self, rendered=True):
+        if self._frame is None:
+            return
+        start, marks, events = self._frame
+        self._frame = None
+        if not rendered or not events:
+            self.dropped_events += len(events)
+            return
+
+        self.frames += 1
+        end = marks[-1][1] if marks else self.clock()
+        self.histograms['queue'].add(start - min(request for _, request in events))
+        stage_start = start
+        for stage, stage_end in marks:
+            self.histograms[stage].add(stage_end - stage_start)
+            stage_start = stage_end
+        for input_time, request in events:
+            self.histograms['notify'].add(request - input_time)
+            self.histograms['total'].add(end - input_time)
+        self.trace.append((start, marks, events))
+
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def hud_text(self):
+        '''
+        Text of the on-screen display: p50/p95/p99 in ms per stage.
+        '''
+        lines = ['latency p50 / p95 / p99 [ms], %d frames' % self.frames]
+        for stage, statistics in self.summary().items():
+            lines.append('%-8s %7.2f %7.2f %7.2f' % (stage, statistics['p50'], statistics['p95'], statistics['p99']))
+        return '\n'.join(lines)
+
+    def export_json(self, path):
+        '''
+        Writes the per stage statistics and the durations in the windows in ms.
+        '''
+        with open(path, 'w') as f:
+            json.dump({'events': self.events, 'dropped_events': self.dropped_events, 'frames': self.frames,
+                       'stages': self.summary(),
+                       'samples_ms': {stage: (1000. * histogram.window()).tolist()
+                                      for stage, histogram in self.histograms.items()}}, f, indent=1)
+
+    def export_chrome_trace(self, path):
+        '''
+        Writes the traced frames in the Chrome trace event format (chrome://tracing, Perfetto):
+        per frame the span from its first input event to the rendered frame, and the stages below it.
+        '''
+        us = lambda t: 1e6 * (t - self.origin)
+        pid = os.getpid()
+        trace_events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in ((1, 'frames'), (2, 'stages'))]
+        for start, marks, events in self.trace:
+            first_input = min(input_time for input_time, _ in events)
+            end = marks[-1][1] if marks else start
+            trace_events.append({'name': 'frame', 'ph': 'X', 'pid': pid, 'tid': 1, 'ts': us(first_input),
+                                 'dur': us(end) - us(first_input), 'args': {'events': len(events)}})
+            stages = [('notify', first_input, min(request for _, request in events)),
+                      ('queue', min(request for _, request in events), start)]
+            stage_start = start
+            for stage, stage_end in marks:
+                stages.append((stage, stage_start, stage_end))
+                stage_start = stage_end
+            trace_events += [{'name': stage, 'ph': 'X', 'pid': pid, 'tid': 2, 'ts': us(stage_start),
+                              'dur': us(stage_end) - us(stage_start)} for stage, stage_start, stage_end in stages]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
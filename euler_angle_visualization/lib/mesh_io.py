@@ -0,0 +1,240 @@
+import os
+import hashlib
+
+import numpy as np
+
+from lib.meshes import CompactTriangleMesh
+from lib.geometry_cache import geometry_cache
+
+# Binary cache layout: magic, uint32 vertex count, uint32 face count,
+# followed by the float32 (N,3) vertices and the int32 (M,3) faces.
+CACHE_MAGIC = b'EAVMESH1'
+CACHE_HEADER = np.dtype([('magic', 'S8'), ('n_vertices', '<u4'), ('n_faces', '<u4')])
+CACHE_SUFFIX = '.meshcache'
+
+
+def mesh_cache_path(path, cache_directory=None):
+    '''
+    Cache file of a model: <cache_directory>/<model name>-<hash of its absolute path>.meshcache,
+    or <path>.meshcache next to the model without cache_directory.
+    '''
+    if cache_directory is None:
+        return path + CACHE_SUFFIX
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:20]
+    return os.path.join(cache_directory, '%s-%s%s' % (os.path.basename(path), digest, CACHE_SUFFIX))
+
+
+def load_mesh(path, cache=True, cache_directory=None):
+    '''
+    Loads a triangle mesh from a PLY, STL or OBJ file as CompactTriangleMesh.
+
+    With cache=True the parsed mesh is stored in cache_directory, by default the directory
+    of lib.geometry_cache.geometry_cache (--geometry-cache) if set, else next to the model
+    (see mesh_cache_path()). Subsequent loads memory-map the cache instead of parsing, as long
+    as it is newer than the model. The mapping is copy-on-write: the mesh can be modified in place
+    (e.g. aligned) without touching the cache file. Caching is best effort: if the cache cannot
+    be written (e.g. a read-only model directory), the parsed mesh is returned all the same.
+    '''
+    cache_path = mesh_cache_path(path, cache_directory if cache_directory is not None else geometry_cache.directory)
+    if cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return read_mesh_cache(cache_path)
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.ply':
+        vertices, faces = parse_ply(path)
+    elif extension == '.stl':
+        vertices, faces = parse_stl(path)
+    elif extension == '.obj':
+        vertices, faces = parse_obj(path)
+    else:
+        raise ValueError("Unsupported mesh format: " + extension)
+
+    mesh = CompactTriangleMesh(np.ascontiguousarray(vertices, dtype=np.float32),
+                               np.ascontiguousarray(faces, dtype=np.int32))
+    if cache:
+        try:
+            write_mesh_cache(cache_path, mesh)
+        except OSError:
+            pass
+    return mesh
+
+
+def write_mesh_cache(cache_path, mesh):
+    directory = os.path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Written under a temporary name first, so concurrent loads never map a partial file
+    header = np.array([(CACHE_MAGIC, len(mesh.vertices), len(mesh.faces))], dtype=CACHE_HEADER)
+    temporary_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        with open(temporary_path, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(np.ascontiguousarray(mesh.vertices, dtype='<f4').tobytes())
+            f.write(np.ascontiguousarray(mesh.faces, dtype='<i4').tobytes())
+        os.replace(temporary_path, cache_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def read_mesh_cache(cache_path):
+    header = np.fromfile(cache_path, dtype=CACHE_HEADER, count=1)[0]
+    if header['magic'] != CACHE_MAGIC:
+        raise ValueError("Not a mesh cache file: " + cache_path)
+
+    n_vertices, n_faces = int(header['n_vertices']), int(header['n_faces'])
+    vertices = np.memmap(cache_path, dtype='<f4', mode='c', offset=CACHE_HEADER.itemsize, shape=(n_vertices, 3))
+    faces = np.memmap(cache_path, dtype='<i4', mode='c', offset=CACHE_HEADER.itemsize + vertices.nbytes,
+                      shape=(n_faces, 3))
+    return CompactTriangleMesh(vertices, faces)
+
+
+def triangulate(polygons):
+    '''
+    Fan triangulation of a list of polygons given as vertex index sequences.
+    '''
+    triangles = []
+    for polygon in polygons:
+        for i in range(1, len(polygon) - 1):
+            triangles.append((polygon[0], polygon[i], polygon[i + 1]))
+    return np.array(triangles, dtype=np.int32).reshape(-1, 3)
+
+
+def parse_ply(path):
+    '''
+    Reads vertex positions and faces of an ascii or binary PLY file.
+    '''
+    ply_types = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+                 'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+                 'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+                 'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError("Not a PLY file: " + path)
+
+        # elements: [name, count, properties], properties: (name, type) or (name, count_type, item_type)
+        elements = []
+        file_format = None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("Unexpected end of PLY header: " + path)
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'format':
+                file_format = words[1]
+            elif words[0] == 'element':
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1][2].append((words[4], ply_types[words[2]], ply_types[words[3]]))
+                else:
+                    elements[-1][2].append((words[2], ply_types[words[1]]))
+            elif words[0] == 'end_header':
+                break
+
+        if file_format == 'ascii':
+            return _read_ply_ascii(f, elements)
+        byte_order = '<' if file_format == 'binary_little_endian' else '>'
+        return _read_ply_binary(f, elements, byte_order)
+
+
+def _read_ply_ascii(f, elements):
+    vertices, faces = None, None
+    for name, count, properties in elements:
+        rows = [f.readline().split() for _ in range(count)]
+        if name == 'vertex':
+            names = [p[0] for p in properties]
+            columns = [names.index('x'), names.index('y'), names.index('z')]
+            vertices = np.array([[float(row[c]) for c in columns] for row in rows], dtype=np.float32).reshape(-1, 3)
+        elif name == 'face':
+            faces = triangulate([[int(i) for i in row[1:1 + int(row[0])]] for row in rows])
+    return vertices, faces
+
+
+def _read_ply_binary(f, elements, byte_order):
+    vertices, faces = None, None
+    for name, count, properties in elements:
+        if any(len(p) == 3 for p in properties):
+            # List properties: fast path for pure triangle meshes, where all rows have the same size
+            start = f.tell()
+            fields = []
+            for p in properties:
+                if len(p) == 3:
+                    fields += [(p[0] + '_count', byte_order + p[1]), (p[0], byte_order + p[2], (3,))]
+                else:
+                    fields.append((p[0], byte_order + p[1]))
+            data = np.fromfile(f, dtype=np.dtype(fields), count=count)
+            list_name = [p[0] for p in properties if len(p) == 3][0]
+            if name == 'face' and len(data) == count and np.all(data[list_name + '_count'] == 3):
+                faces = data[list_name].astype(np.int32)
+                continue
+            f.seek(start)
+            rows = _read_ply_binary_rows(f, count, properties, byte_order)
+            if name == 'face':
+                faces = triangulate([row[list_name] for row in rows])
+        else:
+            dtype = np.dtype([(p[0], byte_order + p[1]) for p in properties])
+            data = np.fromfile(f, dtype=dtype, count=count)
+            if name == 'vertex':
+                vertices = np.stack((data['x'], data['y'], data['z']), axis=1).astype(np.float32)
+    return vertices, faces
+
+
+def _read_ply_binary_rows(f, count, properties, byte_order):
+    rows = []
+    for _ in range(count):
+        row = {}
+        for p in properties:
+            if len(p) == 3:
+                n = int(np.fromfile(f, dtype=byte_order + p[1], count=1)[0])
+                row[p[0]] = np.fromfile(f, dtype=byte_order + p[2], count=n)
+            else:
+                row[p[0]] = np.fromfile(f, dtype=byte_order + p[1], count=1)[0]
+        rows.append(row)
+    return rows
+
+
+def parse_stl(path):
+    '''
+    Reads an ascii or binary STL file. Shared corners of the
+    triangle soup are merged into common vertices.
+    '''
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count_bytes = f.read(4)
+    is_binary = len(count_bytes) == 4 and \
+        os.path.getsize(path) == 84 + 50 * int(np.frombuffer(count_bytes, dtype='<u4')[0])
+
+    if is_binary:
+        record = np.dtype([('normal', '<f4', (3,)), ('corners', '<f4', (3, 3)), ('attribute', '<u2')])
+        corners = np.fromfile(path, dtype=record, offset=84)['corners'].reshape(-1, 3)
+    else:
+        with open(path, 'r') as f:
+            corners = np.array([line.split()[1:4] for line in f if line.lstrip().startswith('vertex')],
+                               dtype=np.float32).reshape(-1, 3)
+
+    vertices, faces = np.unique(corners, axis=0, return_inverse=True)
+    return vertices, faces.reshape(-1, 3)
+
+
+def parse_obj(path):
+    '''
+    Reads vertex positions and faces of a Wavefront OBJ file.
+    Polygons are fan triangulated, texture and normal indices are ignored.
+    '''
+    vertices = []
+    polygons = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('v '):
+                vertices.append(line.split()[1:4])
+            elif line.startswith('f '):
+                # OBJ indices are 1-based, negative indices count from the end
+                polygon = [int(corner.split('/')[0]) for corner in line.split()[1:]]
+                polygons.append([i - 1 if i > 0 else len(vertices) + i for i in polygon])
+
+    return np.array(vertices, dtype=np.float32).reshape(-1, 3), triangulate(polygons)
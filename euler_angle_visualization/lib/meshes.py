@@ -1,7 +1,15 @@
+from inspect import signature
+from functools import wraps
+
 from numpy import array, sin, cos, mgrid
 
 import numpy as np
 
+from lib.geometry_cache import geometry_cache
+
+# Ground grid step by level of detail, 'medium' is the original fixed step
+GROUND_LEVELS_OF_DETAIL = {'low': 0.2, 'medium': 0.1, 'high': 0.05, 'ultra': 0.02}
+
 class TriangleMesh:
     '''
     Used to hold the camera data to be transformed via the UI
@@ -14,6 +22,96 @@ class TriangleMesh:
         self.faces = _faces
 
 
+class CompactTriangleMesh:
+    '''
+    Memory-compact triangle mesh for large external models:
+    one contiguous (N,3) float32 vertex buffer and one (M,3) int32 face buffer,
+    possibly memory-mapped from a cache file (see lib.mesh_io).
+    x, y, z are views on the vertex buffer, so the mesh can be used like TriangleMesh.
+    '''
+    __slots__ = ('vertices', 'faces')
+
+    def __init__(self, vertices, faces):
+        self.vertices = vertices
+        self.faces = faces
+
+    @property
+    def x(self):
+        return self.vertices[:, 0]
+
+    @property
+    def y(self):
+        return self.vertices[:, 1]
+
+    @property
+    def z(self):
+        return self.vertices[:, 2]
+
+
+def transform_vertices_in_place(vertices, T, chunk_rows=65536):
+    '''
+    Applies the 3x3 matrix T to the rows of a (N,3) vertex buffer in place.
+    Works on chunks, so temporary memory stays bounded for any mesh size.
+    '''
+    T = np.asarray(T, dtype=vertices.dtype)
+    for start in range(0, len(vertices), chunk_rows):
+        chunk = vertices[start:start + chunk_rows]
+        chunk[...] = chunk.dot(T.T)
+
+
+def merge_posed_meshes(mesh, rotations, positions, scale=1.):
+    '''
+    Places copies of a mesh at N poses and merges them into one CompactTriangleMesh,
+    e.g. to draw the camera frustums of a whole image block as a single actor.
+
+    rotations: (N,3,3) camera to world rotation matrices
+    positions: (N,3) camera centers
+    Vertex v of pose n ends up at row n * len(mesh.x) + v, face f at row n * len(mesh.faces) + f.
+    '''
+    rotations = np.asarray(rotations, dtype=np.float32)
+    positions = np.asarray(positions, dtype=np.float32)
+    mesh_vertices = scale * np.array([mesh.x, mesh.y, mesh.z], dtype=np.float32)
+    n_vertices = mesh_vertices.shape[1]
+
+    vertices = np.matmul(rotations, mesh_vertices)              # (N,3,V)
+    vertices = vertices.transpose(0, 2, 1) + positions[:, None, :]  # (N,V,3)
+    offsets = np.arange(len(rotations), dtype=np.int32) * n_vertices
+    faces = np.asarray(mesh.faces, dtype=np.int32)[None, :, :] + offsets[:, None, None]
+
+    return CompactTriangleMesh(np.ascontiguousarray(vertices.reshape(-1, 3)), faces.reshape(-1, 3))
+
+
+def grid_triangle_mesh(x, y, z):
+    '''
+    Triangulates a structured (R,C) grid mesh as used by mayavi's mesh(),
+    two triangles per grid cell, into a CompactTriangleMesh.
+    '''
+    rows, columns = np.shape(x)
+    vertices = np.stack((np.ravel(x), np.ravel(y), np.ravel(z)), axis=1).astype(np.float32)
+
+    corners = (np.arange(rows - 1)[:, None] * columns + np.arange(columns - 1)[None, :]).ravel().astype(np.int32)
+    faces = np.concatenate((np.stack((corners, corners + 1, corners + columns), axis=1),
+                            np.stack((corners + 1, corners + columns + 1, corners + columns), axis=1)))
+    return CompactTriangleMesh(vertices, faces)
+
+
+def cached_geometry(generator):
+    '''
+    Caches a generator returning a tuple of arrays in lib.geometry_cache.geometry_cache,
+    keyed by its name and arguments (defaults included). Returns read-only arrays.
+    '''
+    generator_signature = signature(generator)
+
+    @wraps(generator)
+    def cached_generator(*args, **kwargs):
+        arguments = generator_signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        return geometry_cache.get(generator.__name__, arguments.args, lambda: generator(*args, **kwargs))
+
+    cached_generator.uncached = generator
+    return cached_generator
+
+
 def generate_camera_mesh(width = 4, height = 3):
     '''
     Returns camera mesh with origin at (0,0,0) and
@@ -22,8 +120,15 @@ def generate_camera_mesh(width = 4, height = 3):
      z-axis: camera back
 
     Note: This definition can be used with the OPK(ENU) convention.
+    The arrays are read-only and shared, see cached_geometry().
     '''
 
+    return TriangleMesh(*_camera_mesh_arrays(width, height))
+
+
+@cached_geometry
+def _camera_mesh_arrays(width, height):
+
     vertices = array([[0., 0., 0.],
                          [0.5, 0.5, -1.], [0.5, -0.5, -1.],
                          [-0.5, -0.5, -1.], [-0.5, 0.5, -1.],
@@ -36,24 +141,27 @@ def generate_camera_mesh(width = 4, height = 3):
     x *= x_ratio
     y *= y_ratio
 
-    return TriangleMesh(x,y,z, faces)
+    return x, y, z, faces
 
 
-def generate_ground_mesh(dimensions):
+@cached_geometry
+def generate_ground_mesh(dimensions, step=0.1):
     '''
     Object representing the ENU world scene using origin at the cameras.
+    step is the grid spacing, see GROUND_LEVELS_OF_DETAIL.
 
     The return x,y,z define a surface function and
     are meant to be used by mayavi's surf()
     '''
 
-    x,y = mgrid[-dimensions[0] : dimensions[0] : 0.1,
-                -dimensions[1] : dimensions[1] : 0.1]
+    x,y = mgrid[-dimensions[0] : dimensions[0] : step,
+                -dimensions[1] : dimensions[1] : step]
     z = dimensions[2] * cos(x)*sin(-3.*y)
 
     return x,y,z
 
 
+@cached_geometry
 def generate_cyllinder_mesh(r, cone=False):
     '''
     Cyllinder mesh with z=[0,1] with radius r
@@ -79,6 +187,7 @@ def generate_cyllinder_mesh(r, cone=False):
 
     return x,y,z
 
+@cached_geometry
 def generate_arrow_mesh(height = 1.):
     '''
     Arrow object, will be used as coordinate system indicator
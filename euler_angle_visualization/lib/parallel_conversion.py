@@ -0,0 +1,90 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lib.pose_conversion import PoseConverter
+
+# Per worker process state, set up once by _initialize_worker()
+_worker = {}
+
+
+def open_angles(path, raw=False, mode='r'):
+    '''
+    Memory-maps an (N,3) float64 angle array stored as .npy or as raw native float64 buffer.
+    '''
+    if raw:
+        return np.memmap(path, dtype=np.float64, mode=mode).reshape(-1, 3)
+    return np.load(path, mmap_mode=mode)
+
+
+def create_output(path, shape, raw=False):
+    if raw:
+        return np.memmap(path, dtype=np.float64, mode='w+', shape=shape)
+    return np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+
+
+def open_output(path, raw=False):
+    if raw:
+        return np.memmap(path, dtype=np.float64, mode='r+')
+    return np.load(path, mmap_mode='r+')
+
+
+def _initialize_worker(input_path, output_path, raw, source_convention, target_convention, output):
+    # Workers map the files themselves, only shard bounds and timings cross process boundaries
+    _worker['input'] = open_angles(input_path, raw)
+    _worker['output'] = open_output(output_path, raw)
+    _worker['converter'] = PoseConverter(source_convention, target_convention)
+    _worker['output_type'] = output
+
+
+def _convert_shard(start, stop):
+    started = time.perf_counter()
+    converter = _worker['converter']
+    angles = np.asarray(_worker['input'][start:stop])
+
+    if _worker['output_type'] == 'matrix':
+        values = converter.source_rotation_matrices(angles).reshape(stop - start, 9)
+        near_singular_poses = 0
+    else:
+        values, near_singular = converter.convert_angles(angles)
+        near_singular_poses = int(near_singular.sum())
+
+    output = _worker['output']
+    output.reshape(-1, values.shape[1])[start:stop] = values
+    return os.getpid(), stop - start, near_singular_poses, time.perf_counter() - started
+
+
+def convert_angles_file(input_path, output_path, source_convention, target_convention, output='angles',
+                        raw=False, workers=None, shard_size=1000000):
+    '''
+    Converts a binary (N,3) float64 angle file (degrees, ordered as applied) from the source into
+    the target convention in parallel.
+
+    The input is memory-mapped and split into shards of shard_size rows, which a pool of
+    worker processes converts directly into a preallocated memory-mapped output:
+    (N,3) target angles or, with output='matrix', (N,3,3) target rotation matrices.
+    Only shard bounds are sent to the workers, no array data is pickled.
+
+    Returns per worker statistics {pid: {'shards', 'poses', 'near_singular_poses', 'seconds'}}.
+    '''
+    n = len(open_angles(input_path, raw))
+    shape = (n, 3, 3) if output == 'matrix' else (n, 3)
+    create_output(output_path, shape, raw).flush()
+
+    workers = workers or os.cpu_count()
+    statistics = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                             initargs=(input_path, output_path, raw, source_convention, target_convention,
+                                       output)) as executor:
+        starts = range(0, n, shard_size)
+        stops = [min(start + shard_size, n) for start in starts]
+        for pid, poses, near_singular_poses, seconds in executor.map(_convert_shard, starts, stops):
+            worker = statistics.setdefault(pid, {'shards': 0, 'poses': 0, 'near_singular_poses': 0, 'seconds': 0.})
+            worker['shards'] += 1
+            worker['poses'] += poses
+            worker['near_singular_poses'] += near_singular_poses
+            worker['seconds'] += seconds
+
+    return statistics
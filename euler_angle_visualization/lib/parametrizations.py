@@ -0,0 +1,197 @@
+import numpy as np
+
+from lib.rotations import rotation_matrices, angles_from_rotation_matrices, angles_from_rotation_entries
+
+# Rotation parametrizations, all vectorized over the leading (N) dimension:
+# - 'angles':          (N,3) Tait-Bryan angles in radians, ordered as applied (needs a convention)
+# - 'quaternion':      (N,4) unit quaternions (w, x, y, z), scalar first, with w >= 0
+# - 'rotation_vector': (N,3) exponential map, axis * angle in radians, angle in [0, pi]
+# - 'matrix':          (N,3,3) camera to world rotation matrices
+# All of them describe the same camera to world rotation as lib.rotations.rotation_matrices().
+PARAMETRIZATIONS = ('angles', 'quaternion', 'rotation_vector', 'matrix')
+
+
+def quaternion_multiply(p, q):
+    '''
+    Hamilton product p * q of (N,4) quaternions, i.e. the rotation R(p) R(q).
+    '''
+    pw, px, py, pz = np.moveaxis(p, -1, 0)
+    qw, qx, qy, qz = np.moveaxis(q, -1, 0)
+    return np.stack((pw * qw - px * qx - py * qy - pz * qz,
+                     pw * qx + px * qw + py * qz - pz * qy,
+                     pw * qy - px * qz + py * qw + pz * qx,
+                     pw * qz + px * qy - py * qx + pz * qw), axis=-1)
+
+
+def canonical_quaternions(quaternions):
+    '''
+    q and -q describe the same rotation, returns the one with w >= 0.
+    '''
+    return np.where(quaternions[..., :1] < 0., -quaternions, quaternions)
+
+
+def elemental_quaternions(axis, angles):
+    '''
+    Quaternions of the elemental rotations around the axis with index 0,1,2,
+    i.e. (cos(angle/2), sin(angle/2) * e_axis).
+    '''
+    half_angles = 0.5 * np.asarray(angles, dtype=float)
+    quaternions = np.zeros(half_angles.shape + (4,))
+    quaternions[..., 0] = np.cos(half_angles)
+    quaternions[..., 1 + axis] = np.sin(half_angles)
+    return quaternions
+
+
+def quaternions_from_angles(convention, angles):
+    '''
+    Composes the half-angle quaternions of the three elemental rotations
+    without building rotation matrices.
+    '''
+    angles = np.asarray(angles, dtype=float)
+    (axis_first, axis_second, axis_last), (sign_first, sign_second, sign_last) = convention.axes, convention.signs
+
+    # Same order as the matrices: R = R_first R_second R_last
+    quaternions = quaternion_multiply(quaternion_multiply(
+        elemental_quaternions(axis_first, sign_first * angles[..., 0]),
+        elemental_quaternions(axis_second, sign_second * angles[..., 1])),
+        elemental_quaternions(axis_last, sign_last * angles[..., 2]))
+    return canonical_quaternions(quaternions)
+
+
+def angles_from_quaternions(convention, quaternions, gimbal_lock_tolerance=1e-6):
+    '''
+    Returns the angles and gimbal lock flags, see lib.rotations.angles_from_rotation_matrices().
+    Only the rotation matrix entries the extraction needs are computed.
+    '''
+    quaternions = np.asarray(quaternions, dtype=float)
+    return angles_from_rotation_entries(convention, lambda row, column: _rotation_entry(quaternions, row, column),
+                                        gimbal_lock_tolerance)
+
+
+def _rotation_entry(quaternions, row, column):
+    w = quaternions[..., 0]
+    v = quaternions[..., 1:]
+    if row == column:
+        a, b = (row + 1) % 3, (row + 2) % 3
+        return 1. - 2. * (v[..., a] * v[..., a] + v[..., b] * v[..., b])
+    # +w v_k for cyclic (row, column, k), -w v_k otherwise
+    k = 3 - row - column
+    sign = 1. if (column - row) % 3 == 2 else -1.
+    return 2. * (v[..., row] * v[..., column] + sign * w * v[..., k])
+
+
+def rotation_matrices_from_quaternions(quaternions):
+    w, x, y, z = np.moveaxis(np.asarray(quaternions, dtype=float), -1, 0)
+    rotations = np.empty(w.shape + (3, 3))
+    rotations[..., 0, 0] = 1. - 2. * (y * y + z * z)
+    rotations[..., 0, 1] = 2. * (x * y - z * w)
+    rotations[..., 0, 2] = 2. * (x * z + y * w)
+    rotations[..., 1, 0] = 2. * (x * y + z * w)
+    rotations[..., 1, 1] = 1. - 2. * (x * x + z * z)
+    rotations[..., 1, 2] = 2. * (y * z - x * w)
+    rotations[..., 2, 0] = 2. * (x * z - y * w)
+    rotations[..., 2, 1] = 2. * (y * z + x * w)
+    rotations[..., 2, 2] = 1. - 2. * (x * x + y * y)
+    return rotations
+
+
+def quaternions_from_rotation_matrices(rotations):
+    '''
+    Shepperd's method: per rotation, the largest of |w|, |x|, |y|, |z| is
+    taken from the diagonal and the others from the off-diagonal entries,
+    which keeps the division well conditioned for all rotations.
+    '''
+    rotations = np.asarray(rotations, dtype=float)
+    r = lambda row, column: rotations[..., row, column]
+
+    # 4 * (w², x², y², z²) = 1 + (trace, 2 r00 - trace, 2 r11 - trace, 2 r22 - trace)
+    trace = r(0, 0) + r(1, 1) + r(2, 2)
+    squares = 1. + np.stack((trace, 2. * r(0, 0) - trace, 2. * r(1, 1) - trace, 2. * r(2, 2) - trace), axis=-1)
+    largest = np.argmax(squares, axis=-1)
+
+    # 4 * (w x, w y, w z, x y, x z, y z)
+    wx, wy, wz = r(2, 1) - r(1, 2), r(0, 2) - r(2, 0), r(1, 0) - r(0, 1)
+    xy, xz, yz = r(0, 1) + r(1, 0), r(0, 2) + r(2, 0), r(1, 2) + r(2, 1)
+    products = (np.stack((squares[..., 0], wx, wy, wz), axis=-1),
+                np.stack((wx, squares[..., 1], xy, xz), axis=-1),
+                np.stack((wy, xy, squares[..., 2], yz), axis=-1),
+                np.stack((wz, xz, yz, squares[..., 3]), axis=-1))
+
+    # Row 'largest' of the products divided by 4 * its largest component
+    quaternions = np.choose(largest[..., None], products)
+    quaternions /= 2. * np.sqrt(np.take_along_axis(squares, largest[..., None], axis=-1))
+    return canonical_quaternions(quaternions)
+
+
+def rotation_vectors_from_quaternions(quaternions):
+    '''
+    Logarithmic map: axis * angle with angle in [0, pi].
+    '''
+    quaternions = canonical_quaternions(np.asarray(quaternions, dtype=float))
+    w = quaternions[..., 0]
+    v = quaternions[..., 1:]
+    sin_half = np.linalg.norm(v, axis=-1)
+    angle = 2. * np.arctan2(sin_half, w)
+
+    # angle / sin(angle/2) -> 2 for small angles (Taylor: 2 + angle²/12)
+    small = sin_half < 1e-8
+    scale = np.where(small, 2. + angle * angle / 12., angle / np.where(small, 1., sin_half))
+    return v * scale[..., None]
+
+
+def quaternions_from_rotation_vectors(rotation_vectors):
+    '''
+    Exponential map.
+    '''
+    rotation_vectors = np.asarray(rotation_vectors, dtype=float)
+    angle = np.linalg.norm(rotation_vectors, axis=-1)
+    half = 0.5 * angle
+
+    # sin(angle/2) / angle -> 1/2 for small angles (Taylor: 1/2 - angle²/48)
+    small = angle < 1e-8
+    scale = np.where(small, 0.5 - angle * angle / 48., np.sin(half) / np.where(small, 1., angle))
+
+    quaternions = np.empty(rotation_vectors.shape[:-1] + (4,))
+    quaternions[..., 0] = np.cos(half)
+    quaternions[..., 1:] = rotation_vectors * scale[..., None]
+    return canonical_quaternions(quaternions)
+
+
+# Conversions into and out of quaternions, the hub all other paths go through
+_TO_QUATERNION = {
+    'angles': lambda values, convention: quaternions_from_angles(convention, values),
+    'quaternion': lambda values, convention: canonical_quaternions(np.asarray(values, dtype=float)),
+    'rotation_vector': lambda values, convention: quaternions_from_rotation_vectors(values),
+    'matrix': lambda values, convention: quaternions_from_rotation_matrices(values),
+}
+
+_FROM_QUATERNION = {
+    'angles': lambda quaternions, convention: angles_from_quaternions(convention, quaternions)[0],
+    'quaternion': lambda quaternions, convention: quaternions,
+    'rotation_vector': lambda quaternions, convention: rotation_vectors_from_quaternions(quaternions),
+    'matrix': lambda quaternions, convention: rotation_matrices_from_quaternions(quaternions),
+}
+
+# Paths that are cheaper without the detour over quaternions
+_DIRECT = {
+    ('angles', 'matrix'): lambda values, convention: rotation_matrices(convention, values),
+    ('matrix', 'angles'): lambda values, convention: angles_from_rotation_matrices(convention, values)[0],
+}
+
+
+def convert_rotations(values, source, target, convention=None):
+    '''
+    Converts (N,...) rotations from the source into the target parametrization,
+    see PARAMETRIZATIONS. 'angles' require a compiled convention.
+    Use the specific functions to get gimbal lock flags for 'angles'.
+    '''
+    if source not in PARAMETRIZATIONS or target not in PARAMETRIZATIONS:
+        raise ValueError("Unknown parametrization, expected one of " + ', '.join(PARAMETRIZATIONS))
+    if 'angles' in (source, target) and convention is None:
+        raise ValueError("Converting angles requires a convention")
+
+    if source == target:
+        return np.asarray(values, dtype=float)
+    if (source, target) in _DIRECT:
+        return _DIRECT[source, target](values, convention)
+    return _FROM_QUATERNION[target](_TO_QUATERNION[source](values, convention), convention)
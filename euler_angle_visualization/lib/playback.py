@@ -0,0 +1,211 @@
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+from lib.parametrizations import quaternions_from_angles, rotation_matrices_from_quaternions
+
+
+def load_angle_time_series(path):
+    '''
+    Loads a recorded attitude time series (e.g. an IMU log) as (times, angles):
+    - .npz with (N,) "times" in seconds and (N,3) "angles" in degrees, ordered as applied
+    - text with the columns time, and the three angles in degrees ordered as applied,
+      comma separated for .csv and whitespace separated otherwise. '#' starts a comment.
+    '''
+    if path.endswith('.npz'):
+        data = np.load(path)
+        return np.asarray(data['times'], dtype=float), np.asarray(data['angles'], dtype=float)
+
+    data = np.loadtxt(path, delimiter=',' if path.endswith('.csv') else None, ndmin=2)
+    return data[:, 0], data[:, 1:4]
+
+
+def slerp(q0, q1, fractions):
+    '''
+    Spherical linear interpolation between (N,4) unit quaternions for (N,) fractions in [0, 1].
+    Interpolates along the shorter arc, q and -q being the same rotation.
+    '''
+    dot = np.sum(q0 * q1, axis=-1)
+    q1 = np.where(dot[..., None] < 0., -q1, q1)
+    theta = np.arccos(np.clip(np.abs(dot), 0., 1.))
+    sin_theta = np.sin(theta)
+
+    # Nearly identical rotations: fall back to linear interpolation
+    linear = sin_theta < 1e-6
+    sin_theta = np.where(linear, 1., sin_theta)
+    weight0 = np.where(linear, 1. - fractions, np.sin((1. - fractions) * theta) / sin_theta)
+    weight1 = np.where(linear, fractions, np.sin(fractions * theta) / sin_theta)
+
+    quaternions = weight0[..., None] * q0 + weight1[..., None] * q1
+    return quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+
+
+class AttitudeTrajectory:
+    '''
+    Camera to world rotations over time, stored as (N,4) quaternions
+    and resampled at arbitrary times by SLERP between neighbouring samples.
+    '''
+    def __init__(self, times, quaternions):
+        self.times = np.asarray(times, dtype=float)
+        self.quaternions = np.asarray(quaternions, dtype=float)
+        if len(self.times) < 2 or np.any(np.diff(self.times) <= 0.):
+            raise ValueError("A trajectory requires at least two samples at increasing times")
+
+    @property
+    def duration(self):
+        return self.times[-1] - self.times[0]
+
+    def quaternions_at(self, times):
+        '''
+        Resampled (N,4) quaternions at (N,) times, clamped to the recorded time span.
+        '''
+        times = np.clip(times, self.times[0], self.times[-1])
+        indices = np.clip(np.searchsorted(self.times, times, side='right') - 1, 0, len(self.times) - 2)
+        start, end = self.times[indices], self.times[indices + 1]
+        return slerp(self.quaternions[indices], self.quaternions[indices + 1], (times - start) / (end - start))
+
+
+def trajectory_from_angles(convention, times, angles):
+    '''
+    Builds a trajectory from (N,3) angles in degrees, ordered as applied.
+    '''
+    return AttitudeTrajectory(times, quaternions_from_angles(convention, np.deg2rad(angles)))
+
+
+class PlaybackEngine:
+    '''
+    Replays a trajectory at a fixed frame rate: frame k shows the
+    trajectory at speed * k / fps seconds after its start.
+
+    Rotations are computed in batches of batch_size frames ahead of the
+    render cursor, keeping at most look_ahead frames buffered.
+    Compute time is recorded per batch.
+    '''
+    def __init__(self, trajectory, fps=30., speed=1., batch_size=64, look_ahead=256, clock=perf_counter):
+        self.trajectory = trajectory
+        self.fps = fps
+        self.speed = speed
+        self.batch_size = batch_size
+        self.look_ahead = max(look_ahead, batch_size)
+        self.clock = clock
+        self.frame_count = int(np.floor(trajectory.duration * fps / speed)) + 1
+
+        # (first frame index, (n,3,3) rotations)
+        self._buffer = deque()
+        self._next_frame = 0
+
+        # (seconds, frames) per computed batch
+        self.batch_compute_times = []
+
+    def buffered_frames(self):
+        return sum(len(rotations) for _, rotations in self._buffer)
+
+    def fill(self):
+        '''
+        Computes batches until the look-ahead buffer is full or the trajectory ends.
+        '''
+        while self._next_frame < self.frame_count and self.buffered_frames() + self.batch_size <= self.look_ahead:
+            self._compute_batch()
+
+    def _compute_batch(self):
+        start = self.clock()
+        frames = np.arange(self._next_frame, min(self._next_frame + self.batch_size, self.frame_count))
+        times = self.trajectory.times[0] + frames * (self.speed / self.fps)
+        rotations = rotation_matrices_from_quaternions(self.trajectory.quaternions_at(times))
+        self._buffer.append((frames[0], rotations))
+        self._next_frame = frames[-1] + 1
+        self.batch_compute_times.append((self.clock() - start, len(frames)))
+
+    def rotation(self, frame):
+        '''
+        Returns the camera to world rotation of the frame and discards all
+        earlier buffered frames. If the frame is not buffered yet (the renderer
+        ran ahead of the look-ahead, e.g. after dropped frames), the buffer
+        restarts at that frame.
+        '''
+        while self._buffer and self._buffer[0][0] + len(self._buffer[0][1]) <= frame:
+            self._buffer.popleft()
+        if not self._buffer or self._buffer[0][0] > frame:
+            self._buffer.clear()
+            self._next_frame = frame
+            self._compute_batch()
+
+        first, rotations = self._buffer[0]
+        return rotations[frame - first]
+
+
+class Player:
+    '''
+    Drives a PlaybackEngine in real time without blocking the GUI thread.
+
+    - show(rotation) applies a camera to world rotation and renders the scene.
+    - call_later(delay_in_seconds, callback) runs the callback on the GUI thread,
+      as for the RenderScheduler.
+
+    Each tick shows the frame due at the current time. Frames whose time passed
+    while the previous frame rendered are dropped rather than shown late.
+    The time left until the next frame is used to refill the look-ahead buffer.
+    '''
+    def __init__(self, engine, show, call_later, on_finished=None, clock=perf_counter):
+        self.engine = engine
+        self.show = show
+        self.call_later = call_later
+        self.on_finished = on_finished
+        self.clock = clock
+
+        self.frames_shown = 0
+        self.frames_dropped = 0
+        self.render_times = []
+
+        self.running = False
+        self._start_time = None
+        self._last_frame = -1
+
+    def start(self):
+        self.engine.fill()
+        self.running = True
+        self._start_time = self.clock()
+        self._last_frame = -1
+        self.call_later(0., self._tick)
+
+    def stop(self):
+        self.running = False
+
+    def _tick(self):
+        if not self.running:
+            return
+
+        frame = max(int((self.clock() - self._start_time) * self.engine.fps), self._last_frame + 1)
+        if frame >= self.engine.frame_count:
+            self.frames_dropped += self.engine.frame_count - 1 - self._last_frame
+            self.running = False
+            if self.on_finished is not None:
+                self.on_finished()
+            return
+
+        self.frames_dropped += frame - self._last_frame - 1
+        self._last_frame = frame
+
+        rotation = self.engine.rotation(frame)
+        start = self.clock()
+        self.show(rotation)
+        self.render_times.append(self.clock() - start)
+        self.frames_shown += 1
+
+        self.engine.fill()
+        next_frame_time = self._start_time + (frame + 1) / self.engine.fps
+        self.call_later(max(0., next_frame_time - self.clock()), self._tick)
+
+    def statistics(self):
+        '''
+        Frame counts and per frame times in milliseconds.
+        '''
+        compute_seconds = sum(seconds for seconds, _ in self.engine.batch_compute_times)
+        computed_frames = sum(frames for _, frames in self.engine.batch_compute_times)
+        return {'frames_shown': self.frames_shown,
+                'frames_dropped': self.frames_dropped,
+                'compute_ms_mean': 1000. * compute_seconds / computed_frames if computed_frames else 0.,
+                'compute_ms_max_batch': 1000. * max([seconds for seconds, _ in self.engine.batch_compute_times] or [0.]),
+                'render_ms_mean': 1000. * float(np.mean(self.render_times)) if self.render_times else 0.,
+                'render_ms_max': 1000. * max(self.render_times or [0.])}
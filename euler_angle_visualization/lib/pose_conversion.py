@@ -0,0 +1,50 @@
+import numpy as np
+
+from lib.conventions import CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC, axes_alignment_matrix
+from lib.rotations import rotation_matrices, angles_from_rotation_matrices
+
+
+class PoseConverter:
+    '''
+    Converts camera poses between two compiled conventions, which may use different world systems.
+
+    A rotation matrix of a convention rotates the camera mesh aligned with its world system
+    (see draw_scene.generate_aligned_camera_mesh()). The physical camera orientation is kept:
+        R_target = A @ R_source @ T_source @ T_target^T
+    with A mapping source to target world coordinates and T_* the camera alignment matrices.
+    Positions are mapped by A.
+    '''
+    def __init__(self, source_convention, target_convention,
+                 camera_world_alignment_at_zero=CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC):
+        self.source_convention = source_convention
+        self.target_convention = target_convention
+
+        self.world_alignment = axes_alignment_matrix(target_convention.world_axes, source_convention.world_axes)
+        camera_alignment_source = axes_alignment_matrix(source_convention.world_axes, camera_world_alignment_at_zero)
+        camera_alignment_target = axes_alignment_matrix(target_convention.world_axes, camera_world_alignment_at_zero)
+        self.camera_alignment = camera_alignment_source.dot(camera_alignment_target.T)
+
+    def convert_positions(self, positions):
+        return np.asarray(positions, dtype=float).dot(self.world_alignment.T)
+
+    def convert_rotation_matrices(self, rotations):
+        '''
+        (N,3,3) source rotation matrices to (N,3,3) target rotation matrices.
+        '''
+        return np.matmul(np.matmul(self.world_alignment, rotations), self.camera_alignment)
+
+    def source_rotation_matrices(self, angles):
+        '''
+        (N,3) source angles in degrees (ordered as applied) to (N,3,3) target rotation matrices.
+        '''
+        return self.convert_rotation_matrices(rotation_matrices(self.source_convention, np.deg2rad(angles)))
+
+    def convert_angles(self, angles):
+        '''
+        (N,3) source angles in degrees (ordered as applied) to (N,3) target angles in degrees
+        and the (N,) gimbal lock flags of the target convention.
+        '''
+        target_angles, near_singular = angles_from_rotation_matrices(self.target_convention,
+                                                                     self.source_rotation_matrices(angles))
+        # + 0. turns -0. into 0. for output
+        return np.rad2deg(target_angles) + 0., near_singular
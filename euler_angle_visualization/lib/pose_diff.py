@@ -0,0 +1,254 @@
+import os
+import zlib
+import shutil
+import tempfile
+
+import numpy as np
+
+from lib.conventions import CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC, axes_alignment_matrix
+from lib.rotations import rotation_matrices, angles_from_rotation_matrices
+from lib.pose_conversion import PoseConverter
+from lib.pose_io import read_pose_chunks, format_pose_lines
+from lib.parametrizations import quaternions_from_rotation_matrices, rotation_vectors_from_quaternions
+
+
+def wrapped_degrees(angles):
+    '''
+    Angles in degrees wrapped to [-180, 180).
+    '''
+    return (angles + 180.) % 360. - 180.
+
+
+class RunningStatistics:
+    '''
+    One-pass mean, standard deviation, RMS, minimum and maximum per column.
+    Each chunk's moments are computed vectorized and merged into the running ones
+    (Chan et al.), so the values are seen once and never kept.
+    '''
+    def __init__(self, columns):
+        self.count = 0
+        self.mean = np.zeros(columns)
+        self.m2 = np.zeros(columns)
+        self.minimum = np.full(columns, np.inf)
+        self.maximum = np.full(columns, -np.inf)
+
+    def update(self, values):
+        '''
+        values: (N, columns)
+        '''
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = np.sum((values - mean)**2, axis=0)
+
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta**2 * (self.count * n / total)
+        self.count = total
+        self.minimum = np.minimum(self.minimum, values.min(axis=0))
+        self.maximum = np.maximum(self.maximum, values.max(axis=0))
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else np.full(len(self.mean), np.nan)
+
+    @property
+    def rms(self):
+        return np.sqrt(self.mean**2 + self.std**2)
+
+
+class WorstPairs:
+    '''
+    The k pairs with the largest errors seen so far. Each chunk is reduced to its
+    k largest by a partial sort, so memory stays at k pairs.
+    '''
+    def __init__(self, k):
+        self.k = k
+        self.names = np.array([], dtype=str)
+        self.errors = np.array([])
+
+    def update(self, names, errors):
+        if self.k <= 0 or len(errors) == 0:
+            return
+        names = np.concatenate((self.names, np.asarray(names)))
+        errors = np.concatenate((self.errors, errors))
+        if len(errors) > self.k:
+            largest = np.argpartition(errors, len(errors) - self.k)[-self.k:]
+            names, errors = names[largest], errors[largest]
+        self.names, self.errors = names, errors
+
+    def items(self):
+        '''
+        (name, error) pairs, largest error first.
+        '''
+        order = np.argsort(-self.errors, kind='stable')
+        return list(zip(self.names[order].tolist(), self.errors[order].tolist()))
+
+
+def join_pose_chunks(chunks_a, chunks_b, max_pending=None):
+    '''
+    Joins two streams of pose chunks (see lib.pose_io.read_pose_chunks()) by image name.
+    Yields (names, angles_a, angles_b) of the matched images and finally returns the
+    numbers of images only found in a and only in b (a generator's return value).
+
+    Chunks are read from both streams alternately and images without partner so far are kept
+    pending until it arrives, so files in the same or a similar image order are joined with
+    memory bounded by their offset. More than max_pending pending images raise a ValueError
+    (see compare_pose_files() for files in unrelated orders).
+    '''
+    pending = [(np.array([], dtype=str), np.empty((0, 3))), (np.array([], dtype=str), np.empty((0, 3)))]
+    streams = [iter(chunks_a), iter(chunks_b)]
+    while streams[0] is not None or streams[1] is not None:
+        for side, stream in enumerate(streams):
+            if stream is None:
+                continue
+            chunk = next(stream, None)
+            if chunk is None:
+                streams[side] = None
+                continue
+            names, _, angles = chunk
+            pending[side] = (np.concatenate((pending[side][0], names)), np.concatenate((pending[side][1], angles)))
+
+        (names_a, angles_a), (names_b, angles_b) = pending
+        names, index_a, index_b = np.intersect1d(names_a, names_b, return_indices=True)
+        if len(names):
+            yield names, angles_a[index_a], angles_b[index_b]
+            keep_a = np.ones(len(names_a), dtype=bool)
+            keep_a[index_a] = False
+            keep_b = np.ones(len(names_b), dtype=bool)
+            keep_b[index_b] = False
+            pending = [(names_a[keep_a], angles_a[keep_a]), (names_b[keep_b], angles_b[keep_b])]
+
+        if max_pending is not None and len(pending[0][0]) + len(pending[1][0]) > max_pending:
+            raise ValueError("More than %d images without partner pending: the files are not in the same "
+                             "image order" % max_pending)
+
+    return len(pending[0][0]), len(pending[1][0])
+
+
+class PoseDifferences:
+    '''
+    Streaming comparison of the camera orientations of two pose sets in different conventions
+    (e.g. IMU Yaw Pitch Roll in NED against photogrammetric Omega Phi Kappa in ENU).
+
+    Per matched image, the orientation of a is converted into the convention of b
+    (see lib.pose_conversion.PoseConverter) and compared with the orientation of b:
+    - error:     geodesic angle of the relative rotation in degrees
+    - boresight: its rotation vector in camera axes (right, top, back) in degrees,
+                 whose mean is the boresight misalignment of b w.r.t. a
+    - angles:    the angles of b minus the converted angles of a in degrees, wrapped,
+                 left out for poses in gimbal lock where single angles are meaningless
+    Statistics are accumulated in one pass, see RunningStatistics and WorstPairs.
+    '''
+    def __init__(self, convention_a, convention_b, worst=10,
+                 camera_world_alignment_at_zero=CAMERA_WORLD_ALIGNMENT_AT_ZERO_PHOTOGRAMMETRIC):
+        self.converter = PoseConverter(convention_a, convention_b, camera_world_alignment_at_zero)
+        self.camera_alignment = axes_alignment_matrix(convention_b.world_axes, camera_world_alignment_at_zero)
+
+        self.errors = RunningStatistics(1)
+        self.boresight = RunningStatistics(3)
+        self.angles = RunningStatistics(3)
+        self.worst = WorstPairs(worst)
+        self.near_singular = 0
+
+    def differences(self, angles_a, angles_b):
+        '''
+        (N,) errors, (N,3) boresight rotation vectors and (N,3) angle differences (NaN in gimbal lock)
+        of (N,3) angles of a and b in degrees, ordered as applied.
+        '''
+        rotations_a = self.converter.source_rotation_matrices(angles_a)
+        rotations_b = rotation_matrices(self.converter.target_convention, np.deg2rad(angles_b))
+
+        # Relative rotation in camera coordinates: (R_a T)^T (R_b T)
+        T = self.camera_alignment
+        relative = np.matmul(np.matmul(T.T, np.matmul(rotations_a.transpose(0, 2, 1), rotations_b)), T)
+        boresight = np.rad2deg(rotation_vectors_from_quaternions(quaternions_from_rotation_matrices(relative)))
+        errors = np.linalg.norm(boresight, axis=1)
+
+        converted_a, near_singular = angles_from_rotation_matrices(self.converter.target_convention, rotations_a)
+        angle_differences = wrapped_degrees(np.asarray(angles_b, dtype=float) - np.rad2deg(converted_a))
+        angle_differences[near_singular] = np.nan
+        return errors, boresight, angle_differences
+
+    def update(self, names, angles_a, angles_b):
+        errors, boresight, angle_differences = self.differences(angles_a, angles_b)
+        self.errors.update(errors[:, None])
+        self.boresight.update(boresight)
+        regular = ~np.isnan(angle_differences[:, 0])
+        self.angles.update(angle_differences[regular])
+        self.near_singular += len(regular) - int(regular.sum())
+        self.worst.update(names, errors)
+        return errors, boresight
+
+
+def _partition_pose_file(input_file, file_format, directory, partitions, chunk_size):
+    files = [open(os.path.join(directory, '%d.csv' % partition), 'w', buffering=1 << 20)
+             for partition in range(partitions)]
+    try:
+        for names, positions, angles in read_pose_chunks(input_file, file_format, chunk_size):
+            # crc32 instead of hash(), which is salted per process for strings
+            partition = np.array([zlib.crc32(name.encode('utf-8')) for name in names]) % partitions
+            for n, f in enumerate(files):
+                rows = np.flatnonzero(partition == n)
+                if len(rows):
+                    # Angles written back in file column order, see lib.pose_io.parse_pose_lines()
+                    f.write(format_pose_lines([names[row] for row in rows], positions[rows], angles[rows, ::-1], ','))
+    finally:
+        for f in files:
+            f.close()
+
+
+def compare_pose_files(file_a, file_b, convention_a, convention_b, file_format_a='csv', file_format_b='csv',
+                       chunk_size=100000, max_pending=1000000, partitions=None, worst=10, pairs_file=None,
+                       temporary_directory=None):
+    '''
+    Streams two pose files (see lib.pose_io), joins them by image name and accumulates their
+    PoseDifferences. Returns the PoseDifferences and the numbers of images only in a and only in b.
+
+    Files in the same or a similar image order are joined on the fly (see join_pose_chunks()).
+    With partitions, both files are first split by a hash of the image name into that many
+    partition files in temporary_directory and joined partition by partition, so any image orders
+    are joined with memory bounded by the partition size instead.
+    pairs_file: optional text file for "image,error,right,top,back" per matched image (see PoseDifferences),
+                in partition order with partitions.
+    '''
+    differences = PoseDifferences(convention_a, convention_b, worst)
+    if pairs_file is not None:
+        pairs_file.write('image,error,right,top,back\n')
+
+    def compare(chunks_a, chunks_b, max_pending):
+        joined = join_pose_chunks(chunks_a, chunks_b, max_pending)
+        while True:
+            try:
+                names, angles_a, angles_b = next(joined)
+            except StopIteration as stop:
+                return stop.value
+            errors, boresight = differences.update(names, angles_a, angles_b)
+            if pairs_file is not None:
+                pairs_file.write(format_pose_lines(names, errors[:, None], boresight, ',', precision=6))
+
+    if not partitions:
+        only_a, only_b = compare(read_pose_chunks(file_a, file_format_a, chunk_size),
+                                 read_pose_chunks(file_b, file_format_b, chunk_size), max_pending)
+        return differences, only_a, only_b
+
+    directory = tempfile.mkdtemp(prefix='pose-diff-', dir=temporary_directory)
+    try:
+        for side, (f, file_format) in enumerate(((file_a, file_format_a), (file_b, file_format_b))):
+            os.makedirs(os.path.join(directory, str(side)))
+            _partition_pose_file(f, file_format, os.path.join(directory, str(side)), partitions, chunk_size)
+
+        only_a, only_b = 0, 0
+        for partition in range(partitions):
+            with open(os.path.join(directory, '0', '%d.csv' % partition)) as partition_a, \
+                    open(os.path.join(directory, '1', '%d.csv' % partition)) as partition_b:
+                # The whole partition of a may be pending until its partners in b arrive
+                partition_only_a, partition_only_b = compare(read_pose_chunks(partition_a, 'csv', chunk_size),
+                                                             read_pose_chunks(partition_b, 'csv', chunk_size), None)
+            only_a += partition_only_a
+            only_b += partition_only_b
+        return differences, only_a, only_b
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,101 @@
+import itertools
+import sys
+
+import numpy as np
+
+from lib.pose_conversion import PoseConverter
+
+# Column separators of the supported text formats
+SEPARATORS = {'csv': ',', 'pix4d': None}
+
+
+def angle_columns(convention):
+    '''
+    Names of the angle columns in pose files. They follow the convention's name
+    (e.g. Yaw Pitch Roll, Omega Phi Kappa), i.e. the angle applied last comes first.
+    '''
+    return list(reversed(convention.angle_names))
+
+
+def parse_pose_lines(lines, separator):
+    '''
+    Parses lines of "image x y z angle angle angle" (angles in file column order).
+    Returns the image names, (N,3) positions and (N,3) angles ordered as applied.
+    '''
+    names = [line.split(separator, 1)[0].strip() for line in lines]
+    values = np.loadtxt(lines, delimiter=separator, usecols=range(1, 7), ndmin=2)
+    return names, values[:, :3], values[:, :2:-1]
+
+
+def read_pose_chunks(f, file_format, chunk_size):
+    '''
+    Streams a pose file (CSV or Pix4D external camera parameters) in chunks of chunk_size lines.
+    A header line, if present, and empty lines are skipped.
+    Yields (names, positions, angles) with angles ordered as applied.
+    '''
+    separator = SEPARATORS[file_format]
+    first_chunk = True
+    while True:
+        lines = [line for line in itertools.islice(f, chunk_size) if line.strip()]
+        if not lines:
+            return
+        if first_chunk:
+            first_chunk = False
+            try:
+                float(lines[0].split(separator)[1])
+            except ValueError:
+                lines = lines[1:]
+                if not lines:
+                    continue
+        yield parse_pose_lines(lines, separator)
+
+
+def format_pose_lines(names, positions, values, separator, precision=9):
+    '''
+    Formats names, (N,3) positions and (N,M) values as text lines.
+    '''
+    separator = separator or ' '
+    numbers = np.column_stack((positions, values))
+    row_format = separator.join(['%s'] + ['%.{}f'.format(precision)] * numbers.shape[1]) + '\n'
+    return ''.join(map(row_format.__mod__, zip(names, *numbers.T.tolist())))
+
+
+def convert_pose_file(input_file, output_file, source_convention, target_convention, output='angles',
+                      file_format='csv', chunk_size=100000):
+    '''
+    Streams poses from input_file to output_file converting them from the source convention
+    into the target convention. Memory stays bounded by chunk_size lines for any file size.
+
+    output: 'angles' writes the target angles (in degrees, file column order),
+            'matrix' writes the 9 entries (row major) of the target camera to world rotation.
+    Returns the number of converted poses and of poses in gimbal lock of the target convention.
+    '''
+    converter = PoseConverter(source_convention, target_convention)
+    separator = SEPARATORS[file_format]
+
+    if output == 'matrix':
+        columns = ['r%d%d' % (i, j) for i in range(1, 4) for j in range(1, 4)]
+    else:
+        columns = angle_columns(target_convention)
+    header = ['imageName', 'X', 'Y', 'Z'] + columns
+    output_file.write((separator or ' ').join(header) + '\n')
+
+    poses, near_singular_poses = 0, 0
+    for names, positions, angles in read_pose_chunks(input_file, file_format, chunk_size):
+        positions = converter.convert_positions(positions)
+        if output == 'matrix':
+            values = converter.source_rotation_matrices(angles).reshape(-1, 9)
+        else:
+            target_angles, near_singular = converter.convert_angles(angles)
+            values = target_angles[:, ::-1]
+            near_singular_poses += int(near_singular.sum())
+        output_file.write(format_pose_lines(names, positions, values, separator))
+        poses += len(names)
+
+    return poses, near_singular_poses
+
+
+def open_text(path, mode):
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    return open(path, mode, buffering=1 << 20)
@@ -0,0 +1,75 @@
+from time import perf_counter
+
+
+class RenderScheduler:
+    '''
+    Coalesces redraw requests (e.g. slider events) into frames at a capped frame rate.
+
+    Each request() schedules at most one pending frame. Requests arriving while a frame
+    is pending are merged into it. When the frame runs, render() is called once;
+    it may return False to signal that nothing changed on screen, in which case the
+    events of that frame count as dropped.
+
+    The scheduler does not depend on a GUI toolkit:
+    call_later(delay_in_seconds, callback) must run the callback on the GUI thread,
+    e.g. via pyface's GUI.invoke_after().
+
+    latency optionally times requests and frames, see lib.latency.LatencyTracker.
+
+    Counters:
+    - events:         all requests
+    - merged_events:  requests that joined an already pending frame
+    - dropped_events: requests whose frame did not change the scene
+    - frames:         rendered frames
+    '''
+    def __init__(self, render, call_later, max_fps=30., clock=perf_counter, latency=None):
+        self.render = render
+        self.call_later = call_later
+        self.max_fps = max_fps
+        self.clock = clock
+        self.latency = latency
+
+        self.events = 0
+        self.merged_events = 0
+        self.dropped_events = 0
+        self.frames = 0
+
+        self._pending_events = 0
+        self._last_frame_time = None
+
+    def request(self):
+        self.events += 1
+        if self.latency is not None:
+            self.latency.request()
+        if self._pending_events:
+            self.merged_events += 1
+            self._pending_events += 1
+            return
+
+        self._pending_events = 1
+        delay = 0.
+        if self._last_frame_time is not None and self.max_fps:
+            delay = max(0., self._last_frame_time + 1. / self.max_fps - self.clock())
+        self.call_later(delay, self._run_frame)
+
+    def _run_frame(self):
+        # Requests issued while rendering schedule the next frame
+        events, self._pending_events = self._pending_events, 0
+        self._last_frame_time = self.clock()
+
+        if self.latency is not None:
+            self.latency.frame_started()
+        rendered = self.render() is not False
+        if self.latency is not None:
+            self.latency.frame_finished(rendered)
+
+        if rendered:
+            self.frames += 1
+        else:
+            self.dropped_events += events
+
+    def statistics(self):
+        return {'events': self.events,
+                'merged_events': self.merged_events,
+                'dropped_events': self.dropped_events,
+                'frames': self.frames}
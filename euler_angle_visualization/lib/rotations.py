@@ -0,0 +1,336 @@
+from numpy import array, asarray, cos, sin, zeros, matmul, arctan2, hypot, where, stack, arange, deg2rad
+
+# Rotation axis names as used in ElementalRotationDefinition
+AXIS_INDEX = {'around_x': 0, 'around_y': 1, 'around_z': 2}
+
+# World axes pointing opposite to the mayavi scene axes
+INVERTED_WORLD_AXES = ('Down', 'West', 'South')
+
+
+class CompiledConvention:
+    '''
+    Immutable, traits-free form of an Euler (Tait-Bryan or proper Euler) angles definition within a world system.
+
+    Each elemental rotation is resolved to
+    - axes:  the index (0,1,2) of the axis it acts on
+    - signs: +1/-1, combining the rotation direction and the world axis orientation,
+             s.t. the elemental rotation is camera_to_world_rotation_around_<axis>(sign * angle)
+    All tuples are ordered as the angles are applied.
+    '''
+    __slots__ = ('angle_names', 'axes', 'signs', 'world_axes')
+
+    def __init__(self, angle_names, axes, signs, world_axes):
+        object.__setattr__(self, 'angle_names', tuple(angle_names))
+        object.__setattr__(self, 'axes', tuple(axes))
+        object.__setattr__(self, 'signs', tuple(signs))
+        object.__setattr__(self, 'world_axes', tuple(world_axes))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledConvention is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledConvention is immutable")
+
+    def __reduce__(self):
+        # Immutable: pickle via the constructor, e.g. to send conventions to worker processes
+        return CompiledConvention, self._key()
+
+    def __eq__(self, other):
+        return isinstance(other, CompiledConvention) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return 'CompiledConvention(angle_names=%r, axes=%r, signs=%r, world_axes=%r)' % self._key()
+
+    def _key(self):
+        return self.angle_names, self.axes, self.signs, self.world_axes
+
+
+def compile_elemental_rotation(axis, isClockwiseCameraSystemRotation, world_axes):
+    '''
+    Resolves an elemental rotation definition to its axis index and angle sign.
+    '''
+    index = AXIS_INDEX[axis]
+    sign = -1. if isClockwiseCameraSystemRotation else 1.
+    if world_axes[index] in INVERTED_WORLD_AXES:
+        sign = -sign
+    return index, sign
+
+
+def compile_convention(elemental_rotations, world_axes):
+    '''
+    Compiles a convention given
+    - elemental_rotations: three (angle_name, axis, isClockwiseCameraSystemRotation) in order applied
+    - world_axes: names of the world x,y,z axes, e.g. ('North', 'East', 'Down')
+    '''
+    angle_names, axes, signs = [], [], []
+    for angle_name, axis, isClockwiseCameraSystemRotation in elemental_rotations:
+        index, sign = compile_elemental_rotation(axis, isClockwiseCameraSystemRotation, world_axes)
+        angle_names.append(angle_name)
+        axes.append(index)
+        signs.append(sign)
+
+    return CompiledConvention(angle_names, axes, signs, world_axes)
+
+
+def camera_to_world_rotation_around_x(cc_angle = 0):
+    '''
+    Compute a rotation matrix that is used to transform
+    a point in camera coordinates to a point in world coordinates.
+    when the camera(system) rotates counter-clockwise.
+    (Seeing the camera(system) as fixed, the rotation
+    would transform points clockwise around its x axis)
+    '''
+    return array([[1.,   0.,             0.],
+                  [0.,   cos(cc_angle),  -sin(cc_angle)],
+                  [0.,   sin(cc_angle),  cos(cc_angle)]])
+
+
+def camera_to_world_rotation_around_y(cc_angle = 0):
+    '''
+    Compute a rotation matrix that is used to transform
+    a point in camera coordinates to a point in world coordinates.
+    when the camera(system) rotates counter-clockwise.
+    (Seeing the camera(system) as fixed, the rotation
+    would transform points clockwise around its x axis)
+    '''
+
+    return array([[cos(cc_angle),    0., sin(cc_angle)],
+                  [0.,               1., 0.],
+                  [-sin(cc_angle),   0., cos(cc_angle)]])
+
+
+def camera_to_world_rotation_around_z(cc_angle = 0):
+    '''
+    Compute a rotation matrix that is used to transform
+    a point in camera coordinates to a point in world coordinates
+    when the camera(system) rotates counter-clockwise.
+    (Seeing the camera(system) as fixed, the rotation
+    would transform points clockwise around its x axis)
+    '''
+
+    return array([[cos(cc_angle),    -sin(cc_angle), 0.],
+                  [sin(cc_angle),    cos(cc_angle),  0.],
+                  [0.,               0.,             1.]])
+
+
+_camera_to_world_rotation_around = (camera_to_world_rotation_around_x,
+                                    camera_to_world_rotation_around_y,
+                                    camera_to_world_rotation_around_z)
+
+
+def elemental_rotation_matrix(axis, angle):
+    '''
+    Returns the elemental rotation matrix around the axis with index 0,1,2.
+    '''
+    return _camera_to_world_rotation_around[axis](angle)
+
+
+def elemental_rotation_matrices(axis, angles):
+    '''
+    Vectorized version of elemental_rotation_matrix():
+    Returns a (N,3,3) stack of elemental rotation matrices around the axis with index 0,1,2.
+    '''
+    angles = asarray(angles, dtype=float)
+    i, j, k = axis, (axis + 1) % 3, (axis + 2) % 3
+
+    c = cos(angles)
+    s = sin(angles)
+
+    # Same layout as camera_to_world_rotation_around_x/y/z
+    # with cyclically permuted axes (i, j, k)
+    rotations = zeros(angles.shape + (3, 3))
+    rotations[..., i, i] = 1.
+    rotations[..., j, j] = c
+    rotations[..., j, k] = -s
+    rotations[..., k, j] = s
+    rotations[..., k, k] = c
+    return rotations
+
+
+def rotation_matrix(convention, first, second, last):
+    '''
+    Computes the camera to world rotation matrix for a single set of
+    angles in radians, ordered as applied.
+
+    Note: Matrices application order is opposite to reading order
+    '''
+    (axis_first, axis_second, axis_last), (sign_first, sign_second, sign_last) = convention.axes, convention.signs
+    return elemental_rotation_matrix(axis_first, sign_first * first).dot(
+            elemental_rotation_matrix(axis_second, sign_second * second)).dot(
+                elemental_rotation_matrix(axis_last, sign_last * last))
+
+
+def rotation_matrices(convention, angles):
+    '''
+    Vectorized version of rotation_matrix():
+    Computes a (N,3,3) stack of camera to world rotation matrices
+    for a (N,3) array of angles in radians, the columns ordered as applied.
+    '''
+    angles = asarray(angles, dtype=float)
+    (axis_first, axis_second, axis_last), (sign_first, sign_second, sign_last) = convention.axes, convention.signs
+
+    return matmul(matmul(elemental_rotation_matrices(axis_first, sign_first * angles[..., 0]),
+                         elemental_rotation_matrices(axis_second, sign_second * angles[..., 1])),
+                  elemental_rotation_matrices(axis_last, sign_last * angles[..., 2]))
+
+
+def rotate_vectors(convention, angles, vectors):
+    '''
+    Applies the camera to world rotations of (N,3) angles in radians (columns ordered as applied)
+    to (N,3) or (3,) vectors, without building the (N,3,3) matrices: R·v = E(a0)·(E(a1)·(E(a2)·v)).
+    '''
+    angles = asarray(angles, dtype=float)
+    rotated = zeros(angles.shape[:-1] + (3,))
+    rotated[...] = vectors
+    for axis, sign, angle in reversed(list(zip(convention.axes, convention.signs, angles.T))):
+        j, k = (axis + 1) % 3, (axis + 2) % 3
+        c = cos(sign * angle)
+        s = sin(sign * angle)
+        rotated[..., j], rotated[..., k] = c * rotated[..., j] - s * rotated[..., k], \
+            s * rotated[..., j] + c * rotated[..., k]
+    return rotated
+
+
+def angles_from_rotation_matrices(convention, rotations, gimbal_lock_tolerance=1e-6):
+    '''
+    Inverse of rotation_matrices():
+    Extracts Tait-Bryan angles from a (N,3,3) stack of camera to world rotation matrices.
+
+    Returns
+    - angles: (N,3) array in radians, the columns ordered as applied.
+              The second angle is chosen within [-90°, 90°].
+    - near_singular: (N,) bool array marking gimbal lock, i.e. rows where the cosine of the
+              second angle is below gimbal_lock_tolerance. There the first and last angle act on the
+              same axis and only their combination is defined: the first angle is set to 0
+              and the last angle carries the whole rotation (e.g. Roll = 0 and Yaw for YPR).
+    '''
+    rotations = asarray(rotations, dtype=float)
+    return angles_from_rotation_entries(convention, lambda row, column: rotations[..., row, column],
+                                        gimbal_lock_tolerance)
+
+
+def angles_from_rotation_entries(convention, entry, gimbal_lock_tolerance=1e-6):
+    '''
+    Same as angles_from_rotation_matrices(), reading the (up to seven) rotation matrix
+    entries it needs from entry(row, column), e.g. computed from another parametrization
+    without building whole matrices.
+    '''
+    i, j, k = convention.axes
+    if i == k and j != i:
+        return _proper_euler_angles_from_rotation_entries(convention, entry, gimbal_lock_tolerance)
+    if len({i, j, k}) != 3:
+        raise ValueError("Euler angles require three distinct rotation axes (Tait-Bryan) "
+                         "or equal first and last axes (proper Euler)")
+    sign_first, sign_second, sign_last = convention.signs
+
+    # +1 for cyclic axis orders (x,y,z), (y,z,x), (z,x,y) when read from the right, -1 otherwise
+    parity = 1. if (j - k) % 3 == 1 else -1.
+
+    # R = R_i(first) R_j(second) R_k(last)
+    cos_second = hypot(entry(k, k), entry(j, k))
+    second = arctan2(-parity * entry(i, k), cos_second)
+    first = arctan2(parity * entry(j, k), entry(k, k))
+    last = arctan2(parity * entry(i, j), entry(i, i))
+
+    # Gimbal lock: R_i(first) only mixes rows j and k, so row j yields the
+    # combined last angle when first = 0.
+    near_singular = cos_second < gimbal_lock_tolerance
+    first = where(near_singular, 0., first)
+    last = where(near_singular, arctan2(-parity * entry(j, i), entry(j, j)), last)
+
+    return stack((sign_first * first, sign_second * second, sign_last * last), axis=-1), near_singular
+
+
+def _proper_euler_angles_from_rotation_entries(convention, entry, gimbal_lock_tolerance):
+    '''
+    angles_from_rotation_entries() for proper Euler angles, i.e. R = R_i(first) R_j(second) R_i(last).
+    The second angle is chosen within [0°, 180°]; gimbal lock occurs at 0° and 180°.
+    '''
+    i, j, _ = convention.axes
+    k = 3 - i - j
+    sign_first, sign_second, sign_last = convention.signs
+
+    # +1 for cyclic axis orders (i, j, k), -1 otherwise
+    parity = 1. if (j - i) % 3 == 1 else -1.
+
+    sin_second = hypot(entry(i, j), entry(i, k))
+    second = arctan2(sin_second, entry(i, i))
+    first = arctan2(entry(j, i), -parity * entry(k, i))
+    last = arctan2(entry(i, j), parity * entry(i, k))
+
+    # Gimbal lock: R = R_i(first ± last) up to the sign of cos(second) = entry(i, i),
+    # the first angle is set to 0 and the last angle carries the rotation.
+    near_singular = sin_second < gimbal_lock_tolerance
+    first = where(near_singular, 0., first)
+    last = where(near_singular, arctan2(parity * entry(i, i) * entry(k, j), entry(j, j)), last)
+
+    return stack((sign_first * first, sign_second * second, sign_last * last), axis=-1), near_singular
+
+
+# Elemental rotations for whole degrees, shared per (axis index, sign)
+_elemental_rotation_tables = {}
+
+
+def elemental_rotation_table(axis, sign):
+    '''
+    Returns a read-only (360,3,3) table of the elemental rotation matrices
+    around the axis with index 0,1,2 for sign * the whole degrees 0..359.
+    Tables are built once per rotation axis and sign and then shared.
+    '''
+    key = (axis, sign)
+    if key not in _elemental_rotation_tables:
+        table = elemental_rotation_matrices(axis, sign * deg2rad(arange(360)))
+        table.setflags(write=False)
+        _elemental_rotation_tables[key] = table
+    return _elemental_rotation_tables[key]
+
+
+class IntegerDegreeRotationTable:
+    '''
+    Camera to world rotations for Tait-Bryan angles given in whole degrees,
+    e.g. as entered in the UI, looked up from precomputed elemental rotations.
+    Intended to be built once when the convention is chosen.
+    '''
+    def __init__(self, convention):
+        self.tables = tuple(elemental_rotation_table(axis, sign)
+                            for axis, sign in zip(convention.axes, convention.signs))
+
+    def rotation_matrix(self, first, second, last):
+        '''
+        Same as rotation_matrix() for a single set of integer angles
+        in degrees, ordered as applied.
+        '''
+        table_first, table_second, table_last = self.tables
+        return table_first[first % 360].dot(table_second[second % 360]).dot(table_last[last % 360])
+
+    def rotation_matrices(self, angles):
+        '''
+        Same as rotation_matrices() for a (N,3) array of integer angles
+        in degrees, the columns ordered as applied.
+        '''
+        angles = asarray(angles) % 360
+        table_first, table_second, table_last = self.tables
+        return matmul(matmul(table_first[angles[..., 0]], table_second[angles[..., 1]]),
+                      table_last[angles[..., 2]])
+
+
+class IntegerDegreeRotationTables:
+    '''
+    IntegerDegreeRotationTable for several conventions at once, e.g. one per viewport of a split view.
+    The rotations of all conventions for the same angles are looked up and composed in one batched call.
+    '''
+    def __init__(self, conventions):
+        self.tables = tuple(stack([elemental_rotation_table(convention.axes[n], convention.signs[n])
+                                   for convention in conventions])
+                            for n in range(3))
+
+    def rotation_matrices(self, first, second, last):
+        '''
+        (N,3,3) rotations of the N conventions for one set of integer angles
+        in degrees, ordered as applied.
+        '''
+        table_first, table_second, table_last = self.tables
+        return matmul(matmul(table_first[:, first % 360], table_second[:, second % 360]), table_last[:, last % 360])
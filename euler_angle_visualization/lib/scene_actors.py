@@ -0,0 +1,143 @@
+import numpy as np
+
+from tvtk.api import tvtk
+from tvtk.common import configure_input, configure_input_data
+
+from lib.meshes import grid_triangle_mesh
+from lib.draw_scene import oriented_ground_mesh, coordinate_system_meshes, merged_world_mesh
+
+
+def mesh_polydata(mesh, scalars=None):
+    polydata = tvtk.PolyData(points=np.column_stack((mesh.x, mesh.y, mesh.z)), polys=mesh.faces)
+    if scalars is not None:
+        polydata.point_data.scalars = scalars
+    return polydata
+
+
+def polydata_actor(polydata, scalar_range=None):
+    mapper = tvtk.PolyDataMapper()
+    configure_input_data(mapper, polydata)
+    if scalar_range is not None:
+        mapper.scalar_range = scalar_range
+    else:
+        mapper.scalar_visibility = False
+    return tvtk.Actor(mapper=mapper)
+
+
+def colored_mesh_actor(mesh, colors):
+    '''
+    Actor of a mesh with (N,3) uint8 per-vertex colors.
+    '''
+    polydata = mesh_polydata(mesh, colors)
+    mapper = tvtk.PolyDataMapper(color_mode='direct_scalars')
+    configure_input_data(mapper, polydata)
+    return tvtk.Actor(mapper=mapper)
+
+
+def labels_actor(labels, font_size=16):
+    '''
+    All labels (text, position) in one 2D actor, drawn in a single pass and always facing the viewer.
+    '''
+    points = tvtk.PolyData(points=np.array([position for _, position in labels], dtype=float))
+    texts = tvtk.StringArray(name='labels')
+    for text, _ in labels:
+        texts.insert_next_value(text)
+    points.point_data.add_array(texts)
+
+    mapper = tvtk.LabeledDataMapper(label_mode='label_field_data', field_data_name='labels')
+    configure_input_data(mapper, points)
+    mapper.label_text_property.trait_set(font_size=font_size, bold=True)
+    return tvtk.Actor2D(mapper=mapper)
+
+
+def world_actors(world_system, camera, ground_dimensions=[1., 1., 0.2], ground_step=0.1):
+    '''
+    Ground, coordinate system arrows and axis labels of a world system as separate tvtk actors,
+    the same geometry as draw_world_with_coordinate_system_at_origin().
+    Actors can be added to several renderers, which then share them.
+    '''
+    # Colored by the scene z coordinate, as mayavi's mesh() does by default
+    ground = grid_triangle_mesh(*oriented_ground_mesh(world_system, ground_dimensions, ground_step))
+    actors = [polydata_actor(mesh_polydata(ground, ground.z), (ground.z.min(), ground.z.max()))]
+
+    axis_length = 1.3 * max(ground_dimensions)
+    arrows, labels = coordinate_system_meshes(world_system, axis_length)
+    for x, y, z in arrows:
+        arrow = polydata_actor(mesh_polydata(grid_triangle_mesh(x, y, z)))
+        arrow.property.color = (0.8, 0.8, 0.8)
+        actors.append(arrow)
+
+    for label, position in labels:
+        text = tvtk.VectorText(text=label)
+        mapper = tvtk.PolyDataMapper()
+        configure_input(mapper, text)
+        follower = tvtk.Follower(mapper=mapper, position=position, scale=(0.2 * axis_length,) * 3)
+        follower.camera = camera
+        actors.append(follower)
+
+    return actors
+
+
+def merged_world_actors(world_system, ground_dimensions=[1., 1., 0.2], ground_step=0.1):
+    '''
+    The static world as two actors: ground and arrows merged into one mesh
+    with per-vertex colors (see draw_scene.merged_world_mesh()) and all axis labels.
+    '''
+    mesh, colors, labels = merged_world_mesh(world_system, ground_dimensions, ground_step)
+    return [colored_mesh_actor(mesh, colors), labels_actor(labels)]
+
+
+def set_view(renderer, azimuth, elevation, roll, distance=10.):
+    '''
+    Places the renderer's camera as mlab.view() does, looking at the origin from
+    azimuth and elevation (degrees) at distance, rolled by roll degrees.
+    Used for scenes without mlab, e.g. offscreen snapshots.
+    '''
+    phi, theta = np.deg2rad(azimuth), np.deg2rad(elevation)
+    camera = renderer.active_camera
+    camera.focal_point = (0., 0., 0.)
+    camera.position = distance * np.array([np.cos(phi) * np.sin(theta), np.sin(phi) * np.sin(theta), np.cos(theta)])
+
+    # Looking along the z axis, the view up has to be chosen differently
+    if abs(np.sin(theta)) < 1e-3:
+        camera.view_up = (-np.cos(phi) * np.cos(theta), -np.sin(phi) * np.cos(theta), 0.)
+    else:
+        camera.view_up = (0., 0., 1.)
+    camera.orthogonalize_view_up()
+    camera.roll = roll
+    renderer.reset_camera_clipping_range()
+
+
+def point_cloud_actor(point_size=2.):
+    '''
+    Empty point cloud actor with per-point colors, filled by set_point_cloud().
+    Returns (actor, polydata).
+    '''
+    polydata = tvtk.PolyData()
+    mapper = tvtk.PolyDataMapper(color_mode='direct_scalars')
+    configure_input_data(mapper, polydata)
+    actor = tvtk.Actor(mapper=mapper)
+    actor.property.point_size = point_size
+    return actor, polydata
+
+
+def set_point_cloud(polydata, points, colors):
+    '''
+    Replaces the (N,3) points and (N,3) uint8 colors of a point cloud, one vertex cell per point.
+    '''
+    polydata.points = points
+    polydata.verts = np.arange(len(points)).reshape(-1, 1)
+    polydata.point_data.scalars = colors
+    polydata.modified()
+
+
+def footprints_actor(vertices, complete, color=(1., 0.8, 0.)):
+    '''
+    Ground footprints as one translucent actor of quads, drawn for the (N,4,3) vertices
+    (see lib.footprints.footprint_vertices()) of footprints with all corners on the ground.
+    '''
+    vertices = vertices[complete]
+    quads = np.arange(4 * len(vertices)).reshape(-1, 4)
+    actor = polydata_actor(tvtk.PolyData(points=vertices.reshape(-1, 3), polys=quads))
+    actor.property.trait_set(color=color, opacity=0.3, edge_visibility=True, edge_color=color)
+    return actor
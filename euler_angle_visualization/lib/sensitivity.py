@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lib.rotations import CompiledConvention, elemental_rotation_matrices
+
+# Part of the cache keys, increase when the computed fields change
+CACHE_VERSION = 1
+
+# Per worker process state, set up once by _initialize_worker()
+_worker = {}
+
+
+def grid_angles(step):
+    '''
+    Grid angles in degrees along each axis: -180 up to (excluding) 180 in steps of step degrees.
+    '''
+    n = int(round(360. / step))
+    if not np.isclose(n * step, 360.):
+        raise ValueError("The grid step has to divide 360 degrees")
+    return -180. + step * np.arange(n)
+
+
+def sensitivity_fields(convention, first, second, last, view_axis=(0., 0., -1.)):
+    '''
+    Sensitivity of the camera orientation to each angle on the grid spanned by first, second
+    and last (1d arrays of angles in radians, ordered as applied). Returns
+    - conditioning:     (F,S,L) inverse condition number of the Jacobian, 1 well-conditioned, 0 gimbal lock
+    - view_sensitivity: (F,S,L,3) change of the viewing direction per change of each angle [rad/rad]
+
+    The Jacobian of R = E(a0)·E(a1)·E(a2) w.r.t. the angles has the angular velocity axes
+    w0 = s0·e0, w1 = s1·E(a0)·e1, w2 = s2·E(a0)·E(a1)·e2 as columns. They are unit vectors and
+    w1 is orthogonal to w0 and w2, so J^T·J has the eigenvalues 1, 1 + |w0·w2| and 1 - |w0·w2|.
+    view_axis is the viewing direction of the camera at zero angles in the scene,
+    e.g. camera_alignment_matrix(...)·(0, 0, -1); a viewing direction v changes by |w x v| = sqrt(1 - (w·v)²).
+    '''
+    (axis_first, axis_second, axis_last), (sign_first, sign_second, sign_last) = convention.axes, convention.signs
+
+    # Broadcast as (F,1,1), (1,S,1), (1,1,L) instead of building all F·S·L matrices
+    E_first = elemental_rotation_matrices(axis_first, sign_first * first)[:, None, None]
+    E_second = elemental_rotation_matrices(axis_second, sign_second * second)[None, :, None]
+    E_last = elemental_rotation_matrices(axis_last, sign_last * last)[None, None, :]
+
+    w_first = np.zeros(3)
+    w_first[axis_first] = sign_first
+    w_second = sign_second * E_first[..., :, axis_second]
+    E_first_second = np.matmul(E_first, E_second)
+    w_last = sign_last * E_first_second[..., :, axis_last]
+    view = np.einsum('...ij,...j->...i', E_first_second, np.matmul(E_last, np.asarray(view_axis, dtype=float)))
+
+    c = np.abs(np.dot(w_last, w_first))
+    conditioning = np.broadcast_to(np.sqrt((1. - c) / (1. + c)), view.shape[:-1])
+
+    view_sensitivity = np.stack([np.sqrt(np.clip(1. - np.sum(w * view, axis=-1)**2, 0., 1.))
+                                 for w in (np.broadcast_to(w_first, view.shape), w_second, w_last)], axis=-1)
+    return conditioning, view_sensitivity
+
+
+def cache_path(directory, convention, step, view_axis):
+    key = repr((CACHE_VERSION, convention.axes, convention.signs, convention.world_axes, float(step),
+                tuple(float(v) for v in view_axis)))
+    return os.path.join(directory, 'sensitivity-%s' % hashlib.sha1(key.encode('utf-8')).hexdigest()[:20])
+
+
+def _initialize_worker(path, convention, step, view_axis):
+    # Workers map the output files themselves, only grid row bounds cross process boundaries
+    _worker['conditioning'] = np.load(os.path.join(path, 'conditioning.npy'), mmap_mode='r+')
+    _worker['view_sensitivity'] = np.load(os.path.join(path, 'view_sensitivity.npy'), mmap_mode='r+')
+    _worker['convention'] = convention
+    _worker['angles'] = np.deg2rad(grid_angles(step))
+    _worker['view_axis'] = view_axis
+
+
+def _compute_rows(start, stop):
+    started = time.perf_counter()
+    angles = _worker['angles']
+    conditioning, view_sensitivity = sensitivity_fields(_worker['convention'], angles[start:stop], angles, angles,
+                                                        _worker['view_axis'])
+    _worker['conditioning'][start:stop] = conditioning
+    _worker['view_sensitivity'][start:stop] = view_sensitivity
+    return os.getpid(), stop - start, time.perf_counter() - started
+
+
+def compute_sensitivity_map(directory, convention, step=1., view_axis=(0., 0., -1.), workers=None,
+                            rows_per_task=4):
+    '''
+    Evaluates sensitivity_fields() over the full grid of all three angles (-180° to 180° in steps
+    of step degrees, 46.7M poses at 1°) and stores it as SensitivityMap below directory.
+    A map computed before for the same convention, step and view axis is loaded instead.
+
+    Grid rows (poses with the same first angle) are computed in chunks of rows_per_task by a pool of
+    worker processes, straight into memory-mapped float32 .npy files. The files are written to
+    a temporary directory first and renamed once complete.
+    '''
+    path = cache_path(directory, convention, step, view_axis)
+    if os.path.exists(path):
+        return SensitivityMap(path)
+
+    n = len(grid_angles(step))
+    temporary_path = '%s.%d.tmp' % (path, os.getpid())
+    os.makedirs(temporary_path)
+    try:
+        np.lib.format.open_memmap(os.path.join(temporary_path, 'conditioning.npy'), mode='w+',
+                                  dtype=np.float32, shape=(n, n, n)).flush()
+        np.lib.format.open_memmap(os.path.join(temporary_path, 'view_sensitivity.npy'), mode='w+',
+                                  dtype=np.float32, shape=(n, n, n, 3)).flush()
+
+        started = time.perf_counter()
+        statistics = {}
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_initialize_worker,
+                                 initargs=(temporary_path, convention, step, view_axis)) as executor:
+            starts = range(0, n, rows_per_task)
+            stops = [min(start + rows_per_task, n) for start in starts]
+            for pid, rows, seconds in executor.map(_compute_rows, starts, stops):
+                worker = statistics.setdefault(pid, {'rows': 0, 'seconds': 0.})
+                worker['rows'] += rows
+                worker['seconds'] += seconds
+
+        with open(os.path.join(temporary_path, 'map.json'), 'w') as f:
+            json.dump({'angle_names': convention.angle_names, 'axes': convention.axes, 'signs': convention.signs,
+                       'world_axes': convention.world_axes, 'step': step, 'view_axis': list(view_axis),
+                       'seconds': time.perf_counter() - started, 'workers': statistics}, f, indent=1)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            shutil.rmtree(temporary_path)
+
+    return SensitivityMap(path)
+
+
+class SensitivityMap:
+    '''
+    Precomputed sensitivity fields of one convention (see compute_sensitivity_map()),
+    memory-mapped read-only. Indexed [first, second, last] by grid_index().
+    '''
+    def __init__(self, path):
+        with open(os.path.join(path, 'map.json')) as f:
+            metadata = json.load(f)
+        self.path = path
+        self.convention = CompiledConvention(metadata['angle_names'], metadata['axes'], metadata['signs'],
+                                             metadata['world_axes'])
+        self.step = metadata['step']
+        self.view_axis = tuple(metadata['view_axis'])
+        self.compute_seconds = metadata['seconds']
+        self.conditioning = np.load(os.path.join(path, 'conditioning.npy'), mmap_mode='r')
+        self.view_sensitivity = np.load(os.path.join(path, 'view_sensitivity.npy'), mmap_mode='r')
+
+    def grid_index(self, angles):
+        '''
+        Index of the nearest grid pose of angles in degrees (any range), ordered as applied.
+        '''
+        n = len(self.conditioning)
+        return tuple(np.round((np.asarray(angles, dtype=float) + 180.) / self.step).astype(int) % n)
+
+    def at(self, angles):
+        '''
+        (conditioning, (3,) view sensitivity) of the nearest grid pose.
+        '''
+        index = self.grid_index(angles)
+        return float(self.conditioning[index]), np.array(self.view_sensitivity[index], dtype=float)
+
+    def envelope(self, first_range=(-180., 180.), second_range=(-180., 180.), last_range=(-180., 180.)):
+        '''
+        Worst case within an envelope of angle ranges in degrees (min, max), e.g. the attitudes
+        of a flight: the minimum conditioning and the maximum view sensitivity per angle.
+        '''
+        angles = grid_angles(self.step)
+        first, second, last = [np.flatnonzero((angles >= low) & (angles <= high))
+                               for low, high in (first_range, second_range, last_range)]
+        conditioning = np.inf
+        view_sensitivity = np.zeros(3)
+        # One grid row at a time, the map may not fit into memory
+        for i in first:
+            row = np.ix_(second, last)
+            conditioning = min(conditioning, float(self.conditioning[i][row].min()))
+            view_sensitivity = np.maximum(view_sensitivity, self.view_sensitivity[i][row].max(axis=(0, 1)))
+        return conditioning, view_sensitivity
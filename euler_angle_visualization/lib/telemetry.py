@@ -0,0 +1,292 @@
+import json
+import struct
+import asyncio
+import threading
+from time import perf_counter
+
+# Binary packet: little-endian float64 sender timestamp in seconds,
+# followed by the three angles in degrees, ordered as applied
+BINARY_PACKET = struct.Struct('<4d')
+
+PACKET_FORMATS = ('binary', 'json')
+
+# Seconds of arrival time after which a sender sending older timestamps counts as restarted
+RESTART_WINDOW = 1.
+PROTOCOLS = ('udp', 'tcp')
+
+
+def parse_packet(data, packet_format, angle_names):
+    '''
+    Returns (timestamp, angles in degrees ordered as applied) of a packet.
+
+    JSON packets are objects with the timestamp "t" and either a list "angles"
+    ordered as applied or the angle names of the convention as keys, e.g.
+    {"t": 1.5, "Yaw": 10.0, "Pitch": 0.0, "Roll": 5.0}. Over TCP they are newline separated.
+    '''
+    if packet_format == 'binary':
+        timestamp, first, second, last = BINARY_PACKET.unpack(data)
+        return timestamp, (first, second, last)
+
+    message = json.loads(data)
+    if 'angles' in message:
+        angles = message['angles']
+        if len(angles) != 3:
+            raise ValueError("Expected three angles")
+    else:
+        angles = [message[name] for name in angle_names]
+    return float(message.get('t', 0.)), tuple(float(angle) for angle in angles)
+
+
+def format_packet(timestamp, angles, packet_format, angle_names):
+    if packet_format == 'binary':
+        return BINARY_PACKET.pack(timestamp, *angles)
+
+    message = {'t': float(timestamp)}
+    message.update((name, float(angle)) for name, angle in zip(angle_names, angles))
+    return (json.dumps(message) + '\n').encode('ascii')
+
+
+class LatestSample:
+    '''
+    Single slot holding the newest sample, shared between the network thread and the GUI thread.
+
+    put() replaces an unread sample, which counts as dropped. Samples older than the
+    newest one of the same source (e.g. reordered or delayed UDP datagrams of one sender)
+    are dropped, however old they are. Whether the source restarted its stream (or reset its clock)
+    is decided from the arrival times instead: an older sample is accepted as new start once
+    the source was silent for restart_window seconds before it, or has sent only older samples
+    for restart_window seconds.
+    take() returns the newest sample once, or None if there is nothing new.
+    '''
+    def __init__(self, restart_window=RESTART_WINDOW, clock=perf_counter):
+        self.restart_window = restart_window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._sample = None
+        # Per source: (newest timestamp, arrival of its last sample, arrival of its first older sample in a row)
+        self._sources = {}
+
+        self.dropped = 0
+        self.delivered = 0
+        self.restarts = 0
+
+    def put(self, timestamp, sample, source=None, arrival=None):
+        '''
+        source:  hashable sender identity, e.g. the UDP sender address or the TCP connection.
+        arrival: receive time of the sample on clock, now by default.
+        '''
+        if arrival is None:
+            arrival = self.clock()
+        with self._lock:
+            state = self._sources.get(source)
+            if state is not None and timestamp < state[0]:
+                newest_timestamp, last_arrival, older_since = state
+                if older_since is None:
+                    older_since = arrival
+                if arrival - last_arrival < self.restart_window and arrival - older_since < self.restart_window:
+                    self._sources[source] = (newest_timestamp, arrival, older_since)
+                    self.dropped += 1
+                    return
+                self.restarts += 1
+            if self._sample is not None:
+                self.dropped += 1
+            self._sources[source] = (timestamp, arrival, None)
+            self._sample = sample
+
+    def forget(self, source):
+        '''
+        Forgets the newest timestamp of a source, e.g. once its connection closed.
+        '''
+        with self._lock:
+            self._sources.pop(source, None)
+
+    def take(self):
+        with self._lock:
+            sample, self._sample = self._sample, None
+            if sample is not None:
+                self.delivered += 1
+            return sample
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receive):
+        self.receive = receive
+
+    def datagram_received(self, data, address):
+        self.receive(data, address)
+
+
+class TelemetryListener:
+    '''
+    Receives attitude packets over UDP or TCP on an asyncio event loop in a background thread.
+
+    Only the newest sample is kept (see LatestSample): the GUI takes it at display rate
+    via latest.take() and never works through a backlog of stale poses.
+    A sample is (timestamp, angles in degrees ordered as applied, receive time).
+    convention is the lib.rotations.CompiledConvention of the stream's angles: JSON packets are keyed
+    by its angle names, and the angles must be composed with it whichever convention is shown.
+    Timestamps are compared per sender: per UDP sender address and per TCP connection,
+    so a new connection or sender port is followed right away.
+
+    Counters:
+    - packets:         parsed packets
+    - invalid_packets: packets that could not be parsed
+    - packet_rate:     packets per second over the last second
+    - parse time:      mean and max time to parse a packet
+    - latest.dropped:  samples replaced before the GUI took them
+    '''
+    def __init__(self, host, port, convention, protocol='udp', packet_format='binary', clock=perf_counter):
+        if protocol not in PROTOCOLS or packet_format not in PACKET_FORMATS:
+            raise ValueError("Unknown telemetry protocol or packet format")
+        self.host = host
+        self.port = port
+        self.convention = convention
+        self.angle_names = convention.angle_names
+        self.protocol = protocol
+        self.packet_format = packet_format
+        self.clock = clock
+        self.latest = LatestSample(clock=clock)
+
+        self.packets = 0
+        self.invalid_packets = 0
+        self.packet_rate = 0.
+        self.parse_seconds = 0.
+        self.parse_seconds_max = 0.
+        self._rate_window_start = None
+        self._rate_window_packets = 0
+
+        self.loop = None
+        self._thread = None
+        self._server = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def receive(self, data, source=None):
+        '''
+        Called on the event loop for each packet of a source (see LatestSample.put()).
+        '''
+        start = self.clock()
+        try:
+            timestamp, angles = parse_packet(data, self.packet_format, self.angle_names)
+        except (ValueError, KeyError, TypeError, struct.error):
+            self.invalid_packets += 1
+            return
+        now = self.clock()
+
+        self.packets += 1
+        self.parse_seconds += now - start
+        self.parse_seconds_max = max(self.parse_seconds_max, now - start)
+        self.latest.put(timestamp, (timestamp, angles, now), source, now)
+
+        if self._rate_window_start is None:
+            self._rate_window_start = now
+        self._rate_window_packets += 1
+        if now - self._rate_window_start >= 1.:
+            self.packet_rate = self._rate_window_packets / (now - self._rate_window_start)
+            self._rate_window_start, self._rate_window_packets = now, 0
+
+    def start(self):
+        '''
+        Starts listening, returns once the socket is bound (see address()).
+        '''
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        if self.loop is not None and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    def address(self):
+        '''
+        (host, port) actually bound, e.g. when listening on port 0.
+        '''
+        if self.protocol == 'udp':
+            return self._server.get_extra_info('sockname')[:2]
+        return self._server.sockets[0].getsockname()[:2]
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._listen())
+        except OSError as e:
+            self._error = e
+        self._ready.set()
+        if self._error is None:
+            self.loop.run_forever()
+            self._server.close()
+        self.loop.close()
+
+    async def _listen(self):
+        if self.protocol == 'udp':
+            self._server, _ = await self.loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self.receive), local_addr=(self.host, self.port))
+        else:
+            self._server = await asyncio.start_server(self._read_stream, self.host, self.port)
+
+    async def _read_stream(self, reader, writer):
+        source = writer.get_extra_info('peername')
+        try:
+            while True:
+                if self.packet_format == 'binary':
+                    data = await reader.readexactly(BINARY_PACKET.size)
+                else:
+                    data = await reader.readline()
+                    if not data:
+                        break
+                self.receive(data, source)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.latest.forget(source)
+            writer.close()
+
+    def statistics(self):
+        packet_rate = self.packet_rate
+        if not packet_rate and self._rate_window_packets > 1:
+            # Less than a second of packets so far
+            packet_rate = self._rate_window_packets / max(self.clock() - self._rate_window_start, 1e-9)
+        return {'packets': self.packets,
+                'invalid_packets': self.invalid_packets,
+                'packet_rate': packet_rate,
+                'parse_us_mean': 1e6 * self.parse_seconds / self.packets if self.packets else 0.,
+                'parse_us_max': 1e6 * self.parse_seconds_max,
+                'dropped_samples': self.latest.dropped,
+                'restarted_streams': self.latest.restarts,
+                'delivered_samples': self.latest.delivered}
+
+
+async def replay(host, port, times, angles, angle_names, protocol='udp', packet_format='binary', speed=1.):
+    '''
+    Sends recorded (N,) times and (N,3) angles in degrees (ordered as applied)
+    at their recorded pace, as local stand-in for a vehicle. Returns the number of packets sent.
+    '''
+    loop = asyncio.get_running_loop()
+    if protocol == 'udp':
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+        send = transport.sendto
+    else:
+        _, writer = await asyncio.open_connection(host, port)
+        send = writer.write
+
+    start = loop.time()
+    packets = 0
+    try:
+        for timestamp, sample in zip(times, angles):
+            delay = start + (timestamp - times[0]) / speed - loop.time()
+            if delay > 0.:
+                await asyncio.sleep(delay)
+            send(format_packet(timestamp, sample, packet_format, angle_names))
+            packets += 1
+            if protocol == 'tcp':
+                await writer.drain()
+    finally:
+        if protocol == 'udp':
+            transport.close()
+        else:
+            writer.close()
+            await writer.wait_closed()
+    return packets
@@ -0,0 +1,117 @@
+import threading
+from time import perf_counter
+
+import numpy as np
+
+from lib.rotations import rotate_vectors
+from lib.telemetry import LatestSample
+
+MAX_SAMPLES = 1000000
+
+
+def refinement_levels(samples, first_samples=2000, factor=8):
+    '''
+    Sample counts of the progressive refinement, e.g. 2000, 16000, 128000, 1000000.
+    '''
+    levels = [min(first_samples, samples)]
+    while levels[-1] < samples:
+        levels.append(min(levels[-1] * factor, samples))
+    return levels
+
+
+def axis_endpoints(convention, angles, sigmas, normals, axes):
+    '''
+    Monte Carlo attitude uncertainty: rotates each of the (K,3) axes (e.g. optical axis and camera up,
+    in the scene at zero angles) by the rotations of the angles in degrees (ordered as applied),
+    perturbed by normals, (N,3) standard normal draws scaled by the per angle sigmas in degrees.
+    Returns the (K,N,3) endpoints of the rotated unit axes.
+    '''
+    samples = np.deg2rad(np.asarray(angles, dtype=float) + normals * np.asarray(sigmas, dtype=float))
+    return np.stack([rotate_vectors(convention, samples, axis) for axis in axes])
+
+
+class UncertaintySampler:
+    '''
+    Computes attitude uncertainty clouds (see axis_endpoints()) on a background thread,
+    so moving the sliders never waits for the sampling.
+
+    request() hands over the newest angles and returns right away. The worker refines the cloud
+    progressively (see refinement_levels()): each level adds samples to the previous ones and is
+    published as (generation, (K,n,3) float32 endpoints) in latest (see lib.telemetry.LatestSample),
+    which the GUI takes at display rate. A newer request stops the refinement of the previous one.
+
+    The standard normal draws are made once and reused for every request, so the cloud moves
+    with the angles instead of flickering.
+    '''
+    def __init__(self, sigmas, axes, samples=100000, first_samples=2000, seed=0):
+        if samples > MAX_SAMPLES:
+            raise ValueError("At most %d samples are supported" % MAX_SAMPLES)
+        self.sigmas = tuple(sigmas)
+        self.axes = np.asarray(axes, dtype=float)
+        self.levels = refinement_levels(samples, first_samples)
+        self.normals = np.random.default_rng(seed).standard_normal((samples, 3))
+        self.latest = LatestSample()
+
+        # Totals over the computed refinement levels
+        self.computed_levels = 0
+        self.level_seconds = 0.
+        self.level_samples = 0
+
+        self._condition = threading.Condition()
+        self._request = None
+        self._generation = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='uncertainty', daemon=True)
+        self._thread.start()
+
+    def request(self, convention, angles):
+        '''
+        Requests the cloud of the angles in degrees (ordered as applied), replacing any pending request.
+        '''
+        with self._condition:
+            self._generation += 1
+            self._request = (self._generation, convention, tuple(angles))
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+    def _is_outdated(self, generation):
+        with self._condition:
+            return not self._running or self._generation != generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and self._request is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                (generation, convention, angles), self._request = self._request, None
+
+            # Fresh buffers per request: the GUI may still hold views of the previous cloud
+            endpoints = np.empty((len(self.axes), len(self.normals), 3), dtype=np.float32)
+            done = 0
+            for level in self.levels:
+                start = perf_counter()
+                endpoints[:, done:level] = axis_endpoints(convention, angles, self.sigmas,
+                                                          self.normals[done:level], self.axes)
+                self.computed_levels += 1
+                self.level_seconds += perf_counter() - start
+                self.level_samples += level - done
+                done = level
+                if self._is_outdated(generation):
+                    break
+                self.latest.put(generation, (generation, endpoints[:, :done]))
+
+    def statistics(self):
+        '''
+        Mean compute time per level and per sample, and clouds replaced before the GUI took them.
+        '''
+        return {'levels': self.computed_levels,
+                'us_per_sample': 1e6 * self.level_seconds / self.level_samples if self.level_samples else 0.,
+                'dropped_clouds': self.latest.dropped,
+                'delivered_clouds': self.latest.delivered}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The package imports its modules as lib.*, as when run from euler_angle_visualization/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'euler_angle_visualization'))
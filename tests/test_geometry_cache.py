@@ -0,0 +1,44 @@
+'''
+The disk cache of generated geometry is only a speed-up: it must never fail the generation.
+'''
+import os
+
+import numpy as np
+import pytest
+
+from lib.geometry_cache import GeometryCache
+
+
+def generate():
+    return np.arange(12.).reshape(4, 3), np.arange(6, dtype=np.int32).reshape(2, 3)
+
+
+def test_unwritable_directory_still_generates(tmp_path):
+    # A directory below a regular file can't be created, also not as root
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    cache = GeometryCache(directory=str(blocker / 'cache'))
+
+    vertices, faces = cache.get('mesh', [1, 2], generate)
+    assert np.array_equal(vertices, generate()[0]) and np.array_equal(faces, generate()[1])
+    assert cache.statistics()['write_errors'] == 1
+
+
+@pytest.mark.parametrize('content', [b'', b'not a zip file', b'PK\x03\x04truncated'])
+def test_corrupt_file_is_regenerated_and_overwritten(tmp_path, content):
+    GeometryCache(directory=str(tmp_path)).get('mesh', [1, 2], generate)
+    path, = [os.path.join(tmp_path, name) for name in os.listdir(tmp_path)]
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    cache = GeometryCache(directory=str(tmp_path))
+    vertices, _ = cache.get('mesh', [1, 2], generate)
+    assert np.array_equal(vertices, generate()[0])
+    assert cache.statistics()['misses'] == 1
+
+    # The next launch loads the rewritten file
+    cache = GeometryCache(directory=str(tmp_path))
+    vertices, _ = cache.get('mesh', [1, 2], generate)
+    assert np.array_equal(vertices, generate()[0])
+    assert cache.statistics()['disk_hits'] == 1
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
@@ -0,0 +1,21 @@
+'''
+Import time budget of the GUI-free core, see benchmarks/import_time.py.
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+
+from import_time import GUI_MODULES, measure_import_time  # noqa: E402
+
+BUDGET_MS = 400.
+
+
+def test_core_imports_within_budget_without_gui():
+    timings = []
+    for _ in range(3):
+        total_ms, modules = measure_import_time()
+        timings.append(total_ms)
+        assert not {name.split('.')[0] for name in modules} & set(GUI_MODULES)
+    assert min(timings) <= BUDGET_MS, 'core import time %.1f ms exceeds the budget of %.1f ms' % (min(timings),
+                                                                                                 BUDGET_MS)
@@ -0,0 +1,35 @@
+'''
+Angle extraction from rotation matrices, including the gimbal lock of the bundled conventions
+(e.g. Omega and Kappa at Phi = ±90°).
+'''
+import numpy as np
+import pytest
+
+from lib.conventions import CONVENTIONS
+from lib.rotations import rotation_matrices, angles_from_rotation_matrices
+
+
+@pytest.mark.parametrize('name', ['ypr', 'opk'])
+def test_angles_round_trip(name):
+    convention = CONVENTIONS[name]()
+    angles = np.random.default_rng(0).uniform(-np.pi, np.pi, (1000, 3))
+    angles[:, 1] /= 2.1
+
+    extracted, near_singular = angles_from_rotation_matrices(convention, rotation_matrices(convention, angles))
+    assert not near_singular.any()
+    assert np.allclose(extracted, angles)
+
+
+@pytest.mark.parametrize('name', ['ypr', 'opk'])
+@pytest.mark.parametrize('second', [np.pi / 2, -np.pi / 2])
+def test_gimbal_lock_sets_first_angle_to_zero(name, second):
+    convention = CONVENTIONS[name]()
+    angles = np.random.default_rng(1).uniform(-np.pi, np.pi, (1000, 3))
+    angles[:, 1] = second
+    rotations = rotation_matrices(convention, angles)
+
+    extracted, near_singular = angles_from_rotation_matrices(convention, rotations)
+    assert near_singular.all()
+    assert np.all(extracted[:, 0] == 0.)
+    assert np.allclose(extracted[:, 1], second)
+    assert np.allclose(rotation_matrices(convention, extracted), rotations)
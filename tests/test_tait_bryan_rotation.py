@@ -0,0 +1,23 @@
+'''
+The batch rotation API against the scalar one, called as by the visualization
+(the angle applied last passed first).
+'''
+import numpy as np
+import pytest
+
+from lib.TaitBryanRotation import angles_yaw_pitch_roll, angles_pix4d_omega_phi_kappa, \
+        camera_to_world_rotation_matrix, camera_to_world_rotation_matrices
+from lib.WorldSystem import system_NED, system_ENU
+
+
+@pytest.mark.parametrize('definition, world_system', [(angles_yaw_pitch_roll, system_NED),
+                                                      (angles_pix4d_omega_phi_kappa, system_ENU)])
+def test_batch_matches_scalar_rotations(definition, world_system):
+    definition, world_system = definition(), world_system()
+    first, second, last = definition.angles_in_order_applied
+    angles = np.random.default_rng(0).uniform(-np.pi, np.pi, (200, 3))
+
+    rotations = camera_to_world_rotation_matrices(angles, definition, world_system)
+    for row, rotation in zip(angles, rotations):
+        assert np.allclose(rotation, camera_to_world_rotation_matrix((row[2], last), (row[1], second),
+                                                                     (row[0], first), world_system))
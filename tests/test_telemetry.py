@@ -0,0 +1,94 @@
+'''
+Telemetry stream path: the bundled replay() sender into TelemetryListener on localhost.
+'''
+import time
+import socket
+import asyncio
+
+import pytest
+
+from lib.conventions import convention_yaw_pitch_roll_NED
+from lib.telemetry import LatestSample, TelemetryListener, format_packet, replay
+
+CONVENTION = convention_yaw_pitch_roll_NED()
+
+
+def wait_for_packets(listener, packets, timeout=5.):
+    deadline = time.perf_counter() + timeout
+    while listener.packets < packets and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert listener.packets == packets
+
+
+def send(listener, times, protocol, packet_format):
+    angles = [(t, 2. * t, 3. * t) for t in times]
+    host, port = listener.address()
+    return asyncio.run(replay(host, port, times, angles, CONVENTION.angle_names, protocol, packet_format, speed=100.))
+
+
+@pytest.mark.parametrize('protocol, packet_format', [('udp', 'binary'), ('udp', 'json'), ('tcp', 'binary')])
+def test_newest_sample_wins_and_restarted_stream_is_accepted(protocol, packet_format):
+    listener = TelemetryListener('127.0.0.1', 0, CONVENTION, protocol, packet_format)
+    listener.start()
+    try:
+        assert send(listener, [10., 10.5, 11., 11.5, 12.], protocol, packet_format) == 5
+        wait_for_packets(listener, 5)
+        timestamp, angles, _ = listener.latest.take()
+        assert timestamp == 12. and angles == (12., 24., 36.)
+        assert listener.latest.take() is None
+
+        # Second run of the sender, its timestamps start over
+        send(listener, [0., 0.5, 1.], protocol, packet_format)
+        wait_for_packets(listener, 8)
+        timestamp, angles, _ = listener.latest.take()
+        assert timestamp == 1. and angles == (1., 2., 3.)
+        assert listener.statistics()['invalid_packets'] == 0
+    finally:
+        listener.stop()
+
+
+def test_delayed_datagram_is_never_shown():
+    listener = TelemetryListener('127.0.0.1', 0, CONVENTION)
+    listener.start()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # The datagram of 8 s arrives after the ones of 10 s to 11 s, i.e. delayed by more than the restart window
+        for timestamp in (10., 10.5, 11., 8.):
+            sender.sendto(format_packet(timestamp, (timestamp, 0., 0.), 'binary', CONVENTION.angle_names),
+                          listener.address())
+        wait_for_packets(listener, 4)
+        timestamp, _, _ = listener.latest.take()
+        assert timestamp == 11.
+        assert listener.latest.take() is None
+        assert listener.statistics()['restarted_streams'] == 0
+    finally:
+        sender.close()
+        listener.stop()
+
+
+def test_out_of_order_samples_of_one_source_are_dropped():
+    latest = LatestSample(restart_window=1.)
+    latest.put(5., 'a', source='sender', arrival=100.)
+    latest.put(4.9, 'reordered', source='sender', arrival=100.01)
+    latest.put(1., 'delayed', source='sender', arrival=100.02)
+    assert latest.take() == 'a'
+    assert latest.dropped == 2
+
+    # Other sources are compared with their own newest timestamp
+    latest.put(0.1, 'b', source='other sender', arrival=100.03)
+    assert latest.take() == 'b'
+
+    # A sender silent for the window restarted its stream
+    latest.put(2., 'c', source='sender', arrival=101.5)
+    assert latest.take() == 'c'
+    assert latest.restarts == 1
+    latest.put(2.5, 'd', source='sender', arrival=101.6)
+    assert latest.take() == 'd'
+
+    # So did a sender sending only older samples for the window
+    for arrival in (101.7, 102.2, 102.6):
+        latest.put(0., 'e', source='sender', arrival=arrival)
+        assert latest.take() is None
+    latest.put(0.2, 'f', source='sender', arrival=102.7)
+    assert latest.take() == 'f'
+    assert latest.restarts == 2